@@ -0,0 +1,144 @@
+# Local caches of expensive analysis results. Partitions of the author graph are stored per graph fingerprint, partition engine,
+# resolution and seed, so that rerunning an analysis (e.g. to change the report layout, the rename lists or the plot factors)
+# does not rerun the community detection. Author graphs are stored per dataset fingerprint (see CitationIndex.fingerprint()),
+# time period and keyword, so that they are not built again from the citation index.
+import os, time, json, hashlib
+import numpy as np
+
+PARTITION_CACHE_ENABLED = True # Disabled with the --no-partition-cache switch of main.py
+PARTITION_CACHE_DIR = 'partition_cache'
+PARTITION_CACHE_MAX_ENTRIES = 32 # The least recently used partitions are evicted beyond this number of entries...
+PARTITION_CACHE_MAX_BYTES = 1024 * 1024 * 1024 # ...or this size on disk
+PARTITION_CACHE_FORMAT_VERSION = 1
+AUTHOR_GRAPH_CACHE_ENABLED = True # Disabled with the --no-author-graph-cache switch of main.py
+AUTHOR_GRAPH_CACHE_DIR = 'author_graph_cache'
+AUTHOR_GRAPH_CACHE_MAX_ENTRIES = 8
+AUTHOR_GRAPH_CACHE_MAX_BYTES = 4 * 1024 * 1024 * 1024
+AUTHOR_GRAPH_CACHE_FORMAT_VERSION = 3 # 3: edges in the order of the citation index again
+
+def graph_fingerprint(graph):
+    # Hash of the nodes and of every adjacency list in the order of the graph, since a seeded partition depends on that order too.
+    # The author graphs are unweighted, so edge data are not part of the fingerprint.
+    start_time = time.time()
+    nodes = list(graph.nodes())
+    node_positions = dict((node, i) for i, node in enumerate(nodes))
+    degrees = np.fromiter((len(graph.adj[node]) for node in nodes), dtype=np.int64, count=len(nodes))
+    neighbors = np.fromiter((node_positions[neighbor] for node in nodes for neighbor in graph.adj[node]), dtype=np.int64, count=int(degrees.sum()))
+    digest = hashlib.sha256()
+    digest.update(np.array(nodes, dtype=np.int64).tobytes())
+    digest.update(degrees.tobytes())
+    digest.update(neighbors.tobytes())
+    print("Graph fingerprint computed in " + str(time.time() - start_time) + " seconds.")
+    return digest.hexdigest()
+
+def cache_key(*description):
+    return hashlib.sha256(json.dumps(description).encode('utf-8')).hexdigest()
+
+class FileCache(object):
+    # One '<key>.npz' file per entry in a directory. Entries are written aside and renamed, so that a partial file is never loaded,
+    # and the least recently used ones (by modification time, updated on every load) are evicted beyond max_entries or max_bytes.
+
+    def __init__(self, path, max_entries, max_bytes):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+    def file(self, key):
+        return os.path.join(self.path, key + '.npz')
+
+    def load_arrays(self, key, names):
+        filename = self.file(key)
+        if not os.path.isfile(filename):
+            return None
+        try:
+            with np.load(filename) as data:
+                arrays = [data[name] for name in names]
+        except Exception as e:
+            print("WARNING: Cache entry '" + filename + "' could not be read and is removed: " + str(e))
+            self.remove(filename)
+            return None
+        try:
+            os.utime(filename) # Most recently used
+        except OSError: # Evicted meanwhile by another process, the arrays were read all the same
+            pass
+        return arrays
+
+    def store_arrays(self, key, **arrays):
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+        filename = self.file(key)
+        tmp_filename = filename + '.' + str(os.getpid()) + '.tmp.npz'
+        np.savez(tmp_filename, **arrays)
+        os.replace(tmp_filename, filename)
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.path):
+            if name.endswith('.npz') and '.tmp' not in name:
+                try:
+                    status = os.stat(os.path.join(self.path, name))
+                except OSError: # Removed meanwhile by another process
+                    continue
+                entries.append((status.st_mtime, status.st_size, name))
+        entries.sort(reverse=True)
+        n_entries = 0
+        n_bytes = 0
+        for mtime, size, name in entries:
+            n_entries += 1
+            n_bytes += size
+            if n_entries > self.max_entries or n_bytes > self.max_bytes:
+                self.remove(os.path.join(self.path, name))
+
+    @staticmethod
+    def remove(filename):
+        try:
+            os.remove(filename)
+        except OSError:
+            pass
+
+class PartitionCache(FileCache):
+    # The nodes and community ids of a partition, in the order of the partition dict
+
+    def __init__(self, path=PARTITION_CACHE_DIR, max_entries=PARTITION_CACHE_MAX_ENTRIES, max_bytes=PARTITION_CACHE_MAX_BYTES):
+        FileCache.__init__(self, path, max_entries, max_bytes)
+
+    @staticmethod
+    def key(fingerprint, engine, resolution, seed):
+        return cache_key(PARTITION_CACHE_FORMAT_VERSION, fingerprint, engine, float(resolution), int(seed))
+
+    def load(self, key, graph):
+        arrays = self.load_arrays(key, ('nodes', 'communities'))
+        if arrays is None:
+            return None
+        nodes, communities = arrays
+        if len(nodes) != graph.number_of_nodes():
+            print("WARNING: Cached partition '" + self.file(key) + "' does not match the graph and is removed.")
+            self.remove(self.file(key))
+            return None
+        return dict(zip(nodes.tolist(), communities.tolist()))
+
+    def store(self, key, partition):
+        self.store_arrays(key, nodes=np.array(list(partition.keys()), dtype=np.int64), communities=np.array(list(partition.values()), dtype=np.int64))
+
+class AuthorGraphCache(FileCache):
+    # The (nodes, citing authors, cited authors) edge list of an author graph, see Analyzer.build_author_graph()
+
+    def __init__(self, path=AUTHOR_GRAPH_CACHE_DIR, max_entries=AUTHOR_GRAPH_CACHE_MAX_ENTRIES, max_bytes=AUTHOR_GRAPH_CACHE_MAX_BYTES):
+        FileCache.__init__(self, path, max_entries, max_bytes)
+
+    @staticmethod
+    def key(dataset_fingerprint, start_year, end_year, keyword, full_period, selection_fingerprint=None):
+        # full_period tells whether the edges to authors outside of the time period are kept (it depends on the current year).
+        # selection_fingerprint identifies the selected articles when they depend on more than the citation index (i.e. the keyword).
+        return cache_key(AUTHOR_GRAPH_CACHE_FORMAT_VERSION, dataset_fingerprint, int(start_year), int(end_year), keyword, bool(full_period), selection_fingerprint)
+
+    def load(self, key):
+        arrays = self.load_arrays(key, ('nodes', 'citing_authors', 'cited_authors'))
+        if arrays is None or len(arrays[1]) != len(arrays[2]):
+            return None
+        return tuple(arrays)
+
+    def store(self, key, edge_list):
+        nodes, citing_authors, cited_authors = edge_list
+        self.store_arrays(key, nodes=np.asarray(nodes, dtype=np.int64), citing_authors=np.asarray(citing_authors, dtype=np.int64), cited_authors=np.asarray(cited_authors, dtype=np.int64))
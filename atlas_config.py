@@ -1,3 +1,6 @@
 # Replace below your own GCP credentials as well as your own Scopus API key
 GOOGLE_KEY_PATH = 'path/to/gcp/datastore/credentials.json'
 API_KEY = 'YOUR_SCOPUS_API_KEY'
+# Storage backend: 'datastore' for Google Cloud Datastore or 'sqlite' for a local SQLite file (no GCP credentials needed)
+STORAGE_BACKEND = 'datastore'
+SQLITE_DATABASE_FILE = 'atlas.sqlite'
@@ -0,0 +1,308 @@
+import sys, os, time, random, gc, tracemalloc, csv
+import networkx as nx
+import community as cmty
+import partition_engines
+import analysis_cache
+import graph_analyzer
+from datetime import datetime
+from storage import Storage, Article, Author, Keyword, Source, Affiliation, ARTICLE_KIND, AUTHOR_KIND, KEYWORD_KIND, AFFILIATION_KIND
+
+# Benchmarks on synthetic data, run with: python benchmarks.py memory [number of articles]
+#                                       or python benchmarks.py partition [number of authors]
+#                                       or python benchmarks.py author-graph [number of articles]
+# The author-graph one checks that the author graphs and sub-graphs built from the citation index have the same nodes and edges as the ones
+# of the loop over Author.get_cited_authors(), and compares their build times. It also tells whether the adjacency order is the same, which
+# it is not in general, so the partitions for a given seed differ between the two builders.
+BENCHMARK_ARTICLES = 500000
+BENCHMARK_SEED = 42
+BENCHMARK_FULL_ARTICLE_SHARE = 0.2 # The rest are reference stubs without eid, authors or keywords, like in the real database
+BENCHMARK_REFERENCES_PER_ARTICLE = 20
+BENCHMARK_AUTHORS_PER_ARTICLE = 3
+BENCHMARK_KEYWORDS_PER_ARTICLE = 6
+BENCHMARK_SOURCES = 3000
+BENCHMARK_PAGE_SIZE = 1000
+BENCHMARK_FIRST_AUID = 57000000000
+BENCHMARK_OBJECTS = 100000 # Objects created per class for the per-object measurement
+BENCHMARK_GRAPH_AUTHORS = 100000 # Authors of the synthetic author graph, when there is no exported one (see below)
+BENCHMARK_GRAPH_DEGREE = 20 # Average number of cited/citing authors
+BENCHMARK_GRAPH_MIXING = 0.3 # Share of the edges of an author that leave its community
+BENCHMARK_GRAPH_EDGES_FILE = 'author_graph_edges.csv' # Written by Analyzer with export_graph_data=True, used instead of the synthetic graph if present
+BENCHMARK_PARTITION_SEEDS = (0, 1, 2)
+BENCHMARK_AUTHOR_GRAPH_ARTICLES = 20000
+BENCHMARK_AUTHOR_GRAPH_PERIOD = (2000, 2010) # A shorter period, where the edges to authors outside of it are discarded
+
+WORDS = ("security attack graph network intrusion detection malware privacy cryptography authentication model threat analysis system cloud mobile "
+         "learning deep neural power grid smart contract blockchain protocol verification formal software vulnerability web browser android").split()
+
+def synthetic_auid(i):
+    # Numeric, like the Scopus author ids, since the author graphs use them as int nodes
+    return str(BENCHMARK_FIRST_AUID + i)
+
+class SyntheticStorage(Storage):
+    # Storage backend that serves a generated database, so that the load can be measured without a real backend
+    location = 'synthetic database'
+
+    def __init__(self, n_articles, **kwargs):
+        self.n_articles = n_articles
+        Storage.__init__(self, **kwargs)
+
+    def connect(self):
+        random.seed(BENCHMARK_SEED)
+        n_full = int(self.n_articles * BENCHMARK_FULL_ARTICLE_SHARE)
+        self.n_authors = max(n_full * BENCHMARK_AUTHORS_PER_ARTICLE // 2, 1)
+        self.n_keywords = max(n_full // 10, 1)
+        self.n_affiliations = max(self.n_authors // 50, 1)
+        self.surnames = ["Surname" + str(i) for i in range(max(self.n_authors // 4, 1))]
+        self.keyword_names = [" ".join(random.sample(WORDS, 2)) + " " + str(i) for i in range(self.n_keywords)]
+        self.keys = [str(i) for i in range(self.n_articles)]
+        self.full = set(random.sample(range(self.n_articles), n_full))
+
+    def fetch_record_pages(self, kind, properties):
+        rng = random.Random(BENCHMARK_SEED + len(kind))
+        if kind == AFFILIATION_KIND:
+            records = ((str(i), {'name': "University " + str(i), 'country': "Country" + str(i % 100)}) for i in range(self.n_affiliations))
+        elif kind == AUTHOR_KIND:
+            records = ((synthetic_auid(i), {'auid': synthetic_auid(i), 'surname': rng.choice(self.surnames), 'given_name': rng.choice("ABCDEFGHIJ") + ".",
+                                       'affiliation': str(rng.randrange(self.n_affiliations))}) for i in range(self.n_authors))
+        elif kind == KEYWORD_KIND:
+            records = ((str(i), {'name': name, 'count': rng.randint(1, 50)}) for i, name in enumerate(self.keyword_names))
+        else:
+            records = iter(())
+        page = []
+        for record in records:
+            page.append(record)
+            if len(page) == BENCHMARK_PAGE_SIZE:
+                yield page
+                page = []
+        if page:
+            yield page
+
+    def article_record(self, rng, i):
+        full = i in self.full
+        record = {'title': " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 12))).capitalize() + " " + str(i),
+                  'eid': "2-s2.0-" + str(i) if full else None,
+                  'date': str(rng.randint(1970, 2020)) + "-0" + str(rng.randint(1, 9)) + "-01",
+                  'source': "Journal " + str(rng.randrange(BENCHMARK_SOURCES)) if full else None,
+                  'first_author_surname': rng.choice(self.surnames),
+                  'authors_array': None, 'keywords_array': None, 'references_array': None,
+                  'references_are_updated': full, 'not_in_scopus': not full, 'out_of_scope': False, 'fully_scraped': full}
+        if full:
+            record['authors_array'] = [synthetic_auid(rng.randrange(self.n_authors)) for _ in range(BENCHMARK_AUTHORS_PER_ARTICLE)]
+            record['keywords_array'] = [rng.choice(self.keyword_names) for _ in range(BENCHMARK_KEYWORDS_PER_ARTICLE)]
+            record['references_array'] = [self.keys[rng.randrange(self.n_articles)] for _ in range(BENCHMARK_REFERENCES_PER_ARTICLE)]
+        return record
+
+    def fetch_article_pages(self, page_queue, start_year_filter=None, end_year_filter=None):
+        rng = random.Random(BENCHMARK_SEED)
+        try:
+            page = []
+            for i in range(self.n_articles):
+                page.append(self.article_record(rng, i))
+                if len(page) == BENCHMARK_PAGE_SIZE:
+                    if not page_queue.put(page): # The load was stopped
+                        return
+                    page = []
+            if page:
+                page_queue.put(page)
+        finally:
+            page_queue.put(None)
+
+    def load(self, start_year_filter=None, end_year_filter=None):
+        # The references point to generated indices, which only become article keys once the articles have been hashed
+        rng = random.Random(BENCHMARK_SEED)
+        hashes = [str(hash(Article(record['eid'], title=record['title'], fsurname=record['first_author_surname'], fully_scraped=record['fully_scraped'])))
+                  for record in (self.article_record(rng, i) for i in range(self.n_articles))]
+        self.keys = hashes
+        gc.collect()
+        tracemalloc.start()
+        start_time = time.time()
+        Storage.load(self, start_year_filter, end_year_filter)
+        self.load_time = time.time() - start_time
+        gc.collect()
+        self.load_memory, self.peak_load_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+def measure_objects(label, create):
+    gc.collect()
+    tracemalloc.start()
+    objects = [create(i) for i in range(BENCHMARK_OBJECTS)]
+    list_memory = sys.getsizeof(objects)
+    memory = tracemalloc.get_traced_memory()[0] - list_memory
+    tracemalloc.stop()
+    print("%-48s %8.1f bytes/object" % (label, memory / float(BENCHMARK_OBJECTS)))
+    del objects
+
+def memory_benchmark(n_articles):
+    print("Memory per object (" + str(BENCHMARK_OBJECTS) + " objects each):")
+    measure_objects("Article (reference stub)", lambda i: Article(None, title="Title " + str(i), fsurname="Surname" + str(i % 1000), date="2010"))
+    measure_objects("Article (stub, containers accessed)", lambda i: touch(Article(None, title="Title " + str(i), fsurname="Surname" + str(i % 1000), date="2010")))
+    measure_objects("Author", lambda i: Author(synthetic_auid(i), "Surname" + str(i % 1000), "A."))
+    measure_objects("Keyword", lambda i: Keyword("keyword " + str(i)))
+    measure_objects("Affiliation", lambda i: Affiliation(str(i), "University", "Sweden"))
+    measure_objects("Source", lambda i: Source("Journal " + str(i)))
+    print("Loading a synthetic database of " + str(n_articles) + " articles...")
+    stdout = sys.stdout
+    sys.stdout = open('/dev/null', 'w') # The load prints a lot
+    try:
+        synthetic_storage = SyntheticStorage(n_articles)
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+    database = synthetic_storage.database
+    n_references = sum(len(article.references) for article in database.articles.values() if article.fully_scraped)
+    print("Loaded " + str(len(database.articles)) + " articles, " + str(len(database.authors)) + " authors, " + str(len(database.keywords)) + " keywords and " +
+          str(n_references) + " references in " + "%.1f" % synthetic_storage.load_time + " seconds.")
+    print("Whole database: %.1f MB after the load (%.1f MB peak during the load), %.1f bytes per article." %
+          (synthetic_storage.load_memory / 1e6, synthetic_storage.peak_load_memory / 1e6, synthetic_storage.load_memory / float(len(database.articles))))
+
+def synthetic_author_graph(n_authors):
+    # Communities of power-law like sizes, most edges inside them, like the clusters of the real author graph
+    rng = random.Random(BENCHMARK_SEED)
+    community_of = []
+    members = []
+    while len(community_of) < n_authors:
+        size = min(int(rng.paretovariate(1.5) * 20), n_authors - len(community_of))
+        members.append(range(len(community_of), len(community_of) + size))
+        community_of.extend([len(members) - 1] * size)
+    edges = set()
+    for author in range(n_authors):
+        for _ in range(BENCHMARK_GRAPH_DEGREE // 2):
+            community = members[community_of[author]]
+            if rng.random() < BENCHMARK_GRAPH_MIXING or len(community) == 1:
+                other = rng.randrange(n_authors)
+            else:
+                other = community[rng.randrange(len(community))]
+            if other != author:
+                edges.add((min(author, other), max(author, other)))
+    graph = nx.Graph()
+    graph.add_nodes_from(range(n_authors))
+    graph.add_edges_from(sorted(edges))
+    return graph
+
+def read_author_graph(filename):
+    graph = nx.Graph()
+    with open(filename) as edges_file:
+        reader = csv.reader(edges_file)
+        next(reader) # Source,Target
+        graph.add_edges_from((int(row[0]), int(row[1])) for row in reader)
+    return graph
+
+def partition_benchmark(n_authors):
+    if os.path.isfile(BENCHMARK_GRAPH_EDGES_FILE) and n_authors is None:
+        print("Reading the exported author graph in '" + BENCHMARK_GRAPH_EDGES_FILE + "'...")
+        graph = read_author_graph(BENCHMARK_GRAPH_EDGES_FILE)
+    else:
+        print("Generating a synthetic author graph of " + str(n_authors or BENCHMARK_GRAPH_AUTHORS) + " authors...")
+        graph = synthetic_author_graph(n_authors or BENCHMARK_GRAPH_AUTHORS)
+    print("Author graph with " + str(graph.number_of_nodes()) + " nodes and " + str(graph.number_of_edges()) + " edges.")
+    missing_engines = [engine for engine in partition_engines.PARTITION_ENGINES if engine not in partition_engines.available_engines()]
+    if missing_engines:
+        print("Not installed: " + ", ".join(missing_engines))
+    print("%-16s %6s %10s %12s %12s" % ("engine", "seed", "seconds", "modularity", "communities"))
+    for engine in partition_engines.available_engines():
+        for seed in BENCHMARK_PARTITION_SEEDS:
+            start_time = time.time()
+            partition = partition_engines.best_partition(graph, engine=engine, randomize=seed)
+            partition_time = time.time() - start_time
+            # The same modularity function as Analyzer.create_partition()
+            print("%-16s %6d %10.2f %12.4f %12d" % (engine, seed, partition_time, cmty.modularity(partition, graph), max(partition.values()) + 1))
+
+def synthetic_analyzer(storage):
+    # Only what the graph builders of the Analyzer need, without its statistics and the partition of the author graph
+    analyzer = graph_analyzer.Analyzer.__new__(graph_analyzer.Analyzer)
+    analyzer.storage = storage
+    analyzer.export_graph_data = False
+    analyzer.author_citation_matrices = None
+    analyzer.cited_author_matrix = None
+    analyzer.author_graph_edge_list = None
+    return analyzer
+
+def adjacency_order(graph):
+    # The neighbors as lists, since comparing the adjacency dicts themselves would ignore their order
+    return [(node, list(neighbors)) for node, neighbors in graph.adjacency()]
+
+def same_graph(graph, other_graph):
+    return set(graph.nodes()) == set(other_graph.nodes()) and set(map(frozenset, graph.edges())) == set(map(frozenset, other_graph.edges()))
+
+def build_both(build):
+    # The graph built by the loop over get_cited_authors() and the one built from the citation index, with their build times
+    graphs = []
+    for vectorized in (False, True):
+        graph_analyzer.VECTORIZED_AUTHOR_GRAPH = vectorized
+        start_time = time.time()
+        graphs.append((build(), time.time() - start_time))
+    graph_analyzer.VECTORIZED_AUTHOR_GRAPH = True
+    return graphs
+
+def author_graph_check(n_articles):
+    print("Loading a synthetic database of " + str(n_articles) + " articles...")
+    stdout = sys.stdout
+    sys.stdout = open('/dev/null', 'w') # The load and the builders print a lot
+    try:
+        synthetic_storage = SyntheticStorage(n_articles)
+        synthetic_storage.database.update_author_article_records()
+        synthetic_storage.database.update_article_citation_records()
+        synthetic_storage.database.build_citation_index()
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+    analysis_cache.AUTHOR_GRAPH_CACHE_ENABLED = False # Both graphs are built every time
+    analyzer = synthetic_analyzer(synthetic_storage)
+    keyword = max(synthetic_storage.database.keywords.values(), key=lambda keyword: keyword.count).name
+    start_year, end_year = BENCHMARK_AUTHOR_GRAPH_PERIOD
+    checks = [("full period", lambda: analyzer.initialize_author_graph(1945, datetime.now().year, "")),
+              ("period " + str(start_year) + "-" + str(end_year), lambda: analyzer.initialize_author_graph(start_year, end_year, "")),
+              ("keyword '" + keyword + "'", lambda: analyzer.initialize_author_graph(1945, datetime.now().year, keyword))]
+    # Sub-graphs of (sub-)communities, whose authors come in the order of the community
+    auids = list(synthetic_storage.database.authors.keys())
+    random.Random(BENCHMARK_SEED).shuffle(auids)
+    for n_sub_graph_authors in (len(auids) // 20, len(auids) // 4):
+        checks.append(("sub-graph of " + str(n_sub_graph_authors) + " authors", lambda auids=auids[:n_sub_graph_authors]: analyzer.initialize_sub_graph(auids)))
+    print("%-40s %8s %8s %10s %10s %10s %s" % ("graph", "nodes", "edges", "loop", "index", "same graph", "same adjacency order"))
+    failed = False
+    for label, build in checks:
+        stdout = sys.stdout
+        sys.stdout = open('/dev/null', 'w')
+        try:
+            (loop_graph, loop_time), (index_graph, index_time) = build_both(build)
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+        same = same_graph(loop_graph, index_graph)
+        failed = failed or not same
+        print("%-40s %8d %8d %9.2fs %9.2fs %10s %s" % (label, index_graph.number_of_nodes(), index_graph.number_of_edges(), loop_time, index_time, same,
+                                                     adjacency_order(loop_graph) == adjacency_order(index_graph)))
+    # The author graphs of the time windows are built from the cited authors precomputed for all the authors
+    stdout = sys.stdout
+    sys.stdout = open('/dev/null', 'w')
+    try:
+        loop_graph = build_both(checks[1][1])[0][0]
+        analyzer.precompute_cited_authors()
+        window_graph = checks[1][1]()
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+    same = same_graph(loop_graph, window_graph)
+    failed = failed or not same
+    print("%-40s %8d %8d %10s %10s %10s %s" % (checks[1][0] + " (precomputed)", window_graph.number_of_nodes(), window_graph.number_of_edges(), "", "", same,
+                                             adjacency_order(loop_graph) == adjacency_order(window_graph)))
+    if failed:
+        print("ERROR: The author graphs built from the citation index differ from the ones of the loop!")
+        sys.exit(1)
+
+def touch(article):
+    article.authors, article.keywords, article.references, article.citations
+    return article
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in ('memory', 'partition', 'author-graph'):
+        print("Usage: python benchmarks.py memory [number of articles]")
+        print("       python benchmarks.py partition [number of authors]")
+        print("       python benchmarks.py author-graph [number of articles]")
+        sys.exit(1)
+    if sys.argv[1] == 'memory':
+        memory_benchmark(int(sys.argv[2]) if len(sys.argv) > 2 else BENCHMARK_ARTICLES)
+    elif sys.argv[1] == 'partition':
+        partition_benchmark(int(sys.argv[2]) if len(sys.argv) > 2 else None)
+    elif sys.argv[1] == 'author-graph':
+        author_graph_check(int(sys.argv[2]) if len(sys.argv) > 2 else BENCHMARK_AUTHOR_GRAPH_ARTICLES)
@@ -0,0 +1,174 @@
+import time, hashlib
+import numpy as np
+
+YEAR_UNKNOWN = -1 # Year of the articles without a (parsable) date
+
+def csr_from_lists(lists, dtype=np.int32):
+    # Packs a list of integer lists into (indptr, indices) arrays
+    indptr = np.zeros(len(lists) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(l) for l in lists])
+    indices = np.fromiter((i for l in lists for i in l), dtype=dtype, count=int(indptr[-1]))
+    return indptr, indices
+
+def transpose_csr(indptr, indices, n_columns):
+    # Returns the (indptr, indices) of the transposed adjacency, with the rows of every column in increasing order
+    rows = np.repeat(np.arange(len(indptr) - 1, dtype=indices.dtype), np.diff(indptr))
+    order = np.argsort(indices, kind='stable')
+    transposed_indptr = np.zeros(n_columns + 1, dtype=np.int64)
+    transposed_indptr[1:] = np.cumsum(np.bincount(indices, minlength=n_columns))
+    return transposed_indptr, rows[order]
+
+def gather(indptr, indices, rows):
+    # The concatenated columns of the given rows
+    rows = np.asarray(rows, dtype=np.int64)
+    if len(rows) == 0:
+        return indices[:0]
+    starts = indptr[rows]
+    lengths = indptr[rows + 1] - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return indices[:0]
+    # Position of every gathered element in indices: the start of its row plus its offset within the row
+    offsets = np.arange(total, dtype=np.int64) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return indices[np.repeat(starts, lengths) + offsets]
+
+class CitationIndex(object):
+    # Integer-indexed (CSR) snapshot of the citation graph of a Database, built after the load with Database.build_citation_index().
+    # Articles and authors get dense ids in the order of database.articles and database.authors. The index is not updated
+    # when the database changes, so it has to be built again after scraping or merging.
+
+    def __init__(self, database):
+        start_time = time.time()
+        self.articles = list(database.articles.values())
+        self.n_database_articles = len(self.articles)
+        self.authors = list(database.authors.values())
+        article_ids = dict((id(article), i) for i, article in enumerate(self.articles)) # By identity, so that no hashing is involved
+        self.author_ids = dict((author.auid, i) for i, author in enumerate(self.authors))
+        self.n_missing_authors = 0
+        references = []
+        authors = []
+        i_article = 0
+        while i_article < len(self.articles):
+            article = self.articles[i_article]
+            if i_article < self.n_database_articles:
+                reference_ids = []
+                for reference in article.references:
+                    reference_id = article_ids.get(id(reference))
+                    if reference_id is None:
+                        # Referenced but not in database.articles (e.g. replaced by an article with the same hash). It gets an id after
+                        # the articles of the database, so that its authors are still found, but its own references are not followed.
+                        reference_id = article_ids[id(reference)] = len(self.articles)
+                        self.articles.append(reference)
+                    reference_ids.append(reference_id)
+            else:
+                reference_ids = []
+            author_ids = [self.author_ids.get(author.auid) for author in article.authors]
+            if None in author_ids:
+                self.n_missing_authors += author_ids.count(None)
+                author_ids = [i for i in author_ids if i is not None]
+            references.append(sorted(reference_ids))
+            authors.append(sorted(set(author_ids)))
+            i_article += 1
+        self.in_database = np.zeros(len(self.articles), dtype=bool)
+        self.in_database[:self.n_database_articles] = True
+        # article -> referenced articles, article -> authors and their transposes. Like Author.articles, author -> articles only has the articles of the database.
+        self.reference_indptr, self.reference_indices = csr_from_lists(references)
+        self.author_indptr, self.author_indices = csr_from_lists(authors)
+        self.citation_indptr, self.citation_indices = transpose_csr(self.reference_indptr, self.reference_indices, len(self.articles))
+        database_author_indptr = self.author_indptr[:self.n_database_articles + 1]
+        self.author_article_indptr, self.author_article_indices = transpose_csr(database_author_indptr, self.author_indices[:database_author_indptr[-1]], len(self.authors))
+        self.years = np.array([self.article_year(article) for article in self.articles], dtype=np.int32)
+        self.has_eid = np.array([article.eid is not None for article in self.articles], dtype=bool)
+        self.cached_fingerprint = None
+        print("Built the citation index of " + str(self.n_database_articles) + " articles, " + str(len(self.authors)) + " authors and " +
+              str(len(self.reference_indices)) + " references in " + str(time.time() - start_time) + " seconds.")
+        if len(self.articles) > self.n_database_articles or self.n_missing_authors:
+            print("WARNING: " + str(len(self.articles) - self.n_database_articles) + " referenced articles are not in database.articles (indexed after its articles) and " +
+                  str(self.n_missing_authors) + " article authors are not in database.authors (left out of the index).")
+
+    @staticmethod
+    def article_year(article):
+        try:
+            return int(article.date[0:4])
+        except Exception:
+            return YEAR_UNKNOWN
+
+    def n_articles(self):
+        # Including the referenced articles that are not in the database, see in_database
+        return len(self.articles)
+
+    def n_authors(self):
+        return len(self.authors)
+
+    def n_references(self):
+        return len(self.reference_indices)
+
+    def citation_counts(self):
+        # Number of articles in the database that cite each article (the same as len(article.citations) after update_article_citation_records())
+        return np.diff(self.citation_indptr)
+
+    def fingerprint(self):
+        # Hash of the citation graph of the index (author ids, years and the reference and author lists), which identifies the dataset
+        # for the caches of results derived from it (see analysis_cache.py)
+        if self.cached_fingerprint is None:
+            digest = hashlib.sha256()
+            digest.update(np.array([int(author.auid) for author in self.authors], dtype=np.int64).tobytes())
+            for array in (self.years, self.reference_indptr, self.reference_indices, self.author_indptr, self.author_indices, self.author_article_indptr, self.author_article_indices):
+                digest.update(np.int64(len(array)).tobytes())
+                digest.update(np.ascontiguousarray(array).tobytes())
+            self.cached_fingerprint = digest.hexdigest()
+        return self.cached_fingerprint
+
+    def references_of(self, article_id):
+        return self.reference_indices[self.reference_indptr[article_id]:self.reference_indptr[article_id + 1]]
+
+    def citations_of(self, article_id):
+        return self.citation_indices[self.citation_indptr[article_id]:self.citation_indptr[article_id + 1]]
+
+    def authors_of(self, article_id):
+        return self.author_indices[self.author_indptr[article_id]:self.author_indptr[article_id + 1]]
+
+    def articles_of(self, author_id):
+        return self.author_article_indices[self.author_article_indptr[author_id]:self.author_article_indptr[author_id + 1]]
+
+    def cited_author_ids(self, author_id):
+        # Dense ids of the authors of the articles referenced by the articles of an author (the same set as Author.get_cited_authors())
+        referenced_articles = gather(self.reference_indptr, self.reference_indices, self.articles_of(author_id))
+        return np.unique(gather(self.author_indptr, self.author_indices, referenced_articles))
+
+    def cited_authors(self, author):
+        return set([self.authors[i] for i in self.cited_author_ids(self.author_ids[author.auid])])
+
+    def cited_author_pairs(self):
+        # All the (citing author, cited author) pairs at once, as two arrays of dense ids sorted by citing and then cited author.
+        # The cited authors of every author are the same as with cited_author_ids(), without a Python loop over the authors.
+        article_lengths = np.diff(self.author_indptr)
+        citing_articles = np.repeat(np.arange(len(self.articles), dtype=np.int64), article_lengths)
+        citing_authors = self.author_indices.astype(np.int64)
+        # (citing author, referenced article)
+        reference_lengths = np.diff(self.reference_indptr)[citing_articles]
+        referenced_articles = gather(self.reference_indptr, self.reference_indices, citing_articles)
+        citing_authors = np.repeat(citing_authors, reference_lengths)
+        # (citing author, cited author)
+        cited_lengths = np.diff(self.author_indptr)[referenced_articles]
+        cited_authors = gather(self.author_indptr, self.author_indices, referenced_articles).astype(np.int64)
+        citing_authors = np.repeat(citing_authors, cited_lengths)
+        pairs = np.unique(citing_authors * len(self.authors) + cited_authors)
+        return pairs // max(len(self.authors), 1), pairs % max(len(self.authors), 1)
+
+    def author_citation_counts(self):
+        # Citations of every author summed over all their articles in the database
+        article_authors = np.repeat(np.arange(len(self.articles), dtype=np.int64), np.diff(self.author_indptr))
+        return np.bincount(self.author_indices, weights=(self.citation_counts() * self.in_database)[article_authors], minlength=len(self.authors)).astype(np.int64)
+
+    def annual_counts(self, mask=None, weights=None):
+        # Sorted (year, count) pairs over the articles selected by mask (all with a known year by default), optionally weighted
+        selected = self.years != YEAR_UNKNOWN
+        if mask is not None:
+            selected &= mask
+        years = self.years[selected]
+        if len(years) == 0:
+            return []
+        first_year = int(years.min())
+        counts = np.bincount(years - first_year, weights=None if weights is None else weights[selected])
+        return [(first_year + i, int(count)) for i, count in enumerate(counts) if count]
@@ -3,16 +3,24 @@ import community as cmty
 import networkx as nx
 import matplotlib.pyplot as plt
 import pandas as pd
-from storage import CloudStorage, Keyword, Database
+import storage
+from storage import create_storage, Keyword, Database
+import snapshot
+import partition_engines
+import analysis_cache
+import incremental_partition
+import sub_community_analysis
 import choropleth_plotter as choro_plot
 import plotly_graph_plotter as graph_plot
 import operator
 import sys, os
 import numpy
+import scipy.sparse
 import math
 import time
 import json
 import csv
+import hashlib
 import random
 
 # Defines for Analysis
@@ -21,15 +29,18 @@ KEYWORD_TRUNCATION_THRESHOLD = 50
 COMMUNITY_ARTICLES_TO_PRINT = 250
 COMMUNITY_KEYWORDS_TO_PRINT = 20
 COMMUNITY_SOURCES_TO_PRINT = 15
+VECTORIZED_AUTHOR_GRAPH = True # Build the author graph from the citation index instead of the loop over the authors (the same graph, but another adjacency order, see build_author_graph())
+PARALLEL_SUB_COMMUNITY_ANALYSIS = True # Partition the sub-graphs of the communities in a pool of processes (see sub_community_analysis.py)
 
 class Community:
 
-    def __init__(self, database, auids, partition_id, excluded_keywords, affiliation_dict, community_names_so_far=[]):
+    def __init__(self, database, auids, partition_id, excluded_keywords, affiliation_dict, community_names_so_far=[], name=None):
         self.database = database
         self.authors = set([])
         self.partition_id = partition_id
         # Because the main scraper doesn't find the afiliation names, but only the affiliation ids, we produce an id-name-dictionary elsewhere (in the auxilliary_scraper.py).
         self.affiliation_dict = affiliation_dict # Removed hard coded dictionary form here!
+        self.cached_statistics = None # See statistics()
 
         for auid in auids:
             auth = database.authors.get(str(auid))
@@ -37,6 +48,9 @@ class Community:
                 print("Author with auid='" + str(auid) + "' was not found for community '" + str(partition_id) + "' and returned None.")
             else:
                 self.authors.add(auth)
+        if name is not None: # Already named, e.g. in another process by sub_community_analysis.py
+            self.name = name
+            return
         # This below line was the old and complex way of determining the community name
         # pruned_keywords = [kw[0] for kw in self.most_influential_keywords(10) if kw[0] not in excluded_keywords and kw[0] not in community_names_so_far]
         found_name = None
@@ -68,48 +82,25 @@ class Community:
     def auids(self):
         return [author.auid for author in self.authors]
 
+    def statistics(self):
+        # All the aggregates below are computed once per community, see CommunityStatistics
+        if self.cached_statistics is None:
+            self.cached_statistics = CommunityStatistics(self)
+        return self.cached_statistics
+
     def articles(self):
-        articles = set([])
-        for author in self.authors:
-            for article in author.articles:
-                articles.add(article)
-        return articles
+        return set(self.statistics().articles)
 
     def keywords(self, length):
-        community_keywords = dict()
-        for author in self.authors:
-            author_keywords = author.keywords()
-            for keyword, frequency in author_keywords.items():
-                if keyword.name in community_keywords:
-                    community_keywords[keyword.name] += frequency
-                else:
-                    community_keywords[keyword.name] = frequency
-        sorted_truncated_keywords = sorted(list(community_keywords.items()), key=operator.itemgetter(1), reverse=True)[0:length]
+        sorted_truncated_keywords = sorted(list(self.statistics().keywords.items()), key=operator.itemgetter(1), reverse=True)[0:length]
         return sorted_truncated_keywords
 
     def just_keywords(self, length):
-        community_keywords = dict()
-        for author in self.authors:
-            author_keywords = author.keywords()
-            for keyword, frequency in author_keywords.items():
-                if keyword.name in community_keywords:
-                    community_keywords[keyword.name] += frequency
-                else:
-                    community_keywords[keyword.name] = frequency
-        sorted_truncated_keywords = [key for key,value in sorted(list(community_keywords.items()), key=operator.itemgetter(1), reverse=True)][0:length]
+        sorted_truncated_keywords = [key for key,value in sorted(list(self.statistics().keywords.items()), key=operator.itemgetter(1), reverse=True)][0:length]
         return sorted_truncated_keywords
 
     def sources(self, length):
-        community_sources = dict()
-        for author in self.authors:
-            author_sources = author.sources()
-            for source, frequency in author_sources.items():
-                if source != None:
-                    if source.name in community_sources:
-                        community_sources[source.name] += frequency
-                    else:
-                        community_sources[source.name] = frequency
-        sorted_truncated_sources = sorted(list(community_sources.items()), key=operator.itemgetter(1), reverse=True)[0:length]
+        sorted_truncated_sources = sorted(list(self.statistics().sources.items()), key=operator.itemgetter(1), reverse=True)[0:length]
         return sorted_truncated_sources
 
     # Implemented by me (Sotirios) but not used due to high computational complexity! It is also not needed.
@@ -132,93 +123,38 @@ class Community:
     # This method returns the most cited 'everything' (i.e. articles, authors and yearly citations) by this community as well as the most by community cited articles and the intra-community cited articles.
     def most_cited_x_in_community(self, main_analysis=False):
         CITATION_CONSIDER_PRODUCED_BY_THRESHOLD = 1 # Only articles cited more than this number will be considered when intersecting cited by community and produced by community articles below.
-        tmp_community_articles = set([])
-        articles = dict()
-        authors = dict()
-        yearly_citations = dict()
-        citations = dict()
-        intra_citations = dict()
-        for author in self.authors:
-            for article in author.articles:
-                tmp_community_articles.add(article) # Saving all community author articles in a set for later use
-                # First articles produced by the community
-                if article.description_with_year() not in articles:
-                    articles[article.description_with_year()] = len(article.citations)
-                # Then authors belonging to community
-                if author.full_name() not in authors:
-                    authors[author.full_name()] = len(article.citations)
-                    if main_analysis: # If main analysis is pefromed at this call, update the citation count on community.authors
-                        author.citation_cnt = len(article.citations)
-                else:
-                    authors[author.full_name()] += len(article.citations)
-                    if main_analysis:
-                        author.citation_cnt += len(article.citations)
-                # Finally, yearly community citations
-                if int(article.date[:4]) not in yearly_citations:
-                    yearly_citations[int(article.date[:4])] = len(article.citations)
-                else:
-                    yearly_citations[int(article.date[:4])] += len(article.citations)
-        # Now get the articles cited by the community
-        for article in tmp_community_articles:
-            for reference in article.references:
-                # This is for the global citations (all cited articles)
-                if reference.description_with_year() in citations:
-                    citations[reference.description_with_year()] += 1
-                else:
-                    citations[reference.description_with_year()] = 1
-                # And this is for the intra-community citations (community articles that are cited by the community)
-                if reference.description_with_year() in articles:
-                    if reference.description_with_year() in intra_citations:
-                        intra_citations[reference.description_with_year()] += 1
-                    else:
-                        intra_citations[reference.description_with_year()] = 1
+        statistics = self.statistics()
+        citations, intra_citations = statistics.reference_statistics()
+        if main_analysis: # If main analysis is pefromed at this call, update the citation count on community.authors
+            for author, author_citations, first_with_full_name in statistics.author_citation_counts:
+                if first_with_full_name:
+                    author.citation_cnt = author_citations
+                else: # Authors with the same full name add up, like before
+                    author.citation_cnt += author_citations
+            statistics.affiliations = None # They are ranked by citation_cnt
         # Update the articles produced by the community with the intersection with the ones cited by the community to only get those truly produced by the community
         # i.e. Articles produced by community: Articles produced by the community that are also (the most) cited by the community (with more than one citations).
         list_of_cited_articles = [k for (k,v) in citations.items() if v > CITATION_CONSIDER_PRODUCED_BY_THRESHOLD]
-        keys = set(list_of_cited_articles).intersection(set(articles.keys()))
-        result = {k:articles[k] for k in keys}
-        articles = result # Updated and integrated list of articles produced by the community
+        keys = set(list_of_cited_articles).intersection(set(statistics.produced_articles.keys()))
+        articles = {k:statistics.produced_articles[k] for k in keys} # Updated and integrated list of articles produced by the community
         # Finally sort them to create the lists
         citation_sorted_community_articles = sorted(list(articles.items()), key=operator.itemgetter(1), reverse=True)
         # Only get authors with citations > 0
-        citation_sorted_authors = sorted([items for items in authors.items() if items[1] > 0], key=operator.itemgetter(1), reverse=True)
-        # citation_sorted_authors = sorted(list(authors.items()), key=operator.itemgetter(1), reverse=True)
-        citation_sorted_years = sorted(list(yearly_citations.items()), key=operator.itemgetter(1), reverse=True)
+        citation_sorted_authors = sorted([items for items in statistics.author_citations.items() if items[1] > 0], key=operator.itemgetter(1), reverse=True)
+        citation_sorted_years = sorted(list(statistics.yearly_citations.items()), key=operator.itemgetter(1), reverse=True)
         sorted_cited_articles = sorted(list(citations.items()), key=operator.itemgetter(1), reverse=True)
         sorted_intra_community_cited_articles = sorted(list(intra_citations.items()), key=operator.itemgetter(1), reverse=True)
         return [citation_sorted_community_articles, citation_sorted_authors, citation_sorted_years, sorted_cited_articles, sorted_intra_community_cited_articles]
     
     def most_cited_x_in_community_by_id(self):
-        articles = dict()
-        authors = dict()
-        yearly_citations = dict()
-        for author in self.authors:
-            for article in author.articles:
-                # First articles
-                if article.eid not in articles:
-                    articles[article.eid] = len(article.citations)
-                else:
-                    articles[article.eid] += len(article.citations)
-                # Then authors
-                if author.auid not in authors:
-                    authors[author.auid] = len(article.citations)
-                else:
-                    authors[author.auid] += len(article.citations)
-                # Finally, yearly citations
-                if article.date[:4] not in yearly_citations:
-                    yearly_citations[article.date[:4]] = len(article.citations)
-                else:
-                    yearly_citations[article.date[:4]] += len(article.citations)
-        citation_sorted_articles = [key for key,value in sorted(list(articles.items()), key=operator.itemgetter(1), reverse=True)]
-        citation_sorted_authors = [key for key,value in sorted(list(authors.items()), key=operator.itemgetter(1), reverse=True)]
-        citation_sorted_years = [key for key,value in sorted(list(yearly_citations.items()), key=operator.itemgetter(1), reverse=True)]
+        statistics = self.statistics()
+        citation_sorted_articles = [key for key,value in sorted(list(statistics.article_citations_by_id.items()), key=operator.itemgetter(1), reverse=True)]
+        citation_sorted_authors = [key for key,value in sorted(list(statistics.author_citations_by_id.items()), key=operator.itemgetter(1), reverse=True)]
+        citation_sorted_years = [key for key,value in sorted(list(statistics.yearly_citations_by_id.items()), key=operator.itemgetter(1), reverse=True)]
         return [citation_sorted_articles, citation_sorted_authors, citation_sorted_years]
 
     def median_article_publication_date(self):
-        publication_dates = []
-        for author in self.authors:
-            for article in author.articles:
-                publication_dates.append(article.date)
+        publication_dates = list(self.statistics().publication_dates)
         publication_dates.sort()
         publication_dates = [d for d in publication_dates if d]
         if publication_dates:
@@ -227,21 +163,108 @@ class Community:
             return [None, None, None]
 
     def annual_article_count(self):
-        article_count = dict()
-        for article in self.articles():
-            try:
-                year = int(article.date[0:4])
-                if year in article_count:
-                    article_count[year] += 1
-                else:
-                    article_count[year] = 1
-            except Exception as e:
-                print(e)
-                raise
-        return sorted(iter(article_count.items()), key=operator.itemgetter(0))
+        return self.statistics().annual_article_count()
 
     # This method returns the most 'everything' (i.e. common, influential and by country) affiliations of this community.
     def most_x_affiliations_in_community(self):
+        # For the influential affiliations it is assumed that the "most_cited_x_in_community" method is ran before this method (see Author.citation_cnt).
+        return self.statistics().affiliation_statistics(self.affiliation_dict)
+
+    # This method should be used for the generation of better community names. It sorts keywords based on citations (i.e. how many articles cite the articles that have that keyword)
+    def most_influential_keywords(self, length):
+        sorted_most_influential_keywords = sorted(iter(self.statistics().influential_keywords.items()), key=operator.itemgetter(1), reverse=True)[0:length]
+        return sorted_most_influential_keywords
+
+class CommunityStatistics(object):
+    # The aggregates of a community, computed in one pass over the articles of its authors instead of one pass per Community method.
+    # The authors and articles are visited in the same order as in those passes, so that the rankings break ties in the same way.
+    # The references and the affiliations are only aggregated when they are first needed.
+
+    def __init__(self, community):
+        self.authors = community.authors
+        self.articles = set([]) # The articles of the community authors
+        self.keywords = dict() # Keyword name -> number of articles with it (once per community author of the article)
+        self.influential_keywords = dict() # Keyword name -> citations of those articles
+        self.sources = dict() # Source name -> number of articles
+        self.produced_articles = dict() # Article description with year -> citations
+        self.author_citations = dict() # Author full name -> citations of the author's articles
+        self.author_citation_counts = [] # (author, citations, whether no earlier author has the same full name), for Author.citation_cnt
+        self.yearly_citations = dict() # Year -> citations of the articles of that year
+        self.article_citations_by_id = dict() # eid -> citations (once per author of the article)
+        self.author_citations_by_id = dict() # auid -> citations
+        self.yearly_citations_by_id = dict() # Year (string) -> citations
+        self.publication_dates = []
+        self.references = None # See reference_statistics()
+        self.affiliations = None # See affiliation_statistics()
+        self.annual_article_counts = None
+        for author in community.authors:
+            author_citations = 0
+            n_author_articles = 0
+            for article in author.articles:
+                n_citations = len(article.citations)
+                n_author_articles += 1
+                author_citations += n_citations
+                self.articles.add(article)
+                for keyword in article.keywords:
+                    self.keywords[keyword.name] = self.keywords.get(keyword.name, 0) + 1
+                    self.influential_keywords[keyword.name] = self.influential_keywords.get(keyword.name, 0) + n_citations
+                if article.source is not None:
+                    self.sources[article.source.name] = self.sources.get(article.source.name, 0) + 1
+                description = article.description_with_year()
+                if description not in self.produced_articles:
+                    self.produced_articles[description] = n_citations
+                self.article_citations_by_id[article.eid] = self.article_citations_by_id.get(article.eid, 0) + n_citations
+                self.publication_dates.append(article.date)
+                if article.date is not None: # Articles without a date are left out of the yearly citations
+                    try:
+                        year = int(article.date[:4])
+                        self.yearly_citations[year] = self.yearly_citations.get(year, 0) + n_citations
+                    except ValueError:
+                        pass
+                    self.yearly_citations_by_id[article.date[:4]] = self.yearly_citations_by_id.get(article.date[:4], 0) + n_citations
+            if n_author_articles:
+                full_name = author.full_name()
+                self.author_citation_counts.append((author, author_citations, full_name not in self.author_citations))
+                self.author_citations[full_name] = self.author_citations.get(full_name, 0) + author_citations
+                self.author_citations_by_id[author.auid] = self.author_citations_by_id.get(author.auid, 0) + author_citations
+
+    def reference_statistics(self):
+        # Articles cited by the community (description with year -> citations), and the ones of those that are produced by the community
+        if self.references is None:
+            citations = dict()
+            intra_citations = dict()
+            for article in self.articles:
+                for reference in article.references:
+                    description = reference.description_with_year()
+                    citations[description] = citations.get(description, 0) + 1
+                    if description in self.produced_articles:
+                        intra_citations[description] = intra_citations.get(description, 0) + 1
+            self.references = (citations, intra_citations)
+        return self.references
+
+    def annual_article_count(self):
+        if self.annual_article_counts is None:
+            article_count = dict()
+            for article in self.articles:
+                try:
+                    year = int(article.date[0:4])
+                    if year in article_count:
+                        article_count[year] += 1
+                    else:
+                        article_count[year] = 1
+                except Exception as e:
+                    print(e)
+                    raise
+            self.annual_article_counts = sorted(iter(article_count.items()), key=operator.itemgetter(0))
+        return list(self.annual_article_counts)
+
+    def affiliation_statistics(self, affiliation_dict):
+        # The six affiliation rankings of Community.most_x_affiliations_in_community(), computed once (until Author.citation_cnt is updated)
+        if self.affiliations is None:
+            self.affiliations = self.rank_affiliations(affiliation_dict)
+        return self.affiliations
+
+    def rank_affiliations(self, affiliation_dict):
         # Construct two dictionaries containing the number of authors and author citations for each affiliation id.
         appearance_affiliation_dict = dict()
         influence_affiliation_dict = dict()
@@ -257,13 +280,13 @@ class Community:
                     appearance_affiliation_dict[author.affiliation.id] = 1
         # We also need another dictionary that will hold the articles produced by each affiliation id.
         affiliation_articles_dict = dict()
-        articles_so_far = []
+        articles_so_far = set([])
         for author in self.authors:
             for article in author.articles:
                 if article.eid in articles_so_far:
                     continue
                 else:
-                    articles_so_far.append(article.eid)
+                    articles_so_far.add(article.eid)
                     article_aff_ids = []
                     for author in article.authors:
                         if author.affiliation.id not in article_aff_ids:
@@ -279,13 +302,13 @@ class Community:
         most_influential_affiliation_countries = dict()
         for (idnum, freq) in sorted_most_influential_affiliation_ids:
             try:
-                affiliation_name = self.affiliation_dict[idnum].name
+                affiliation_name = affiliation_dict[idnum].name
             except KeyError as e:
                 affiliation_name = "Unknown Affiliation"
             sorted_most_influential_affiliation_names.append((affiliation_name, freq))
             # Now get the affiliation country
             try:
-                affiliation_country = self.affiliation_dict[idnum].country
+                affiliation_country = affiliation_dict[idnum].country
             except KeyError as e:
                 affiliation_country = "Unknown Country"
             if affiliation_country in most_influential_affiliation_countries:
@@ -299,13 +322,13 @@ class Community:
         affiliation_countries = dict()
         for (idnum, freq) in sorted_affiliation_ids:
             try:
-                affiliation_name = self.affiliation_dict[idnum].name
+                affiliation_name = affiliation_dict[idnum].name
             except KeyError as e:
                 affiliation_name = "Unknown Affiliation"
             sorted_affiliation_names.append((affiliation_name, freq))
             # Now get the affiliation country
             try:
-                affiliation_country = self.affiliation_dict[idnum].country
+                affiliation_country = affiliation_dict[idnum].country
             except KeyError as e:
                 affiliation_country = "Unknown Country"
             if affiliation_country in affiliation_countries:
@@ -319,13 +342,13 @@ class Community:
         article_affiliation_countries = dict()
         for (idnum, freq) in article_sorted_affiliation_ids:
             try:
-                affiliation_name = self.affiliation_dict[idnum].name
+                affiliation_name = affiliation_dict[idnum].name
             except KeyError as e:
                 affiliation_name = "Unknown Affiliation"
             article_sorted_affiliation_names.append((affiliation_name, freq))
             # Now get the affiliation country
             try:
-                affiliation_country = self.affiliation_dict[idnum].country
+                affiliation_country = affiliation_dict[idnum].country
             except KeyError as e:
                 affiliation_country = "Unknown Country"
             if affiliation_country in article_affiliation_countries:
@@ -336,21 +359,36 @@ class Community:
         # And return everything
         return [article_sorted_affiliation_names, sorted_most_influential_affiliation_names, article_sorted_affiliation_countries, sorted_most_influential_affiliation_countries, sorted_affiliation_names, sorted_affiliation_countries]
 
-    # This method should be used for the generation of better community names. It sorts keywords based on citations (i.e. how many articles cite the articles that have that keyword)
-    def most_influential_keywords(self, length):
-        keyword_dict = dict()
-        for author in self.authors:
-            for article in author.articles:
-                for keyword in article.keywords:
-                    if keyword.name in keyword_dict:
-                        keyword_dict[keyword.name] += len(article.citations)
-                    else:
-                        keyword_dict[keyword.name] = len(article.citations)
-        sorted_most_influential_keywords = sorted(iter(keyword_dict.items()), key=operator.itemgetter(1), reverse=True)[0:length]
-        return sorted_most_influential_keywords
+class PartitionIndex(object):
+    # Lookups over one partition ({auid: community id}) and its communities, built once instead of scanning the partition or the
+    # list of communities for every community id.
+
+    def __init__(self, partition):
+        self.partition = partition
+        self.n_communities = max(partition.values()) + 1 if partition else 0
+        self.members = [[] for i_community in range(self.n_communities)] # Community id -> auids, in the order of the partition
+        for auid, i_community in partition.items():
+            self.members[i_community].append(auid)
+        self.community_list = None
+        self.communities = None # Community id -> Community, see add_communities()
+        self.citation_matrix = None # See Analyzer.community_citation_matrix()
+
+    def add_communities(self, communities):
+        self.community_list = communities
+        self.communities = dict((community.partition_id, community) for community in communities)
+
+    def community_authors(self, i_community):
+        return self.members[i_community]
+
+    def community(self, i_community):
+        return self.communities[i_community]
+
+    def community_of(self, auid):
+        # Community id of an author (auid as str or int), None if not in the partition
+        return self.partition.get(int(auid))
 
 class Analyzer:
-    def __init__(self, database=None, automated=True, start_year=1945, end_year=datetime.now().year, keyword="", randomize=False, cmt_rename_list_file="communities_rename_list.csv", excluded_communities_list_file="excluded_communities_list.csv", detailed_global_analysis=False, sub_com_analysis=False, sub2_com_analysis=False, community_size_threshold=75, sub_community_size_threshold_divider=4, modularity_threshold=None, export_graph_data=False):
+    def __init__(self, database=None, automated=True, start_year=1945, end_year=datetime.now().year, keyword="", randomize=False, cmt_rename_list_file="communities_rename_list.csv", excluded_communities_list_file="excluded_communities_list.csv", detailed_global_analysis=False, sub_com_analysis=False, sub2_com_analysis=False, community_size_threshold=75, sub_community_size_threshold_divider=4, modularity_threshold=None, export_graph_data=False, use_snapshot=True, partition_engine=partition_engines.DEFAULT_PARTITION_ENGINE, partition_graph=True, warm_start=False, warm_start_cold_comparison=False, build_graph=True, use_author_graph_cache=True):
         print("Initializing analyzer...")
         if os.path.isfile(cmt_rename_list_file):
             print("Reading cmt_rename_list_file...")
@@ -398,8 +436,10 @@ class Analyzer:
         self.sub_community_size_threshold_divider = sub_community_size_threshold_divider
         self.modularity_threshold_fullfiled = True # Default is true so that it only changes value when 'modularity_threshold' is set
         self.export_graph_data = export_graph_data
+        self.partition_engine = partition_engine # See partition_engines.PARTITION_ENGINES
+        self.warm_start_cold_comparison = warm_start_cold_comparison # Also partition from singletons to report the gain of the warm start
         self.start_time = time.time()
-        self.storage = self.initialize_storage(database=database, automated=automated)
+        self.storage = self.initialize_storage(database=database, automated=automated, use_snapshot=use_snapshot)
         self.affiliation_dict = self.storage.database.affiliations
         self.print_statistics(citation_threshold=CITATION_TRUNCATION_THRESHOLD, detailed_global_analysis=detailed_global_analysis)
         self.excluded_keywords = ('cyber security', 'cyber-attacks', 'security breaches', 'security', 'information security', 
@@ -421,9 +461,31 @@ class Analyzer:
         #                "tomato", "OrangeRed", "red", "HotPink", "DeepPink", "pink", "LightPink", "PaleVioletRed",
         #                "MediumVioletRed", "magenta", "violet", "plum", "orchid", "MediumOrchid"]
         # random.Random(1805).shuffle(self.colors) # Shuffle the colors to use them in a random order but in a deterministic way (i.e. using a fixed random seed)
-        self.author_graph = self.initialize_author_graph(start_year=start_year, end_year=end_year, keyword=keyword)
+        self.author_citation_matrices = None # See citation_matrices()
+        self.cited_author_matrix = None # See precompute_cited_authors()
+        self.partition_indexes = dict() # id(communities) -> PartitionIndex of every partition created by create_partition()
+        self.author_graph_edge_list = None # Nodes and edges the author graph was built from, see build_author_graph()
+        if build_graph:
+            self.author_graph = self.initialize_author_graph(start_year=start_year, end_year=end_year, keyword=keyword, use_author_graph_cache=use_author_graph_cache)
+        else:
+            # The author graphs are built later, e.g. for several time windows by window_analysis.py
+            self.author_graph = None
+        if not partition_graph or not build_graph:
+            # The author graph is partitioned later, e.g. with several seeds by sensitivity_analysis.py
+            self.partition, self.communities = None, None
+            print("Main initialization (without partitioning) completed in " + str(time.time() - self.start_time) + " seconds.")
+            return
         print("Partitioning...")
-        self.partition, self.communities = self.create_partition(self.author_graph, self.storage.database, self.excluded_keywords, self.randomize, modularity_threshold)
+        # The dataset (its article kind), time period and keyword, so that the warm start only uses a partition of the same analysis
+        analysis_identity = incremental_partition.analysis_identity(storage.ARTICLE_KIND, start_year, end_year, keyword)
+        previous_partition = incremental_partition.read_previous_partition(analysis_identity) if warm_start else None
+        if previous_partition is not None and not previous_partition.overlaps(self.author_graph):
+            previous_partition = None
+        self.partition, self.communities = self.create_partition(self.author_graph, self.storage.database, self.excluded_keywords, self.randomize, modularity_threshold, previous_partition=previous_partition)
+        if self.partition is not None:
+            incremental_partition.write_previous_partition(self.partition, self.communities, self.community_size_threshold, analysis_identity,
+                                                           {'engine': self.partition_engine, 'random_seed': str(self.random_seed), 'modularity': self.modularity,
+                                                            'partition_seconds': self.partition_seconds, 'n_nodes': self.author_graph.number_of_nodes(), 'warm_start': previous_partition is not None})
         print("Main initialization completed in " + str(time.time() - self.start_time) + " seconds.")
         if sub_com_analysis:
             print("INFO: Now starting sub-community analysis...")
@@ -442,39 +504,72 @@ class Analyzer:
         self.sub_partitions = []
         self.sub_communities = []
         self.community_names = []
-        for cmt in communities:
-            if len(cmt.authors) >= self.community_size_threshold:
-                sub_graph = self.initialize_sub_graph(cmt.auids())
-                self.sub_graphs.append(sub_graph)
-                print("Partitioning sub-graph for '" + str(cmt.name) + "' community...")
-                partition, communities = self.create_partition(sub_graph, self.storage.database, self.excluded_keywords, self.randomize, main_partition=False, super_partition_name=cmt.name)
-                self.sub_communities.append(communities)
-                self.sub_partitions.append(partition)
-                self.community_names.append(cmt.name)
+        large_communities = [cmt for cmt in communities if len(cmt.authors) >= self.community_size_threshold]
+        tasks = [(cmt.auids(), cmt.name, "Partitioning sub-graph for '" + str(cmt.name) + "' community...") for cmt in large_communities]
+        results = sub_community_analysis.run_sub_partitions(self, tasks, workers=sub_community_analysis.SUB_COMMUNITY_WORKERS if PARALLEL_SUB_COMMUNITY_ANALYSIS else 1)
+        for cmt, (sub_graph, partition, communities) in zip(large_communities, results):
+            self.sub_graphs.append(sub_graph)
+            self.sub_communities.append(communities)
+            self.sub_partitions.append(partition)
+            self.community_names.append(cmt.name)
 
     def analyze_sub2_communities(self, sub_communities, single_community_name="attack graph"):
         self.sub2_graphs = []
         self.sub2_partitions = []
         self.sub2_communities = []
         self.sub2_community_names = []
+        large_communities = []
         for communities in sub_communities:
             for cmt in communities:
                 if len(cmt.authors) >= self.community_size_threshold/self.sub_community_size_threshold_divider and ((single_community_name is not None and cmt.name == single_community_name) or single_community_name is None):
-                    sub2_graph = self.initialize_sub_graph(cmt.auids())
-                    self.sub2_graphs.append(sub2_graph)
-                    print("Partitioning sub^2-graph for '" + str(cmt.name) + "' sub-community...")
-                    partition, communities = self.create_partition(sub2_graph, self.storage.database, self.excluded_keywords, self.randomize, main_partition=False, super_partition_name=cmt.name)
-                    self.sub2_communities.append(communities)
-                    self.sub2_partitions.append(partition)
-                    self.sub2_community_names.append(cmt.name)
-
-    def create_partition(self, graph, database, excluded_keywords, randomize=False, modularity_threshold=None, main_partition=True, super_partition_name=None):
+                    large_communities.append(cmt)
+        tasks = [(cmt.auids(), cmt.name, "Partitioning sub^2-graph for '" + str(cmt.name) + "' sub-community...") for cmt in large_communities]
+        results = sub_community_analysis.run_sub_partitions(self, tasks, workers=sub_community_analysis.SUB_COMMUNITY_WORKERS if PARALLEL_SUB_COMMUNITY_ANALYSIS else 1)
+        for cmt, (sub2_graph, partition, communities) in zip(large_communities, results):
+            self.sub2_graphs.append(sub2_graph)
+            self.sub2_communities.append(communities)
+            self.sub2_partitions.append(partition)
+            self.sub2_community_names.append(cmt.name)
+
+    def partition_sub_graph(self, edge_list, super_partition_name, message):
+        # Builds the sub-graph of a community from sub_graph_edge_list() and partitions it into named sub-communities
+        sub_graph = self.graph_from_edge_list(edge_list)
+        print(message)
+        partition, communities = self.create_partition(sub_graph, self.storage.database, self.excluded_keywords, self.randomize, main_partition=False, super_partition_name=super_partition_name)
+        return sub_graph, partition, communities
+
+    def restore_sub_partition(self, edge_list, nodes, community_ids, names):
+        # The sub-graph, partition and communities of partition_sub_graph() from the arrays and names computed in another process
+        sub_graph = self.graph_from_edge_list(edge_list)
+        partition = dict(zip(nodes.tolist(), community_ids.tolist()))
+        partition_index = PartitionIndex(partition)
+        communities = [Community(self.storage.database, partition_index.community_authors(i_community), i_community, self.excluded_keywords, self.affiliation_dict, name=names[i_community])
+                       for i_community in range(partition_index.n_communities)]
+        partition_index.add_communities(communities)
+        self.partition_indexes[id(communities)] = partition_index
+        return sub_graph, partition, communities
+
+    def create_partition(self, graph, database, excluded_keywords, randomize=False, modularity_threshold=None, main_partition=True, super_partition_name=None, previous_partition=None, use_partition_cache=True):
+        # previous_partition (see incremental_partition.py) warm-starts the partition from the communities of the previous analysis.
+        # use_partition_cache=False for the many one-off partitions (sensitivity and time window runs), which would evict the cached ones.
         partition_start_time = time.time()
-        partition = self.partition_author_graph(graph, 'best', randomize)
+        initial_partition = None
+        if previous_partition is not None:
+            initial_partition, n_new_authors = previous_partition.initial_partition(graph)
+        partition = self.partition_author_graph(graph, 'best', randomize, initial_partition, use_partition_cache)
+        self.partition_seconds = time.time() - partition_start_time
         self.random_seed = randomize
         print("Randomize/random_seed=" + str(self.random_seed))
         if main_partition:
             self.modularity = cmty.modularity(partition, graph)
+            if previous_partition is not None:
+                cold_modularity, cold_partition_seconds = None, None
+                if self.warm_start_cold_comparison:
+                    cold_start_time = time.time()
+                    cold_partition = partition_engines.best_partition(graph, engine=self.partition_engine, resolution=1.0, randomize=randomize)
+                    cold_partition_seconds = time.time() - cold_start_time
+                    cold_modularity = cmty.modularity(cold_partition, graph)
+                incremental_partition.print_warm_start_report(previous_partition, n_new_authors, self.modularity, self.partition_seconds, cold_modularity, cold_partition_seconds)
             if modularity_threshold is not None and self.modularity < modularity_threshold:
                 print("Partition's modularity=" + str(self.modularity))
                 print("WARNING: Modularity of this run is < modularity_threshold")
@@ -489,12 +584,21 @@ class Analyzer:
         # If sub-community analysis is running add the super-community name in 'super_partition_name' to prevent sub-communities with same name
         if not main_partition and super_partition_name is not None:
             community_names_so_far.append(super_partition_name)
-        for i_community in range(0, self.get_n_communities(partition)):
-            auids = self.get_community_authors(partition, i_community)
+        partition_index = PartitionIndex(partition)
+        for i_community in range(0, partition_index.n_communities):
+            auids = partition_index.community_authors(i_community)
             community = Community(database, auids, i_community, excluded_keywords, self.affiliation_dict, community_names_so_far)
             communities.append(community)
             # If the community is larger than the size threshold (i.e. it will be presented on the results) save its name in 'community_names_so_far')
             if (main_partition and len(community.authors) >= self.community_size_threshold) or (not main_partition and len(community.authors) >= self.community_size_threshold/self.sub_community_size_threshold_divider):
+                if previous_partition is not None:
+                    # Keep the (possibly renamed) name of the previous community if the membership barely changed
+                    previous_name, jaccard = previous_partition.carried_over_name(auids)
+                    if previous_name is not None and jaccard >= incremental_partition.NAME_CARRY_OVER_JACCARD and previous_name not in community_names_so_far:
+                        print("Community name '" + previous_name + "' carried over to community '" + community.name + "' (Jaccard index " + str(jaccard) + ")")
+                        community.name = previous_name
+                        community_names_so_far.append(previous_name)
+                        continue
                 community_names_so_far.append(community.name)
                 # Now check if the community needs to be "manually" renamed:
                 if main_partition:
@@ -509,28 +613,40 @@ class Analyzer:
                         print("Community name '" + super_partition_name + ":" + community.name + "' renamed to '" + new_name + "'")
                         community_names_so_far.append(new_name)
                         community.name = new_name
+        partition_index.add_communities(communities)
+        self.partition_indexes[id(communities)] = partition_index # The index keeps the list alive, so its id is not reused
         print("Time to create communities was " + str(time.time() - cc_start_time) + " seconds.")
         return partition, communities
 
-    def initialize_storage(self, database=None, automated=True):
+    def initialize_storage(self, database=None, automated=True, use_snapshot=True):
         print("Reading database... ")
-        storage = CloudStorage(database, automated=automated)
+        if database is None and use_snapshot:
+            storage = snapshot.load_storage()
+        else:
+            storage = create_storage(database, automated=automated)
         print("Update article records and citations...")
         # storage.database.ensure_references_are_in_database() # This is removed to save time! Please check once before (with menu option 4) running analysis for the first time
         # storage.database.ensure_authors_not_duplicated() # This is removed to save even more time!
         #storage.database.identify_description_duplicates() # This was always removed because it requires a ton of time to run! Run it from menu option 4. if needed.
         storage.database.update_author_article_records()
         storage.database.update_article_citation_records()
+        storage.database.build_citation_index() # Used for the statistics that only need counts
         print("Done.")
         return storage
 
-    def initialize_author_graph(self, start_year=1945, end_year=datetime.now().year, keyword=""):
+    def initialize_author_graph(self, start_year=1945, end_year=datetime.now().year, keyword="", use_author_graph_cache=True):
         # Temporary variables to study the possible Chinese (and not only) to/from rest of the world citation imbalance
         analyze_possible_citation_imbalance = False
         citations_to = 0
         citations_from = 0
         citations_internal = 0
         country_to_study = "China"
+        if VECTORIZED_AUTHOR_GRAPH and not analyze_possible_citation_imbalance: # The imbalance analysis needs the loop below
+            graph = self.build_author_graph(start_year=start_year, end_year=end_year, keyword=keyword, use_author_graph_cache=use_author_graph_cache)
+            if self.export_graph_data:
+                self.export_author_graph(graph, self.author_graph_edge_list)
+            return graph
+        self.author_graph_edge_list = None # Not recorded by this loop
         # Add authors as nodes
         graph = nx.Graph()
         # graph = Graph()
@@ -583,8 +699,112 @@ class Analyzer:
             self.export_author_graph(graph)
         return graph
 
-    def export_author_graph(self, graph):
-        if graph:
+    def build_author_graph(self, start_year=1945, end_year=datetime.now().year, keyword="", use_author_graph_cache=True):
+        # Same nodes and edges as the loop in initialize_author_graph(), computed from the citation index:
+        # (author x article) * (article x referenced article) * (referenced article x author) gives who cites whom.
+        # The cited authors of every author are added in the order of the index, not in the iteration order of get_cited_authors(),
+        # so the adjacency order of the graph, and with it the partition for a given seed, differs from the one of the loop.
+        start_initialize_time = time.time()
+        citation_index = self.storage.database.citation_index
+        n_authors = citation_index.n_authors()
+        print("Adding authors to graph...")
+        article_selected = self.selected_articles(start_year, end_year, keyword)
+        full_period = end_year-start_year >= (datetime.now().year-1)-1945
+        # The cache is bypassed by the processes of the time window and sensitivity analyses, which would otherwise write into it concurrently
+        use_author_graph_cache = use_author_graph_cache and analysis_cache.AUTHOR_GRAPH_CACHE_ENABLED
+        if use_author_graph_cache:
+            # The keywords are not part of the citation index, so with a keyword the selected articles are part of the key too
+            author_graph_cache = analysis_cache.AuthorGraphCache()
+            cache_key = author_graph_cache.key(citation_index.fingerprint(), start_year, end_year, keyword, full_period,
+                                               hashlib.sha256(numpy.packbits(article_selected).tobytes()).hexdigest() if keyword != "" else None)
+            edge_list = author_graph_cache.load(cache_key)
+            if edge_list is not None:
+                print("Loaded the author graph from the author graph cache '" + author_graph_cache.file(cache_key) + "'.")
+                graph = self.author_graph_from_edge_list(edge_list)
+                print(str(len(edge_list[1])) + " edges. Time is " +  str(time.time() - start_initialize_time) + " seconds.")
+                return graph
+        author_articles, references, article_authors = self.citation_matrices()
+        nodes = numpy.flatnonzero(author_articles.dot(article_selected.astype(numpy.int32)) > 0)
+        # Add citations as edges
+        print("Adding edges to graph. " +  str(time.time() - start_initialize_time) + " seconds.")
+        print("iterating over " + str(len(nodes)) + " authors.")
+        if self.cited_author_matrix is not None and self.cited_author_matrix[0] is citation_index:
+            auids, cited = self.cited_author_matrix[1], self.cited_author_matrix[2][nodes]
+        else:
+            auids = numpy.array([int(author.auid) for author in citation_index.authors], dtype=numpy.int64)
+            cited = (author_articles[nodes].dot(references).dot(article_authors)).tocsr()
+            cited.sort_indices()
+        cited_counts = numpy.diff(cited.indptr)
+        cited_authors = cited.indices
+        citing_nodes = numpy.repeat(nodes, cited_counts)
+        if not full_period:
+            # When analyzing a shorter period of time, edges to authors outside of the time period are discarded
+            in_graph = numpy.zeros(n_authors, dtype=bool)
+            in_graph[nodes] = True
+            citing_nodes = citing_nodes[in_graph[cited_authors]]
+            cited_authors = cited_authors[in_graph[cited_authors]]
+        graph = self.author_graph_from_edge_list((auids[nodes], auids[citing_nodes], auids[cited_authors]))
+        if use_author_graph_cache:
+            author_graph_cache.store(cache_key, self.author_graph_edge_list)
+        print(str(len(cited_authors)) + " edges. Time is " +  str(time.time() - start_initialize_time) + " seconds.")
+        return graph
+
+    def selected_articles(self, start_year=1945, end_year=datetime.now().year, keyword=""):
+        # Mask of the articles of the citation index published in the time interval and on topic
+        citation_index = self.storage.database.citation_index
+        article_selected = (citation_index.years >= start_year) & (citation_index.years <= end_year) & (numpy.diff(citation_index.author_indptr) > 0)
+        if keyword != "":
+            topic_keyword = Keyword(keyword)
+            for article_id in numpy.flatnonzero(article_selected):
+                if topic_keyword not in citation_index.articles[article_id].keywords:
+                    article_selected[article_id] = False
+        return article_selected
+
+    def precompute_cited_authors(self):
+        # The (author x cited author) matrix of all the authors, so that the author graphs of many time periods (see window_analysis.py)
+        # are built by selecting its rows instead of multiplying the citation matrices again
+        citation_index = self.storage.database.citation_index
+        if self.cited_author_matrix is None or self.cited_author_matrix[0] is not citation_index:
+            start_time = time.time()
+            author_articles, references, article_authors = self.citation_matrices()
+            cited = author_articles.dot(references).dot(article_authors).tocsr()
+            cited.sort_indices()
+            auids = numpy.array([int(author.auid) for author in citation_index.authors], dtype=numpy.int64)
+            self.cited_author_matrix = (citation_index, auids, cited)
+            print("Precomputed the cited authors of " + str(len(auids)) + " authors (" + str(cited.nnz) + " pairs) in " + str(time.time() - start_time) + " seconds.")
+        return self.cited_author_matrix[2]
+
+    def author_graph_from_edge_list(self, edge_list):
+        # Convert to networkx once. Over the whole period cited authors outside the time period are added as nodes by their edges, like before.
+        graph = self.graph_from_edge_list(edge_list)
+        self.author_graph_edge_list = edge_list
+        return graph
+
+    @staticmethod
+    def graph_from_edge_list(edge_list):
+        # Adding the same nodes and edges in the same order gives a graph with the same adjacency order, and so the same partitions for a seed
+        nodes, citing_authors, cited_authors = edge_list
+        graph = nx.Graph()
+        graph.add_nodes_from(nodes.tolist())
+        graph.add_edges_from(zip(citing_authors.tolist(), cited_authors.tolist()))
+        return graph
+
+    def citation_matrices(self):
+        # Sparse (author x article), (article x referenced article) and (article x author) matrices of the citation index, built once
+        citation_index = self.storage.database.citation_index
+        if self.author_citation_matrices is None or self.author_citation_matrices[0] is not citation_index:
+            n_articles = citation_index.n_articles()
+            n_authors = citation_index.n_authors()
+            author_articles = scipy.sparse.csr_matrix((numpy.ones(len(citation_index.author_article_indices), dtype=numpy.int32), citation_index.author_article_indices, citation_index.author_article_indptr), shape=(n_authors, n_articles))
+            references = scipy.sparse.csr_matrix((numpy.ones(len(citation_index.reference_indices), dtype=numpy.int32), citation_index.reference_indices, citation_index.reference_indptr), shape=(n_articles, n_articles))
+            article_authors = scipy.sparse.csr_matrix((numpy.ones(len(citation_index.author_indices), dtype=numpy.int32), citation_index.author_indices, citation_index.author_indptr), shape=(n_articles, n_authors))
+            self.author_citation_matrices = (citation_index, author_articles, references, article_authors)
+        return self.author_citation_matrices[1:]
+
+    def export_author_graph(self, graph, edge_list=None):
+        if edge_list is not None:
+            self.export_author_graph_edge_list(edge_list)
+        elif graph:
             start_export_time = time.time()
             print("Info: Exporting author graph to files: 'author_graph_nodes.csv' and 'author_graph_edges.csv'")
             stdout_old = sys.stdout
@@ -605,6 +825,28 @@ class Analyzer:
             print("FatalError: While exporting author graph, graph was None!")
             sys.exit()
 
+    def export_author_graph_edge_list(self, edge_list):
+        # Same files as export_author_graph(), written from the arrays of build_author_graph() (or of the author graph cache) instead of the graph.
+        # Every edge is written once, in the direction it was first found, and the nodes in the order they entered the graph.
+        start_export_time = time.time()
+        print("Info: Exporting author graph to files: 'author_graph_nodes.csv' and 'author_graph_edges.csv'")
+        nodes, citing_authors, cited_authors = edge_list
+        all_nodes = numpy.concatenate((nodes, numpy.column_stack((citing_authors, cited_authors)).ravel()))
+        unique_nodes, first_positions = numpy.unique(all_nodes, return_index=True)
+        graph_nodes = unique_nodes[numpy.argsort(first_positions, kind='stable')]
+        pairs = numpy.column_stack((numpy.minimum(citing_authors, cited_authors), numpy.maximum(citing_authors, cited_authors)))
+        first_edges = numpy.sort(numpy.unique(pairs, axis=0, return_index=True)[1]) if len(pairs) else numpy.zeros(0, dtype=numpy.int64)
+        authors = self.storage.database.authors
+        with open("author_graph_nodes.csv", 'w') as f:
+            f.write("Id,Label\n")
+            for node_id in graph_nodes.tolist():
+                f.write(str(node_id) + ',"' + authors[str(node_id)].surname + '"\n')
+        with open("author_graph_edges.csv", 'w') as f:
+            f.write("Source,Target\n")
+            for citing_author, cited_author in zip(citing_authors[first_edges].tolist(), cited_authors[first_edges].tolist()):
+                f.write(str(citing_author) + ',' + str(cited_author) + '\n')
+        print("Author graph export completed in " + str(time.time() - start_export_time) + " seconds")
+
     def plot_global_choropleth(self):
         print("Plotting global choropleth graph...")
         # Create a dict with the infuence of each affiliation
@@ -673,49 +915,83 @@ class Analyzer:
         choro_plot.ChoroplethPlotter("Most influential countries", sorted_most_influential_affiliation_countries)
 
     def initialize_sub_graph(self, auids):
-        # Add authors as nodes
-        sub_graph = nx.Graph()
+        return self.graph_from_edge_list(self.sub_graph_edge_list(auids))
+
+    def sub_graph_edge_list(self, auids):
+        # The citations between the authors of a (sub-)community. The nodes are in the given order. From the citation index (the default), the
+        # cited authors of every author are in the order of the index, not in the iteration order of get_cited_authors() like in the loop,
+        # so the adjacency order of the sub-graph, and with it the partition for a given seed, differs from the one of the loop.
         start_initialize_time = time.time()
         print("Adding authors to sub-graph...")
-        for auid in auids:
-            sub_graph.add_node(int(auid))
+        nodes = numpy.array([int(auid) for auid in auids], dtype=numpy.int64)
         # Add citations as edges
         print("Adding edges to sub-graph. " +  str(time.time() - start_initialize_time) + " seconds.")
-        i_edge = 0
-        i_author = 0
-        print("iterating over " + str(len(sub_graph.nodes())) + " authors.")
-        authors_in_graph = list(sub_graph.nodes())
-        for author_id_int in authors_in_graph:
-            i_author += 1
-            auid = str(author_id_int)
-            cited_authors = self.storage.database.authors[auid].get_cited_authors()
-            for cited_author in cited_authors:
-                if cited_author.auid in self.storage.database.authors and int(cited_author.auid) in authors_in_graph:
-                    sub_graph.add_edge(int(auid), int(cited_author.auid))
-                    i_edge += 1
-        print(str(i_edge) + " edges. Time is " +  str(time.time() - start_initialize_time) + " seconds.")
-        return sub_graph
+        print("iterating over " + str(len(nodes)) + " authors.")
+        if VECTORIZED_AUTHOR_GRAPH:
+            # A row and column slice of (author x article) * (article x referenced article) * (article x author): the same pairs as the loop
+            # below, but in the order of the rows and columns of the slice
+            citation_index = self.storage.database.citation_index
+            author_articles, references, article_authors = self.citation_matrices()
+            author_ids = numpy.array([citation_index.author_ids[str(auid)] for auid in auids], dtype=numpy.int64)
+            cited = author_articles[author_ids].dot(references).dot(article_authors)[:, author_ids].tocsr()
+            cited.sort_indices()
+            citing_authors = nodes[numpy.repeat(numpy.arange(len(nodes)), numpy.diff(cited.indptr))]
+            cited_authors = nodes[cited.indices]
+        else:
+            authors_in_graph = set(nodes.tolist())
+            citing_authors = []
+            cited_authors = []
+            for author_id_int in nodes.tolist():
+                auid = str(author_id_int)
+                cited_authors_of_author = self.storage.database.authors[auid].get_cited_authors()
+                for cited_author in cited_authors_of_author:
+                    if cited_author.auid in self.storage.database.authors and int(cited_author.auid) in authors_in_graph:
+                        citing_authors.append(author_id_int)
+                        cited_authors.append(int(cited_author.auid))
+            citing_authors, cited_authors = numpy.array(citing_authors, dtype=numpy.int64), numpy.array(cited_authors, dtype=numpy.int64)
+        print(str(len(citing_authors)) + " edges. Time is " +  str(time.time() - start_initialize_time) + " seconds.")
+        return nodes, citing_authors, cited_authors
 
-    def partition_author_graph(self, graph, partition_type, randomize=False):
+    def partition_author_graph(self, graph, partition_type, randomize=False, initial_partition=None, use_partition_cache=True):
         # first compute the best partition
         print("Partitioning into communitites.")
         if partition_type == 'best':
-            if isinstance(randomize, bool):
-                return cmty.best_partition(graph, resolution=1.0, randomize=randomize, random_state=None)
-            elif isinstance(randomize, int):
-                return cmty.best_partition(graph, resolution=1.0, randomize=None, random_state=randomize)
+            print("Partition engine: " + self.partition_engine)
+            if initial_partition is not None:
+                print("Starting from a given partition of " + str(len(set(initial_partition.values()))) + " communities.")
+                return partition_engines.best_partition(graph, engine=self.partition_engine, resolution=1.0, randomize=randomize, initial_partition=initial_partition)
+            seed = partition_engines.random_seed(randomize)
+            if seed is None or not analysis_cache.PARTITION_CACHE_ENABLED or not use_partition_cache: # Random runs (and warm starts) are never cached
+                return partition_engines.best_partition(graph, engine=self.partition_engine, resolution=1.0, randomize=randomize)
+            partition_cache = analysis_cache.PartitionCache()
+            cache_key = partition_cache.key(analysis_cache.graph_fingerprint(graph), self.partition_engine, 1.0, seed)
+            partition = partition_cache.load(cache_key, graph)
+            if partition is not None:
+                print("Loaded the partition (seed " + str(seed) + ") from the partition cache '" + partition_cache.file(cache_key) + "'.")
+                return partition
+            partition = partition_engines.best_partition(graph, engine=self.partition_engine, resolution=1.0, randomize=randomize)
+            partition_cache.store(cache_key, partition)
+            return partition
         elif isinstance(partition_type, int):
             dendrogram = cmty.generate_dendrogram(graph)
             return cmty.partition_at_level(dendrogram, partition_type)
 
     def get_community_authors(self, partition, i):
-        return [nodes for nodes in list(partition) if partition[nodes] == i]
+        return PartitionIndex(partition).community_authors(i) # Better use partition_index() when asking for several communities
+
+    def partition_index(self, communities=None):
+        # The PartitionIndex of communities created by create_partition(), None for other lists of communities
+        if communities is None:
+            communities = self.communities
+        return self.partition_indexes.get(id(communities))
 
     def get_community(self, partition_id, communities=None):
         if communities is None: # If None global analysis is carried out, otherwise sub-community ananalyis
-            return [community for community in self.communities if community.partition_id == partition_id][0]
-        else:
-            return [community for community in communities if community.partition_id == partition_id][0]
+            communities = self.communities
+        partition_index = self.partition_index(communities)
+        if partition_index is not None:
+            return partition_index.community(partition_id)
+        return [community for community in communities if community.partition_id == partition_id][0]
 
     def get_n_communities(self, partition):
         if list(partition.values()):
@@ -723,6 +999,31 @@ class Analyzer:
         else:
             return 0
 
+    def community_citation_matrix(self, communities=None):
+        # Sparse K x K matrix whose [a, b] entry is citations_from_community_a_to_b(communities[a], communities[b]), for all the pairs at
+        # once: (community x author) * (author x article) * (article x referenced article) * (article x author) * (author x community).
+        if communities is None:
+            communities = self.communities
+        partition_index = self.partition_index(communities)
+        if partition_index is not None and partition_index.citation_matrix is not None:
+            return partition_index.citation_matrix
+        citation_index = self.storage.database.citation_index
+        author_articles, references, article_authors = self.citation_matrices()
+        rows = []
+        columns = []
+        for i_community, community in enumerate(communities):
+            for author in community.authors:
+                author_id = citation_index.author_ids.get(author.auid)
+                if author_id is not None:
+                    rows.append(author_id)
+                    columns.append(i_community)
+        author_communities = scipy.sparse.csr_matrix((numpy.ones(len(rows), dtype=numpy.int64), (rows, columns)), shape=(citation_index.n_authors(), len(communities)))
+        cited_communities = references.dot(article_authors.dot(author_communities)) # article x community it cites
+        citation_matrix = author_communities.T.tocsr().dot(author_articles).dot(cited_communities).tocsr()
+        if partition_index is not None:
+            partition_index.citation_matrix = citation_matrix
+        return citation_matrix
+
     def citations_from_community_a_to_b(self, community_a, community_b):
         n_citations = 0
         for a_author in community_a.authors:
@@ -735,11 +1036,13 @@ class Analyzer:
 
     def print_intercommunity_citations(self, community_size_threshold):
         print("Below are listed highly unequal citing relations between comunitites, if there are any such relations:")
-        for community_a in [c for c in self.communities if len(c.authors) > community_size_threshold]:
-            for community_b in [c for c in self.communities if len(c.authors) > community_size_threshold]:
+        citation_matrix = self.community_citation_matrix()
+        large_communities = [(i, c) for i, c in enumerate(self.communities) if len(c.authors) > community_size_threshold]
+        for i_a, community_a in large_communities:
+            for i_b, community_b in large_communities:
                 if community_a != community_b:
-                    cits_a_b = self.citations_from_community_a_to_b(community_a, community_b)
-                    cits_b_a = self.citations_from_community_a_to_b(community_b, community_a)
+                    cits_a_b = int(citation_matrix[i_a, i_b])
+                    cits_b_a = int(citation_matrix[i_b, i_a])
                     if max(cits_a_b, cits_b_a) > CITATION_TRUNCATION_THRESHOLD:
                         if cits_b_a > 0 and float(cits_a_b*len(community_b.authors))/float(cits_b_a*len(community_a.authors)) > 2.0:
                             print(community_a.name + " (" + str(len(community_a.authors)) + ") cites " + community_b.name + " (" + str(len(community_b.authors)) + ") " + str(cits_a_b) + " times, while " + community_b.name + " cites " + community_a.name + " " + str(cits_b_a) + " times.")
@@ -759,7 +1062,13 @@ class Analyzer:
         print("Number of fully scraped articles (with eid) is " + str(len(self.storage.database.articles_with_eid)))
         print("Number of out-of-scope articles is " + str(len([a for a in self.storage.database.articles.values() if a.out_of_scope])))
         print("Now printing articles with citations > " + str(citation_threshold) + " :")
-        for article, citations in sorted([(a, len(a.citations)) for k, a in self.storage.database.articles.items()], key=operator.itemgetter(1), reverse=True):
+        citation_index = self.storage.database.citation_index
+        citation_counts = citation_index.citation_counts()[:citation_index.n_database_articles]
+        for article_id in numpy.argsort(-citation_counts, kind='stable'): # Same order as sorting the articles by len(article.citations)
+            article = citation_index.articles[article_id]
+            citations = int(citation_counts[article_id])
+            if citations < citation_threshold:
+                break
             if citations >= citation_threshold and not article.out_of_scope:
                 if article.eid is not None:
                     print(str(citations) + ":  " + article.description_with_year())
@@ -772,9 +1081,7 @@ class Analyzer:
                 print(str(citations) + "**: " + article.description_with_year())
         print("(Where *: Article not fully scraped in database / Article not in Scopus if rescraping is already run)")
         print("(and **: Article is considered as out of scope)")
-        n_links = 0
-        for article in list(self.storage.database.articles.values()):
-            n_links += len(article.references)
+        n_links = citation_index.n_references()
         print("Total number of citations is " + str(n_links))
         print("Yearly fully scraped article count:")
         print(self.global_annual_article_count())
@@ -868,18 +1175,9 @@ class Analyzer:
             return [article_sorted_affiliation_names, article_sorted_affiliation_countries]
 
     def global_annual_article_count(self):
-        article_count = dict()
-        for article in list(self.storage.database.articles_with_eid):
-            try:
-                year = int(article.date[0:4])
-                if year in article_count:
-                    article_count[year] += 1
-                else:
-                    article_count[year] = 1
-            except Exception as e:
-                pass
-
-        return sorted(iter(article_count.items()), key=operator.itemgetter(0))
+        # Fully scraped (with eid) articles per year
+        citation_index = self.storage.database.citation_index
+        return citation_index.annual_counts(mask=citation_index.has_eid & citation_index.in_database)
 
     def print_community_info(self, community_size_threshold, communities_to_print=None, n_keywords=COMMUNITY_KEYWORDS_TO_PRINT, n_sources=COMMUNITY_SOURCES_TO_PRINT, n_articles=COMMUNITY_ARTICLES_TO_PRINT):
         if self.partition or communities_to_print is not None:
@@ -1087,8 +1385,13 @@ class Analyzer:
         pos = nx.spring_layout(pruned_author_graph, k=node_distance_factor/math.sqrt(len(pruned_author_graph.nodes())))
         if show_edges:
             nx.draw_networkx_edges(pruned_author_graph, pos, edge_color=edge_color, alpha=0.5, width=0.1)
+        partition_index = self.partition_index()
         for index, community in enumerate(included_communities):
-            list_nodes = [node for node in pruned_author_graph.nodes() if str(node) in community.auids()]
+            if partition_index is not None and partition_index.community(community.partition_id) is community:
+                list_nodes = [node for node in pruned_author_graph.nodes() if partition_index.community_of(node) == community.partition_id]
+            else:
+                community_auids = set(community.auids())
+                list_nodes = [node for node in pruned_author_graph.nodes() if str(node) in community_auids]
 
             citation_list = []
             node_name_dict = dict()
@@ -1112,7 +1415,8 @@ class Analyzer:
         print("Done.")
         plt.close()
 
-    def plot_community_graph(self, graph, partition, community_size_threshold, communities_to_graph=None, node_size_factor=3.0, edge_width_factor=0.1, node_distance_factor=1.0, font_size=5, filename='community_graph.png'):
+    def plot_community_graph(self, graph, partition, community_size_threshold, communities_to_graph=None, node_size_factor=3.0, edge_width_factor=0.1, node_distance_factor=1.0, font_size=5, filename='community_graph.png', edge_weights=None):
+        # edge_weights: None weighs the edges by the author graph edges between the communities, 'citations' by the citations between them
         print("Plotting community graph...", end=' ')
         if communities_to_graph is None: # If communities_to_graph is None then it means that the global analysis is carried out, otherwise sub-community analysis
                 communities_to_graph = self.communities
@@ -1124,6 +1428,12 @@ class Analyzer:
             if community.name in self.excluded_communities:
                 exclude_list.append(community.partition_id)
         induced_graph.remove_nodes_from(exclude_list)
+        if edge_weights == 'citations':
+            citation_matrix = self.community_citation_matrix(communities_to_graph)
+            community_row = dict((community.partition_id, i) for i, community in enumerate(communities_to_graph))
+            for i_community, j_community, weight in induced_graph.edges(data=True):
+                i_row, j_row = community_row[i_community], community_row[j_community]
+                weight['weight'] = float(citation_matrix[i_row, j_row]) if i_row == j_row else float(citation_matrix[i_row, j_row] + citation_matrix[j_row, i_row])
 
         if len(induced_graph.nodes()) == 0:
             print("induced_graph.nodes() is empty, aborting plotting of community graph!")
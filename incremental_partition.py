@@ -0,0 +1,115 @@
+import os, re, time, json
+from collections import Counter
+import numpy as np
+
+# Incremental re-partitioning: after a scraping session adds a few thousand articles, most of the author graph is unchanged, so Louvain
+# can start from the communities of the previous analysis (with the new authors in singletons) instead of from singletons only.
+# The communities of every main analysis are recorded for the next one, with the names of the communities that were presented, in one
+# file per dataset (article kind), time period and keyword (see previous_partition_file()), so that e.g. the pentest analysis does not
+# replace the partition of the main one. A community of the new partition keeps the name of the previous community whose members it
+# shares the most, if their Jaccard index is at least NAME_CARRY_OVER_JACCARD.
+PREVIOUS_PARTITION_PREFIX = 'previous_partition'
+NAME_CARRY_OVER_JACCARD = 0.8
+PREVIOUS_PARTITION_MIN_OVERLAP = 0.5 # Share of the authors of the new graph that must be in the previous partition for a warm start
+
+class PreviousPartition(object):
+
+    def __init__(self, partition, names, info):
+        self.partition = partition # {auid: community id}
+        self.names = names # {community id: name} of the presented communities
+        self.info = info # Analysis (see analysis_identity()), engine, seed, modularity, partition time and number of nodes of the run that produced it
+        self.sizes = Counter(partition.values())
+
+    def overlaps(self, graph):
+        # Whether enough authors of the graph are in the previous partition, i.e. the graph grew from the previous one and is not another one
+        n_nodes = graph.number_of_nodes()
+        n_previous_authors = sum(1 for node in graph.nodes() if node in self.partition)
+        if n_nodes and n_previous_authors < PREVIOUS_PARTITION_MIN_OVERLAP * n_nodes:
+            print("WARNING: Only " + str(n_previous_authors) + " of the " + str(n_nodes) + " authors of the graph are in the previous partition, so the author graph is partitioned from singletons.")
+            return False
+        return True
+
+    def initial_partition(self, graph):
+        # The previous community of every node of the graph, and a new singleton community for each new author
+        initial_partition = {}
+        next_community = max(self.sizes) + 1 if self.sizes else 0
+        n_new_authors = 0
+        for node in graph.nodes():
+            community = self.partition.get(node)
+            if community is None:
+                community = next_community
+                next_community += 1
+                n_new_authors += 1
+            initial_partition[node] = community
+        return initial_partition, n_new_authors
+
+    def carried_over_name(self, auids):
+        # (name, Jaccard index) of the named previous community that overlaps most with the given members, if any
+        overlaps = Counter(self.partition.get(int(auid)) for auid in auids)
+        best_name = None
+        best_jaccard = 0.0
+        for community, n_shared in overlaps.items():
+            if community in self.names:
+                jaccard = n_shared / float(len(auids) + self.sizes[community] - n_shared)
+                if jaccard > best_jaccard:
+                    best_name, best_jaccard = self.names[community], jaccard
+        return best_name, best_jaccard
+
+def analysis_identity(article_kind, start_year, end_year, keyword):
+    return {'article_kind': article_kind, 'start_year': int(start_year), 'end_year': int(end_year), 'keyword': keyword}
+
+def describe_analysis(identity):
+    return (identity['article_kind'] + " " + str(identity['start_year']) + "-" + str(identity['end_year']) +
+            (" on '" + identity['keyword'] + "'" if identity['keyword'] else ""))
+
+def previous_partition_file(identity):
+    filename = PREVIOUS_PARTITION_PREFIX + '_' + identity['article_kind'] + '_' + str(identity['start_year']) + '_' + str(identity['end_year'])
+    if identity['keyword']:
+        filename += '_' + re.sub(r'[^A-Za-z0-9]+', '-', identity['keyword'])
+    return filename + '.npz'
+
+def read_previous_partition(identity, filename=None):
+    # identity is the analysis_identity() of the new analysis. The partition of another analysis is never used.
+    if filename is None:
+        filename = previous_partition_file(identity)
+    if not os.path.isfile(filename):
+        print("WARNING: No previous partition found in '" + filename + "', so the author graph is partitioned from singletons.")
+        return None
+    try:
+        with np.load(filename) as data:
+            partition = dict(zip(data['nodes'].tolist(), data['communities'].tolist()))
+            names = dict(zip(data['named_communities'].tolist(), data['names'].tolist()))
+            info = json.loads(str(data['info']))
+    except Exception as e:
+        print("WARNING: The previous partition in '" + filename + "' could not be read (" + str(e) + "), so the author graph is partitioned from singletons.")
+        return None
+    if info.get('identity') != identity:
+        print("WARNING: The previous partition in '" + filename + "' is of another analysis (" + (describe_analysis(info['identity']) if info.get('identity') else "unknown") +
+              ", not " + describe_analysis(identity) + "), so the author graph is partitioned from singletons.")
+        return None
+    print("Read the previous partition of " + str(len(partition)) + " authors into " + str(len(set(partition.values()))) + " communities from '" + filename + "'.")
+    return PreviousPartition(partition, names, info)
+
+def write_previous_partition(partition, communities, community_size_threshold, identity, info, filename=None):
+    if filename is None:
+        filename = previous_partition_file(identity)
+    info = dict(info, identity=identity)
+    named_communities = [community for community in communities if len(community.authors) >= community_size_threshold]
+    tmp_filename = filename + '.' + str(os.getpid()) + '.tmp.npz'
+    np.savez(tmp_filename, nodes=np.array(list(partition.keys()), dtype=np.int64), communities=np.array(list(partition.values()), dtype=np.int64),
+             named_communities=np.array([community.partition_id for community in named_communities], dtype=np.int64),
+             names=np.array([community.name for community in named_communities], dtype=str), info=np.array(json.dumps(info)))
+    os.replace(tmp_filename, filename)
+    print("Recorded the partition in '" + filename + "' for the warm start of the next analysis.")
+
+def print_warm_start_report(previous_partition, n_new_authors, modularity, partition_seconds, cold_modularity=None, cold_partition_seconds=None):
+    print("Warm start from the " + str(len(previous_partition.sizes)) + " previous communities with " + str(n_new_authors) + " new authors in singletons: " +
+          "partitioned in " + str(partition_seconds) + " seconds with modularity " + str(modularity) + ".")
+    if cold_partition_seconds is not None:
+        print("Cold start on the same graph: partitioned in " + str(cold_partition_seconds) + " seconds with modularity " + str(cold_modularity) + ".")
+        print("The warm start converged " + str(cold_partition_seconds / max(partition_seconds, 1e-9)) + " times faster and changed the modularity by " + str(modularity - cold_modularity) + ".")
+    else:
+        info = previous_partition.info
+        print("Previous analysis (" + ("warm" if info.get('warm_start') else "cold") + " start, " + str(info.get('n_nodes')) + " authors): partitioned in " +
+              str(info.get('partition_seconds')) + " seconds with modularity " + str(info.get('modularity')) + ". The modularity changed by " +
+              str(modularity - info.get('modularity', modularity)) + ".")
@@ -1,5 +1,9 @@
 from scraper import Scraper, YearlyCountScraper, AffiliationScraper
-from storage import CloudStorage, Article
+from storage import create_storage, Article
+import snapshot
+import analysis_cache
+from sensitivity_analysis import run_sensitivity_analysis, SENSITIVITY_AUTHOR_GRAPH_CACHE
+import window_analysis
 from graph_analyzer import Analyzer, nx, cmty
 from atlas_config import GOOGLE_KEY_PATH, API_KEY
 import sys, os.path, time, json
@@ -12,6 +16,18 @@ CURRENT_YEAR = datetime.today().year
 YAC_FILE = 'yac.json'
 PRINT_TO_FILE = True # Enable this to write output to a file
 SENS_ANAL_RUNS = 100 # This specifies the number of runs for the sensitivity analysis of the analysis results
+WINDOW_FIRST_YEAR = 1990 # First year of the time windows of option 18
+WINDOW_WIDTH = 5 # Years per sliding window of option 18 (and of the first expanding window)
+WINDOW_STEP = 1 # Years between the starts (or, for expanding windows, the ends) of two consecutive windows
+EXPANDING_WINDOWS = False # Enable this to analyze [WINDOW_FIRST_YEAR, end] windows of growing length instead of sliding windows
+PARALLEL_SENSITIVITY_ANALYSIS = True # Enable this to build the author graph once and partition it with all the seeds of the sensitivity analysis in parallel (see sensitivity_analysis.py)
+USE_LOCAL_SNAPSHOT = True # Enable this to load the database from a local snapshot (written after the first download) instead of Datastore
+DUPLICATE_REMOVAL_DRY_RUN = False # Enable this to only report the duplicate articles that option 5 would merge and delete
+AUTHOR_GRAPH_CACHE = True # Enable this to reuse the author graphs built earlier for the same dataset, time period and keyword (see analysis_cache.py), bypassed with --no-author-graph-cache
+PARTITION_CACHE = True # Enable this to reuse the partitions of earlier analyses of the same author graph and seed (see analysis_cache.py), bypassed with --no-partition-cache
+WARM_START = False # Enable this (or use --warm-start) after incremental scraping to partition from the communities of the previous analysis (see incremental_partition.py)
+WARM_START_COLD_COMPARISON = False # Enable this to also partition from singletons and report how much faster the warm start converged and how the modularity changed
+PARTITION_ENGINE = 'python-louvain' # Community detection engine of the analyses: 'python-louvain' (the engine of the published results), 'networkx', 'leiden' or 'igraph-louvain' (see partition_engines.py)
 general_query ='KEY("Security Of Data") OR KEY("Information Security") OR KEY("Cyber Security") OR KEY("Network Security") OR KEY("Computer Crime") OR KEY("Cryptography") OR KEY("Security Systems") OR KEY("Cybersecurity") OR KEY("Authentication") OR KEY("Intrusion Detection") OR (KEY("Access Control") AND TITLE-ABS-KEY ("Security")) OR (KEY( "Mobile Security") AND NOT KEY("Cytology")) OR KEY("Cyber-attacks") OR KEY("Malware") OR KEY("Computer Security") OR (KEY("Privacy") AND TITLE-ABS-KEY ("Security")) OR KEY("Steganography") OR KEY("Computer Viruses") OR KEY("Security Requirements") OR KEY("Security Policy") OR (KEY("Digital Watermarking") AND TITLE-ABS-KEY ("Security")) AND (SUBJAREA(COMP) OR SUBJAREA(ENGI) OR SUBJAREA(MATH) OR SUBJAREA(SOCI) OR SUBJAREA(BUSI) OR SUBJAREA(DECI) OR SUBJAREA(MULT) OR SUBJAREA(Undefined)) AND (LANGUAGE(English))'
 ag_query = '(KEY ("Attack Graph") AND TITLE-ABS-KEY ("Security")) OR (KEY ("Threat Model*") AND TITLE-ABS-KEY ("Security")) OR (KEY ("Attack Tree") AND TITLE-ABS-KEY ("Security")) OR (KEY ("Bayesian Networks") AND (TITLE-ABS-KEY ("Cyber Security") OR TITLE-ABS-KEY ("Information Security"))) OR (KEY ("Attack Path") AND TITLE-ABS-KEY ("Security")) OR (KEY ("Markov Processes") AND (TITLE-ABS-KEY ("Cyber Security") OR TITLE-ABS-KEY ("Information Security"))) OR (KEY ("Attack Model*") AND TITLE-ABS-KEY ("Security")) OR (KEY ("Attack Simulations") AND TITLE-ABS-KEY ("Security")) AND (SUBJAREA (COMP) OR  SUBJAREA (ENGI) OR SUBJAREA (MATH) OR SUBJAREA (SOCI) OR SUBJAREA (BUSI) OR SUBJAREA (DECI) OR SUBJAREA (MULT) OR SUBJAREA (Undefined)) AND (LANGUAGE (English))'
 mlai_query ='(KEY("Security Of Data") OR KEY("Information Security") OR KEY("Cyber Security") OR KEY("Network Security") OR KEY("Computer Crime") OR KEY("Cryptography") OR KEY("Security Systems") OR KEY("Cybersecurity") OR KEY("Authentication") OR KEY("Intrusion Detection") OR (KEY("Access Control") AND TITLE-ABS-KEY ("Security")) OR (KEY( "Mobile Security") AND NOT KEY("Cytology")) OR KEY("Cyber-attacks") OR KEY("Malware") OR KEY("Computer Security") OR (KEY("Privacy") AND TITLE-ABS-KEY ("Security")) OR KEY("Steganography") OR KEY("Computer Viruses") OR KEY("Security Requirements") OR KEY("Security Policy") OR (KEY("Digital Watermarking") AND TITLE-ABS-KEY ("Security"))) AND (KEY("machine learning") OR KEY("artificial intelligence") OR KEY("deep learning") OR KEY("neural network")) AND (SUBJAREA(COMP) OR SUBJAREA(ENGI) OR SUBJAREA(MATH) OR SUBJAREA(SOCI) OR SUBJAREA(BUSI) OR SUBJAREA(DECI) OR SUBJAREA(MULT) OR SUBJAREA(Undefined)) AND (LANGUAGE(English))'
@@ -143,11 +159,13 @@ def retrieve_affiliations_from_scopus(datastore_default_kind=True, datastore_kin
     affiliationScraper.store_affiliation_dict(affiliation_dict)
     #print affiliation_dict
 
-def initialize_storage(datastore_default_kind=True, datastore_kind_suffix=None, start_year_filter=None, end_year_filter=None):
-    datastore = CloudStorage(datastore_default_kind=datastore_default_kind, datastore_kind_suffix=datastore_kind_suffix, start_year_filter=start_year_filter, end_year_filter=end_year_filter)
+def initialize_storage(datastore_default_kind=True, datastore_kind_suffix=None, start_year_filter=None, end_year_filter=None, use_snapshot=USE_LOCAL_SNAPSHOT):
+    if use_snapshot:
+        return snapshot.load_storage(datastore_default_kind=datastore_default_kind, datastore_kind_suffix=datastore_kind_suffix, start_year_filter=start_year_filter, end_year_filter=end_year_filter)
+    datastore = create_storage(datastore_default_kind=datastore_default_kind, datastore_kind_suffix=datastore_kind_suffix, start_year_filter=start_year_filter, end_year_filter=end_year_filter)
     return datastore
 
-def analyze(datastore, automated=True, randomize=False, community_json_output=False, detailed_global_analysis=False, sub_com_analysis=False, sub2_com_analysis=False, modularity_threshold=None, start_year=1945, end_year=2025):
+def analyze(datastore, automated=True, randomize=False, community_json_output=False, detailed_global_analysis=False, sub_com_analysis=False, sub2_com_analysis=False, modularity_threshold=None, start_year=1945, end_year=2025, sensitivity_seeds=None, sensitivity_offset=0):
     print(">>> Initiating Security Atlas analysis procedure... <<<")
     print("Three different main types of graphs can be generated.")
     print("In the community graph (CG), a node represents a community, and the relations represent the extent to which community authors cite each other. Node size is determined by community size in terms of authors.")
@@ -208,7 +226,16 @@ def analyze(datastore, automated=True, randomize=False, community_json_output=Fa
                         modularity_threshold=modularity_threshold,
                         community_size_threshold=COMMUNITY_SIZE_THRESHOLD,
                          sub_community_size_threshold_divider=2.5, # 500/2.5 = 200
-                        export_graph_data=False)
+                        export_graph_data=False,
+                        partition_engine=PARTITION_ENGINE,
+                        partition_graph=sensitivity_seeds is None,
+                        warm_start=WARM_START,
+                        warm_start_cold_comparison=WARM_START_COLD_COMPARISON,
+                        use_author_graph_cache=sensitivity_seeds is None or SENSITIVITY_AUTHOR_GRAPH_CACHE)
+    if sensitivity_seeds is not None:
+        # One run per seed, each writing 'output_run<sensitivity_offset+i>.json' and '.txt'
+        run_sensitivity_analysis(analyzer, sensitivity_seeds, offset=sensitivity_offset, modularity_threshold=modularity_threshold)
+        return
     if not analyzer.modularity_threshold_fullfiled:
         print("Aborting this run...")
         return
@@ -241,6 +268,24 @@ def analyze(datastore, automated=True, randomize=False, community_json_output=Fa
                          community_csv_output=False,
                          community_line_graphs=True)
 
+def analyze_windows(datastore, automated=True, randomize=False, modularity_threshold=None):
+    # Loads the database once and writes the communities of every time window to 'output_window_<start>_<end>.json' (see window_analysis.py)
+    if EXPANDING_WINDOWS:
+        windows = window_analysis.expanding_windows(WINDOW_FIRST_YEAR, CURRENT_YEAR, WINDOW_STEP, WINDOW_WIDTH)
+    else:
+        windows = window_analysis.sliding_windows(WINDOW_FIRST_YEAR, CURRENT_YEAR, WINDOW_WIDTH, WINDOW_STEP)
+    print(">>> Initiating time window analysis of " + str(len(windows)) + " windows from " + str(windows[0]) + " to " + str(windows[-1]) + " <<<")
+    analyzer = Analyzer(database=datastore.database,
+                        automated=automated,
+                        randomize=randomize,
+                        modularity_threshold=modularity_threshold,
+                        community_size_threshold=500,
+                        sub_community_size_threshold_divider=2.5,
+                        export_graph_data=False,
+                        partition_engine=PARTITION_ENGINE,
+                        build_graph=False)
+    window_analysis.run_window_analysis(analyzer, windows, randomize=randomize, modularity_threshold=modularity_threshold)
+
 def analyze_kth(datastore, automated=True, community_json_output=False):
     analyzer = Analyzer(database=datastore.database,
                         automated=automated,
@@ -428,6 +473,22 @@ def analyze_pentest(datastore, automated=True, community_json_output=False, rand
 # Actual code starts here.
 os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = GOOGLE_KEY_PATH
 
+if '--no-partition-cache' in sys.argv:
+    sys.argv.remove('--no-partition-cache')
+    PARTITION_CACHE = False
+analysis_cache.PARTITION_CACHE_ENABLED = PARTITION_CACHE
+if not PARTITION_CACHE:
+    print("INFO: The partition cache is bypassed, every analysis partitions the author graph again.")
+if '--warm-start' in sys.argv:
+    sys.argv.remove('--warm-start')
+    WARM_START = True
+if '--no-author-graph-cache' in sys.argv:
+    sys.argv.remove('--no-author-graph-cache')
+    AUTHOR_GRAPH_CACHE = False
+analysis_cache.AUTHOR_GRAPH_CACHE_ENABLED = AUTHOR_GRAPH_CACHE
+if not AUTHOR_GRAPH_CACHE:
+    print("INFO: The author graph cache is bypassed, every analysis builds the author graph again.")
+
 if len(sys.argv) == 1:
     print("This program can scrape Scopus in order to retrieve and store data about articles on the topics of information and cyber security.")
     print("It can also analyse the retrieved data, presenting which are the research communitites, what they are about, and how they relate to each other.")
@@ -451,6 +512,8 @@ if len(sys.argv) == 1:
     print(" 15. Analyse the research communities based on previously (option 14) retrieved data!")
     print(" 16. Retrieve all pentesting related articles from Scopus!")
     print(" 17. Analyse the pentesting research communities based on previously (option 16) retrieved data!")
+    print("# Time Window Analysis:")
+    print(" 18. Analyse how the top level communities evolve over time windows. (i.e. one analysis per sliding or expanding window of years)")
     print(" 0.  Exit")
     selection = eval(input())
     if selection == 1:
@@ -480,9 +543,9 @@ if len(sys.argv) == 1:
         signal.signal(signal.SIGINT, partial(scraper_signal_handler, scraper))
         scraper.scrape_highly_cited_not_scraped_articles()
     elif selection == 5:
-        storage = CloudStorage()
+        storage = create_storage()
         storage.database.ensure_references_are_in_database()
-        storage.database.identify_description_duplicates() # This identifies and removes duplicate articles
+        storage.database.identify_description_duplicates(storage=storage, dry_run=DUPLICATE_REMOVAL_DRY_RUN) # This identifies and removes duplicate articles
         storage.database.update_author_article_records()
         storage.database.ensure_authors_not_duplicated()
         storage.database.update_article_citation_records()
@@ -490,13 +553,17 @@ if len(sys.argv) == 1:
     elif selection == 6:
         storage = initialize_storage()
         offset = 0
-        for i in range(SENS_ANAL_RUNS):
-            random_seed = np.random.mtrand._rand.randint(0,2**32)
-            sys.stdout = sys.__stdout__
-            print("INFO: Run #" + str(i+offset) + ": From now on all the prints will be written to a file...")
-            sys.stdout = open('output_run' + str(i+offset) + '.txt', 'w')
-            print("INFO: Run #" + str(i+offset) + ": Start of output")
-            analyze(storage, randomize=random_seed, community_json_output='output_run' + str(i+offset) + '.json', modularity_threshold=None)
+        if PARALLEL_SENSITIVITY_ANALYSIS:
+            random_seeds = [np.random.mtrand._rand.randint(0,2**32) for i in range(SENS_ANAL_RUNS)]
+            analyze(storage, community_json_output=False, modularity_threshold=None, sensitivity_seeds=random_seeds, sensitivity_offset=offset)
+        else:
+            for i in range(SENS_ANAL_RUNS):
+                random_seed = np.random.mtrand._rand.randint(0,2**32)
+                sys.stdout = sys.__stdout__
+                print("INFO: Run #" + str(i+offset) + ": From now on all the prints will be written to a file...")
+                sys.stdout = open('output_run' + str(i+offset) + '.txt', 'w')
+                print("INFO: Run #" + str(i+offset) + ": Start of output")
+                analyze(storage, randomize=random_seed, community_json_output='output_run' + str(i+offset) + '.json', modularity_threshold=None)
     elif selection == 7:
         # if PRINT_TO_FILE:
         #     print("INFO: From now on all the prints will be written on a file...")
@@ -557,6 +624,14 @@ if len(sys.argv) == 1:
             print("INFO: Start of output")
         storage = initialize_storage(datastore_default_kind=False, datastore_kind_suffix='pentest', start_year_filter=None, end_year_filter=None)
         analyze_pentest(storage, detailed_global_analysis=True, sub_com_analysis=True)
+    elif selection == 18:
+        if PRINT_TO_FILE:
+            print("INFO: From now on all the prints will be written to a file...")
+            sys.stdout = open('analysis_windows_out.txt', 'w')
+            print_versions()
+            print("INFO: Start of output")
+        storage = initialize_storage(datastore_default_kind=False, datastore_kind_suffix="complete")
+        analyze_windows(storage, randomize=2335927275)
     elif selection == 99:
         # if PRINT_TO_FILE:
         #     print("INFO: From now on all the prints will be written on a file...")
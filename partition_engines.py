@@ -0,0 +1,93 @@
+import sys, random
+import community as cmty
+import networkx as nx
+# Compiled community detection (optional, only needed by the 'leiden' and 'igraph-louvain' engines)
+try:
+    import igraph
+except ImportError:
+    igraph = None
+try:
+    import leidenalg
+except ImportError:
+    leidenalg = None
+
+# Community detection engines that Analyzer can partition the author graph with. All of them return the same {node: community id}
+# mapping as community.best_partition(), with the communities numbered from 0 in the order of their first node in the graph.
+PYTHON_LOUVAIN_ENGINE = 'python-louvain' # Pure Python Louvain, the engine of all the earlier results (same seeds, same partitions)
+NETWORKX_ENGINE = 'networkx' # Louvain of networkx (nx.community.louvain_communities)
+LEIDEN_ENGINE = 'leiden' # Leiden of leidenalg, on an igraph copy of the graph
+IGRAPH_LOUVAIN_ENGINE = 'igraph-louvain' # Louvain of igraph (Graph.community_multilevel), compiled
+PARTITION_ENGINES = (PYTHON_LOUVAIN_ENGINE, NETWORKX_ENGINE, LEIDEN_ENGINE, IGRAPH_LOUVAIN_ENGINE)
+DEFAULT_PARTITION_ENGINE = PYTHON_LOUVAIN_ENGINE
+
+def available_engines():
+    engines = [PYTHON_LOUVAIN_ENGINE, NETWORKX_ENGINE]
+    if igraph is not None and leidenalg is not None:
+        engines.append(LEIDEN_ENGINE)
+    if igraph is not None:
+        engines.append(IGRAPH_LOUVAIN_ENGINE)
+    return engines
+
+def random_seed(randomize):
+    # Same meaning of 'randomize' as in Analyzer: False is the fixed seed 0 of python-louvain, True a random run and an int the seed itself
+    if isinstance(randomize, bool):
+        return None if randomize else 0
+    return randomize
+
+def supports_initial_partition(engine):
+    # Engines that can start from a given partition instead of singletons (see incremental_partition.py)
+    return engine in (PYTHON_LOUVAIN_ENGINE, LEIDEN_ENGINE)
+
+def best_partition(graph, engine=DEFAULT_PARTITION_ENGINE, resolution=1.0, randomize=False, initial_partition=None):
+    # initial_partition is a {node: community id} mapping of all the nodes to start from, if the engine supports it
+    if initial_partition is not None and not supports_initial_partition(engine):
+        print("WARNING: The partition engine '" + str(engine) + "' cannot start from a given partition, so it starts from singletons.")
+        initial_partition = None
+    if engine == PYTHON_LOUVAIN_ENGINE:
+        if isinstance(randomize, bool):
+            return cmty.best_partition(graph, partition=initial_partition, resolution=resolution, randomize=randomize, random_state=None)
+        return cmty.best_partition(graph, partition=initial_partition, resolution=resolution, randomize=None, random_state=randomize)
+    if engine not in available_engines():
+        if engine in PARTITION_ENGINES:
+            print("FatalError: The partition engine '" + engine + "' needs the python-igraph" + (" and leidenalg packages." if engine == LEIDEN_ENGINE else " package."))
+        else:
+            print("FatalError: Unknown partition engine '" + str(engine) + "', use one of: " + ", ".join(PARTITION_ENGINES))
+        sys.exit()
+    seed = random_seed(randomize)
+    if engine == NETWORKX_ENGINE:
+        return partition_from_communities(graph, nx.community.louvain_communities(graph, resolution=resolution, seed=seed))
+    # igraph engines work on vertex indices in the order of graph.nodes()
+    nodes = list(graph.nodes())
+    index = dict((node, i) for i, node in enumerate(nodes))
+    igraph_graph = igraph.Graph(n=len(nodes), edges=[(index[a], index[b]) for a, b in graph.edges()])
+    if engine == LEIDEN_ENGINE:
+        initial_membership = None
+        if initial_partition is not None:
+            initial_membership = list(partition_from_membership(nodes, [initial_partition[node] for node in nodes]).values())
+        clustering = leidenalg.find_partition(igraph_graph, leidenalg.RBConfigurationVertexPartition, initial_membership=initial_membership, resolution_parameter=resolution, seed=seed)
+    else:
+        if seed is not None:
+            igraph.set_random_number_generator(random.Random(seed))
+        try:
+            clustering = igraph_graph.community_multilevel(resolution=resolution)
+        finally:
+            igraph.set_random_number_generator(random)
+    return partition_from_membership(nodes, clustering.membership)
+
+def partition_from_communities(graph, communities):
+    membership = {}
+    for i_community, community_nodes in enumerate(communities):
+        for node in community_nodes:
+            membership[node] = i_community
+    nodes = list(graph.nodes())
+    return partition_from_membership(nodes, [membership[node] for node in nodes])
+
+def partition_from_membership(nodes, membership):
+    # Renumbers the communities from 0 in the order of their first node, like community.best_partition() does
+    new_ids = {}
+    partition = {}
+    for node, community_id in zip(nodes, membership):
+        if community_id not in new_ids:
+            new_ids[community_id] = len(new_ids)
+        partition[node] = new_ids[community_id]
+    return partition
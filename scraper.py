@@ -38,7 +38,7 @@ class Scraper:
             sys.exit(1)
 
         print("Scraper now initiating storage...")
-        self.storage = CloudStorage(automated=automated, datastore_default_kind=datastore_default_kind, datastore_kind_suffix=datastore_kind_suffix)
+        self.storage = create_storage(automated=automated, datastore_default_kind=datastore_default_kind, datastore_kind_suffix=datastore_kind_suffix)
         self.database = self.storage.database
 
         self.database.read_keywords_from_file(KEYWORDS_FILE)
@@ -301,25 +301,22 @@ class Scraper:
                     if isinstance(mainterm, str):
                         print("mainterm is now a string: " + mainterm)
                     else:
-                        m = Keyword(mainterm['$'].lower())
+                        m = self.database.add_keywords(Keyword(mainterm['$'].lower())) # The shared keyword object of the database
                         article.keywords.add(m)
-                        self.database.add_keywords(m)
         if 'authkeywords' in data and data['authkeywords'] is not None:
             try:
                 for author_keyword in data['authkeywords']['author-keyword']:
                     if author_keyword is not None:
-                        ak = Keyword(author_keyword['$'].lower())
+                        ak = self.database.add_keywords(Keyword(author_keyword['$'].lower())) # The shared keyword object of the database
                         article.keywords.add(ak)
-                        self.database.add_keywords(ak)
             except TypeError:
                 if len(data['authkeywords']['author-keyword']) == 2:
                     if data['authkeywords'] is not None:
                         keywords_string = data['authkeywords']['author-keyword']['$'].lower()
                         keywords = keywords_string.split(",")
                         for keyword in keywords:
-                            ak = Keyword(keyword)
+                            ak = self.database.add_keywords(Keyword(keyword)) # The shared keyword object of the database
                             article.keywords.add(ak)
-                            self.database.add_keywords(ak)
 
     def scrape_references(self, article, data):
         print("Attempting to scrape references of " + article.title)
@@ -442,7 +439,7 @@ class Scraper:
                         return False
                 print("Found title of article: " + article.title)
                 try:
-                    article.source = Source(data['coredata']['prism:publicationName'])
+                    article.source = self.database.shared_source(data['coredata']['prism:publicationName'])
                     print("Found source: " + article.source.name)
                 except (KeyError, TypeError) as e:
                     print("Could not find source. KeyError or TypeError.")
@@ -451,6 +448,7 @@ class Scraper:
                     print("Found date: " + article.date)
                 except (KeyError, TypeError) as e:
                     print("Could not find date. KeyError or TypeError.")
+                self.database.refresh_article_index(article) # The title, first author and date used for matching may have changed
                 # Scrape all the references (unless ordered not to do so)
                 self.scrape_references(article, data)
                 if update_references:
@@ -486,6 +484,8 @@ class Scraper:
         if not self.needs_to_be_completed(article, assume_in_scope):
             print("Article doesn't need to be completed.")
             return "Unchanged"
+        # Whatever the outcome, the article record will be changed and must be saved on the next store
+        self.database.mark_article_dirty(article)
         # If the article is incomplete, check that it has an EID
         if article.eid is None:
             # If not, try to add the EID.
@@ -504,7 +504,7 @@ class Scraper:
         # If completed
         print("Completed " + article.description() + ".")
         # Add the article on the articles_with_eid and update it on database
-        self.database.articles_with_eid.append(article)
+        self.database.add_article_with_eid(article)
         if rescraping: # Only if rescraping, because otherwise it is not needed since it does not already exist (and no overwrite is needed)
             self.database.articles[hash(article)] = article
         if not rescraping: # Avoid getting the hash of the article changed when rescraping highly cited yet not fully scraped articles
@@ -526,6 +526,7 @@ class Scraper:
                         print("Saving database after addition of " + reference.description())
                         self.storage.store()
         article.references_are_updated = True # This is a flag that means that all the references_are_scraped
+        self.database.mark_article_dirty(article)
 
     def scrape_all_references(self):
         at_least_one_reference_updated = False
@@ -700,8 +701,7 @@ class Scraper:
         self.storage.store()
 
     def store_after_signal(self):
-        self.storage.store()
-        return True
+        return self.storage.store()
 
     def query_exceeded_handler(self):
         # First restore the stdout to the sys.stdout
@@ -751,7 +751,7 @@ class YearlyCountScraper:
 class AffiliationScraper:
     def __init__(self, api_key, datastore_default_kind=True, datastore_kind_suffix=None):
         self.baseScraper = BaseScraper(api_key)
-        self.storage = CloudStorage(auxiliary_use=True, datastore_default_kind=datastore_default_kind, datastore_kind_suffix=datastore_kind_suffix)
+        self.storage = create_storage(auxiliary_use=True, datastore_default_kind=datastore_default_kind, datastore_kind_suffix=datastore_kind_suffix)
 
     def scrape_afiliation_from_id(self, id):
         url_intro = 'https://api.elsevier.com/content/search/affiliation?query=AF-ID('
@@ -0,0 +1,112 @@
+import sys, os, time
+import numpy as np
+import networkx as nx
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from storage import process_pool_context
+from window_analysis import available_memory
+
+# Sensitivity analysis: the author graph of one Analyzer is partitioned with many random seeds in a pool of processes, and every run writes
+# the same 'output_runN.json' (read by json_analyzer.py) and 'output_runN.txt' files as the sequential runs of analyze() did. The text files
+# only hold the community info though: the graphs and plots of analyze_all() are not drawn, as the runs would overwrite each other's files.
+# Every worker builds its own networkx copy of the author graph from the shared edge list, so the number of workers is bounded by the memory.
+SENSITIVITY_WORKERS = None # Number of processes partitioning in parallel (None to use as many as the CPUs and the available memory allow)
+SENSITIVITY_BYTES_PER_EDGE = 1000 # Approximate memory of a worker per author graph edge (the same as WINDOW_BYTES_PER_EDGE in window_analysis.py)
+SENSITIVITY_MEMORY_FRACTION = 0.7 # Share of the available memory that the workers may use
+SENSITIVITY_GRAPH_PREFIX = 'sensitivity_author_graph' # The author graph is shared with the workers as memory-mapped arrays in '<prefix>_nodes.npy' and '<prefix>_edges.npy'
+SENSITIVITY_EDGE_CHUNK = 1000000 # Edges added to the graph of a worker at a time
+SENSITIVITY_AUTHOR_GRAPH_CACHE = False # The author graph of the runs is built without the author graph cache, like the ones of the time windows (see window_analysis.py)
+
+analyzer = None # The Analyzer (and so the database) is inherited by the forked workers, but not its author graph
+author_graph = None # The author graph of a worker, read from the memory-mapped edge list
+
+def write_author_graph(graph, edge_list, prefix=SENSITIVITY_GRAPH_PREFIX):
+    if edge_list is not None:
+        nodes, citing_authors, cited_authors = edge_list # As the graph was built (see Analyzer.build_author_graph())
+    else:
+        nodes = np.array(list(graph.nodes()), dtype=np.int64)
+        edges = list(graph.edges())
+        citing_authors = np.array([edge[0] for edge in edges], dtype=np.int64)
+        cited_authors = np.array([edge[1] for edge in edges], dtype=np.int64)
+    np.save(prefix + '_nodes.npy', np.asarray(nodes, dtype=np.int64))
+    np.save(prefix + '_edges.npy', np.column_stack((citing_authors, cited_authors)).astype(np.int64))
+    print("Wrote the author graph with " + str(len(nodes)) + " nodes and " + str(len(citing_authors)) + " edges to '" + prefix + "_nodes.npy' and '" + prefix + "_edges.npy'.")
+
+def read_author_graph(prefix=SENSITIVITY_GRAPH_PREFIX):
+    # Nodes and edges are added in the order they were written, which gives the same graph (and adjacency order) as the one that was written
+    nodes = np.load(prefix + '_nodes.npy', mmap_mode='r')
+    edges = np.load(prefix + '_edges.npy', mmap_mode='r')
+    graph = nx.Graph()
+    graph.add_nodes_from(nodes.tolist())
+    for i in range(0, len(edges), SENSITIVITY_EDGE_CHUNK):
+        graph.add_edges_from(map(tuple, edges[i:i+SENSITIVITY_EDGE_CHUNK].tolist()))
+    return graph
+
+def remove_author_graph(prefix=SENSITIVITY_GRAPH_PREFIX):
+    for filename in (prefix + '_nodes.npy', prefix + '_edges.npy'):
+        if os.path.isfile(filename):
+            os.remove(filename)
+
+def sensitivity_workers(n_edges, n_tasks, workers=SENSITIVITY_WORKERS):
+    if workers is not None:
+        return workers
+    max_workers = os.cpu_count() or 1
+    memory = available_memory()
+    if memory is None:
+        return max_workers
+    return max(1, min(max_workers, n_tasks, int(memory * SENSITIVITY_MEMORY_FRACTION / max(n_edges * SENSITIVITY_BYTES_PER_EDGE, 1))))
+
+def load_worker_graph(prefix):
+    global author_graph
+    author_graph = read_author_graph(prefix)
+    analyzer.author_graph = author_graph
+
+def sensitivity_run(task):
+    i_run, random_seed, modularity_threshold = task
+    stdout = sys.stdout
+    sys.stdout = open('output_run' + str(i_run) + '.txt', 'w')
+    try:
+        print("INFO: Run #" + str(i_run) + ": Start of output")
+        analyzer.partition_indexes.clear() # The communities of the earlier runs of this worker are not needed anymore
+        analyzer.partition, analyzer.communities = analyzer.create_partition(author_graph, analyzer.storage.database, analyzer.excluded_keywords, random_seed, modularity_threshold, use_partition_cache=False)
+        if analyzer.partition is None:
+            print("Aborting this run...")
+        else:
+            analyzer.print_community_info(analyzer.community_size_threshold)
+            analyzer.print_community_json(analyzer.community_size_threshold, 'output_run' + str(i_run) + '.json')
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+    return i_run, random_seed, analyzer.modularity if analyzer.partition is not None else None
+
+def run_sensitivity_analysis(shared_analyzer, random_seeds, offset=0, modularity_threshold=None, workers=SENSITIVITY_WORKERS, prefix=SENSITIVITY_GRAPH_PREFIX):
+    # Run offset+i partitions the author graph with random_seeds[i]. The Analyzer should be created with partition_graph=False.
+    global analyzer
+    start_time = time.time()
+    analyzer = shared_analyzer
+    shared_graph = analyzer.author_graph
+    write_author_graph(shared_graph, analyzer.author_graph_edge_list, prefix)
+    workers = sensitivity_workers(shared_graph.number_of_edges(), len(random_seeds), workers)
+    tasks = [(i + offset, random_seed, modularity_threshold) for i, random_seed in enumerate(random_seeds)]
+    results = []
+    try:
+        analyzer.author_graph = None # The workers read the graph from the edge list instead of inheriting it
+        context = process_pool_context()
+        if context is None:
+            print("WARNING: Processes cannot be forked on this platform, so the " + str(len(tasks)) + " runs are carried out one after the other.")
+            load_worker_graph(prefix)
+            for task in tasks:
+                results.append(sensitivity_run(task))
+                print("Run #" + str(results[-1][0]) + " (seed " + str(results[-1][1]) + ") finished with modularity " + str(results[-1][2]) + ".")
+        else:
+            print("Partitioning with " + str(len(tasks)) + " seeds in " + str(workers) + " processes (each with its own copy of the author graph of " + str(shared_graph.number_of_edges()) + " edges)...")
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=load_worker_graph, initargs=(prefix,)) as executor:
+                futures = [executor.submit(sensitivity_run, task) for task in tasks]
+                for future in as_completed(futures):
+                    results.append(future.result())
+                    print("Run #" + str(results[-1][0]) + " (seed " + str(results[-1][1]) + ") finished with modularity " + str(results[-1][2]) + ". " +
+                          str(len(results)) + "/" + str(len(tasks)) + " runs in " + str(time.time() - start_time) + " seconds.")
+    finally:
+        analyzer.author_graph = shared_graph
+        remove_author_graph(prefix)
+    print("Sensitivity analysis of " + str(len(tasks)) + " runs completed in " + str(time.time() - start_time) + " seconds.")
+    return sorted(results)
@@ -0,0 +1,251 @@
+# A local columnar snapshot of the storage backend (Datastore or SQLite).
+# Downloading every Affiliation, Author, Keyword and Article entity from Datastore takes minutes, even though the data rarely change
+# between two analyses. After one download the database is therefore written to disk as numpy arrays (article ids, flags and
+# the reference/author/keyword lists in CSR form) that are memory-mapped on load, plus small JSON files for the strings.
+# A manifest describes the dataset (entity kinds, year filter and entity counts) and is used to detect stale or mismatched snapshots.
+# It also records the number of articles in the backend when the snapshot was written, which is compared with the current number before
+# the snapshot is used, so that a scrape or a deletion from another machine (which cannot invalidate this snapshot) is detected.
+import json, os, shutil
+import time
+import numpy as np
+import storage
+from storage import create_storage, Database, Article, Author, Keyword, Affiliation
+
+SNAPSHOT_FORMAT_VERSION = 2 # 2: backend article count in the manifest, no years array
+SNAPSHOT_MAX_AGE = 30 * 24 * 60 * 60 # Snapshots older than one month are considered stale, the same as the yac file
+# Bits of the article flags array
+FLAG_REFERENCES_ARE_UPDATED = 1
+FLAG_NOT_IN_SCOPUS = 2
+FLAG_OUT_OF_SCOPE = 4
+FLAG_FULLY_SCRAPED = 8
+
+class LocalSnapshot(object):
+    def __init__(self, path):
+        self.path = path
+
+    @staticmethod
+    def expected_manifest(datastore_kind_suffix=None, start_year_filter=None, end_year_filter=None):
+        # The kinds must already be selected (i.e. storage.select_datastore_kinds() was called)
+        return {
+            'format_version': SNAPSHOT_FORMAT_VERSION,
+            'backend': storage.STORAGE_BACKEND if storage.STORAGE_BACKEND != 'sqlite' else 'sqlite:' + os.path.abspath(storage.SQLITE_DATABASE_FILE),
+            'kind_suffix': datastore_kind_suffix,
+            'article_kind': storage.ARTICLE_KIND,
+            'author_kind': storage.AUTHOR_KIND,
+            'keyword_kind': storage.KEYWORD_KIND,
+            'affiliation_kind': storage.AFFILIATION_KIND,
+            'start_year_filter': None if start_year_filter is None else str(start_year_filter),
+            'end_year_filter': None if end_year_filter is None else str(end_year_filter)
+        }
+
+    def file(self, name):
+        return os.path.join(self.path, name)
+
+    def read_manifest(self):
+        manifest_file = self.file(storage.SNAPSHOT_MANIFEST_FILE)
+        if not os.path.isfile(manifest_file):
+            return None
+        try:
+            with open(manifest_file) as f:
+                return json.load(f)
+        except ValueError:
+            print("WARNING: Local snapshot manifest '" + manifest_file + "' could not be parsed!")
+            return None
+
+    def is_valid(self, expected_manifest, backend_articles=None):
+        # backend_articles is the current number of articles in the backend (see Storage.count_articles()), None if it is unknown
+        manifest = self.read_manifest()
+        if manifest is None:
+            print("No local snapshot found in '" + self.path + "'.")
+            return False
+        for key, value in expected_manifest.items():
+            if manifest.get(key) != value:
+                print("Local snapshot in '" + self.path + "' does not match (" + key + " is " + str(manifest.get(key)) + " instead of " + str(value) + ").")
+                return False
+        if time.time() - manifest['created'] > SNAPSHOT_MAX_AGE:
+            print("Local snapshot in '" + self.path + "' is older than one month and considered stale.")
+            return False
+        if backend_articles is None or manifest.get('backend_articles') is None:
+            print("WARNING: The number of articles in the backend is unknown, so changes made from other machines are only detected by the age of the local snapshot.")
+        elif manifest['backend_articles'] != backend_articles:
+            print("Local snapshot in '" + self.path + "' is stale: the backend has " + str(backend_articles) + " articles instead of " + str(manifest['backend_articles']) + ".")
+            return False
+        return True
+
+    def write(self, database, manifest, backend_articles=None):
+        print("Writing local snapshot to '" + self.path + "'...")
+        start_time = time.time()
+        tmp_path = self.path + '.tmp'
+        if os.path.isdir(tmp_path):
+            shutil.rmtree(tmp_path)
+        os.makedirs(tmp_path)
+        # Dense positions are used for all the cross references inside the snapshot
+        affiliations = list(database.affiliations.values())
+        authors = list(database.authors.values())
+        author_positions = {author.auid: i for i, author in enumerate(authors)}
+        keyword_keys = list(database.keywords.keys())
+        keyword_positions = {key: i for i, key in enumerate(keyword_keys)}
+        article_keys = list(database.articles.keys())
+        article_positions = {id(article): i for i, article in enumerate(database.articles.values())}
+        n_articles = len(article_keys)
+        flags = np.zeros(n_articles, dtype=np.uint8)
+        ref_indptr = np.zeros(n_articles + 1, dtype=np.int64)
+        author_indptr = np.zeros(n_articles + 1, dtype=np.int64)
+        keyword_indptr = np.zeros(n_articles + 1, dtype=np.int64)
+        ref_indices = []
+        author_indices = []
+        keyword_indices = []
+        articles_text = []
+        missing_references = 0
+        for i, article in enumerate(database.articles.values()):
+            flags[i] = (FLAG_REFERENCES_ARE_UPDATED * bool(article.references_are_updated) | FLAG_NOT_IN_SCOPUS * bool(article.not_in_scopus) |
+                        FLAG_OUT_OF_SCOPE * bool(article.out_of_scope) | FLAG_FULLY_SCRAPED * bool(article.fully_scraped))
+            for reference in article.references:
+                position = article_positions.get(id(reference))
+                if position is None:
+                    missing_references += 1
+                else:
+                    ref_indices.append(position)
+            ref_indptr[i + 1] = len(ref_indices)
+            for author in article.authors:
+                position = author_positions.get(author.auid)
+                if position is not None:
+                    author_indices.append(position)
+            author_indptr[i + 1] = len(author_indices)
+            for keyword in article.keywords:
+                position = keyword_positions.get(hash(keyword))
+                if position is not None:
+                    keyword_indices.append(position)
+            keyword_indptr[i + 1] = len(keyword_indices)
+            articles_text.append([article.title, article.eid, article.date, article.get_source(), article.first_author_surname])
+        if missing_references:
+            print("WARNING: " + str(missing_references) + " references were not in the database and are not part of the snapshot.")
+        np.save(os.path.join(tmp_path, 'article_keys.npy'), np.array(article_keys, dtype=np.int64))
+        np.save(os.path.join(tmp_path, 'article_flags.npy'), flags)
+        np.save(os.path.join(tmp_path, 'article_ref_indptr.npy'), ref_indptr)
+        np.save(os.path.join(tmp_path, 'article_ref_indices.npy'), np.array(ref_indices, dtype=np.int32))
+        np.save(os.path.join(tmp_path, 'article_author_indptr.npy'), author_indptr)
+        np.save(os.path.join(tmp_path, 'article_author_indices.npy'), np.array(author_indices, dtype=np.int32))
+        np.save(os.path.join(tmp_path, 'article_keyword_indptr.npy'), keyword_indptr)
+        np.save(os.path.join(tmp_path, 'article_keyword_indices.npy'), np.array(keyword_indices, dtype=np.int32))
+        with open(os.path.join(tmp_path, 'articles.json'), 'w') as f:
+            json.dump(articles_text, f)
+        with open(os.path.join(tmp_path, 'authors.json'), 'w') as f:
+            json.dump([[author.auid, author.surname, author.given_name, author.get_affiliation_id()] for author in authors], f)
+        with open(os.path.join(tmp_path, 'keywords.json'), 'w') as f:
+            json.dump([[key, database.keywords[key].name, database.keywords[key].count] for key in keyword_keys], f)
+        with open(os.path.join(tmp_path, 'affiliations.json'), 'w') as f:
+            json.dump([[aff.id, aff.name, aff.country] for aff in affiliations], f)
+        manifest = dict(manifest)
+        manifest['created'] = time.time()
+        manifest['backend_articles'] = backend_articles
+        manifest['counts'] = {
+            'articles': n_articles,
+            'authors': len(authors),
+            'keywords': len(keyword_keys),
+            'affiliations': len(affiliations),
+            'references': len(ref_indices)
+        }
+        # The manifest is written last and the directory is swapped in place so that an interrupted write never looks valid
+        with open(os.path.join(tmp_path, storage.SNAPSHOT_MANIFEST_FILE), 'w') as f:
+            json.dump(manifest, f, indent=1)
+        if os.path.isdir(self.path):
+            shutil.rmtree(self.path)
+        os.rename(tmp_path, self.path)
+        print("Local snapshot written in " + str(time.time() - start_time) + " seconds.")
+
+    def read(self, expected_manifest, backend_articles=None):
+        if not self.is_valid(expected_manifest, backend_articles):
+            return None
+        print("Loading database from local snapshot in '" + self.path + "'...")
+        start_time = time.time()
+        manifest = self.read_manifest()
+        counts = manifest['counts']
+        article_keys = np.load(self.file('article_keys.npy'), mmap_mode='r')
+        flags = np.load(self.file('article_flags.npy'), mmap_mode='r')
+        ref_indptr = np.load(self.file('article_ref_indptr.npy'), mmap_mode='r')
+        ref_indices = np.load(self.file('article_ref_indices.npy'), mmap_mode='r')
+        author_indptr = np.load(self.file('article_author_indptr.npy'), mmap_mode='r')
+        author_indices = np.load(self.file('article_author_indices.npy'), mmap_mode='r')
+        keyword_indptr = np.load(self.file('article_keyword_indptr.npy'), mmap_mode='r')
+        keyword_indices = np.load(self.file('article_keyword_indices.npy'), mmap_mode='r')
+        with open(self.file('articles.json')) as f:
+            articles_text = json.load(f)
+        with open(self.file('authors.json')) as f:
+            authors_rows = json.load(f)
+        with open(self.file('keywords.json')) as f:
+            keywords_rows = json.load(f)
+        with open(self.file('affiliations.json')) as f:
+            affiliations_rows = json.load(f)
+        # Check that the snapshot is complete before building anything from it
+        if (len(article_keys) != counts['articles'] or len(articles_text) != counts['articles'] or
+                len(authors_rows) != counts['authors'] or len(keywords_rows) != counts['keywords'] or
+                len(affiliations_rows) != counts['affiliations'] or len(ref_indices) != counts['references']):
+            print("WARNING: Local snapshot in '" + self.path + "' does not match the entity counts of its manifest!")
+            return None
+
+        database = Database()
+        for (f_id, f_name, f_country) in affiliations_rows:
+            database.affiliations[f_id] = Affiliation(f_id, f_name, f_country)
+        authors = []
+        for (f_auid, f_surname, f_given_name, f_affiliation) in authors_rows:
+            # Same handling of unknown affiliations as Storage.fetch_authors()
+            if f_affiliation is None:
+                affiliation_obj = Affiliation(None)
+            else:
+                affiliation_obj = database.affiliations.get(f_affiliation)
+                if affiliation_obj is None:
+                    affiliation_obj = Affiliation(f_affiliation)
+            author = Author(auid=f_auid, surname=f_surname, given_name=f_given_name, affiliation=affiliation_obj)
+            database.authors[f_auid] = author
+            authors.append(author)
+        keywords = []
+        for (key, f_name, f_count) in keywords_rows:
+            keyword = Keyword(name=f_name, count=f_count)
+            database.keywords[key] = keyword
+            keywords.append(keyword)
+
+        # Convert the memory-mapped arrays to lists once, indexing numpy scalars one by one is slow
+        ref_indptr = ref_indptr.tolist()
+        ref_indices = ref_indices.tolist()
+        author_indptr = author_indptr.tolist()
+        author_indices = author_indices.tolist()
+        keyword_indptr = keyword_indptr.tolist()
+        keyword_indices = keyword_indices.tolist()
+        flags = flags.tolist()
+        articles = []
+        for i, key in enumerate(article_keys.tolist()):
+            (f_title, f_eid, f_date, f_source, f_first_author_surname) = articles_text[i]
+            article = Article(eid=f_eid, title=f_title, date=f_date, source=None if f_source is None else database.shared_source(f_source), fsurname=f_first_author_surname,
+                              authors=[authors[a] for a in author_indices[author_indptr[i]:author_indptr[i + 1]]] or None, # Empty containers are allocated lazily
+                              keywords=set([keywords[k] for k in keyword_indices[keyword_indptr[i]:keyword_indptr[i + 1]]]) or None,
+                              refs_updated=bool(flags[i] & FLAG_REFERENCES_ARE_UPDATED), not_in_scopus=bool(flags[i] & FLAG_NOT_IN_SCOPUS),
+                              out_of_scope=bool(flags[i] & FLAG_OUT_OF_SCOPE), fully_scraped=bool(flags[i] & FLAG_FULLY_SCRAPED))
+            database.articles[key] = article
+            articles.append(article)
+        for i, article in enumerate(articles):
+            if ref_indptr[i + 1] > ref_indptr[i]:
+                article.references = set([articles[r] for r in ref_indices[ref_indptr[i]:ref_indptr[i + 1]]])
+            if article.eid is not None:
+                database.add_article_with_eid(article)
+        print("Loaded " + str(len(database.articles)) + " articles, " + str(len(database.authors)) + " authors, " + str(len(database.keywords)) + " keywords and " +
+              str(len(database.affiliations)) + " affiliations from the local snapshot in " + str(time.time() - start_time) + " seconds.")
+        return database
+
+# Loads the database from the local snapshot if there is a valid one, otherwise loads it from the storage backend and writes the snapshot for the next run
+def load_storage(datastore_default_kind=True, datastore_kind_suffix=None, start_year_filter=None, end_year_filter=None):
+    storage.select_datastore_kinds(datastore_default_kind, datastore_kind_suffix)
+    local_snapshot = LocalSnapshot(storage.snapshot_path(start_year_filter, end_year_filter))
+    expected_manifest = LocalSnapshot.expected_manifest(datastore_kind_suffix, start_year_filter, end_year_filter)
+    # A storage with an empty database only connects to the backend, to count its articles (a cheap aggregation query or COUNT(*))
+    backend_storage = create_storage(database=Database(), datastore_default_kind=datastore_default_kind, datastore_kind_suffix=datastore_kind_suffix)
+    database = local_snapshot.read(expected_manifest, backend_storage.count_articles())
+    if database is not None:
+        backend_storage.database = database
+        return backend_storage
+    loaded_storage = create_storage(datastore_default_kind=datastore_default_kind, datastore_kind_suffix=datastore_kind_suffix, start_year_filter=start_year_filter, end_year_filter=end_year_filter)
+    if storage.DATABASE_SMOKE_TEST:
+        print("Skip writing the local snapshot...")
+    else:
+        local_snapshot.write(loaded_storage.database, expected_manifest, loaded_storage.count_articles())
+    return loaded_storage
@@ -0,0 +1,175 @@
+import sqlite3, json, time, os
+from contextlib import closing
+import storage
+from storage import Storage, MAX_PUT_LIST_SIZE, ARTICLE_PROPERTIES, SQLITE_DATABASE_FILE, invalidate_local_snapshots
+
+SQLITE_LIST_PROPERTIES = ('authors_array', 'keywords_array', 'references_array') # Stored as JSON text
+SQLITE_BOOLEAN_PROPERTIES = ('references_are_updated', 'not_in_scopus', 'out_of_scope', 'fully_scraped') # Stored as 0/1
+SQLITE_INDEXED_PROPERTIES = ('first_author_surname', 'surname') # Indexed together with the publication year
+SQLITE_FETCH_PAGE_SIZE = 1000 # Rows converted per page during the load
+SQLITE_MAX_VARIABLES = 500 # Keys per lookup, below the limit of host parameters in a statement of older SQLite versions
+
+def table_name(kind):
+    # Kinds may contain '-' (e.g. 'Article-kth'), so table names are always quoted
+    return '"' + kind.replace('"', '') + '"'
+
+def publication_year(date):
+    if date is not None and len(date) >= 4 and date[:4].isdigit():
+        return int(date[:4])
+    return None
+
+class SQLiteStorage(Storage):
+    # Storage backend on a local SQLite file with one table per kind
+    location = 'SQLite database'
+
+    def connect(self):
+        self.sqlite_file = SQLITE_DATABASE_FILE
+        print("Using the SQLite database in '" + self.sqlite_file + "'.")
+
+    def open_connection(self):
+        # A new connection per call, since the load fetches the kinds from several threads
+        return sqlite3.connect(self.sqlite_file)
+
+    @staticmethod
+    def columns(properties):
+        columns = list(properties)
+        if 'date' in properties:
+            columns.append('year') # Derived from the date, so that year filters can use an index
+        return columns
+
+    def ensure_table(self, connection, kind, properties):
+        table = table_name(kind)
+        connection.execute("CREATE TABLE IF NOT EXISTS " + table + " (key TEXT PRIMARY KEY, " + ", ".join(self.columns(properties)) + ")")
+        if 'date' in properties:
+            connection.execute("CREATE INDEX IF NOT EXISTS " + table_name(kind + '_year') + " ON " + table + " (year)")
+        for indexed_property in SQLITE_INDEXED_PROPERTIES:
+            if indexed_property in properties:
+                connection.execute("CREATE INDEX IF NOT EXISTS " + table_name(kind + '_' + indexed_property) + " ON " + table + " (" + indexed_property + ")")
+
+    @staticmethod
+    def encode(name, value):
+        if value is not None and name in SQLITE_LIST_PROPERTIES:
+            return json.dumps(value)
+        return value
+
+    @staticmethod
+    def decode(name, value):
+        if value is not None:
+            if name in SQLITE_LIST_PROPERTIES:
+                return json.loads(value)
+            if name in SQLITE_BOOLEAN_PROPERTIES:
+                return bool(value)
+        return value
+
+    def put_records(self, kind, properties, records, new_put_limit=MAX_PUT_LIST_SIZE):
+        if not records:
+            print("Nothing new to store.")
+            return True
+        if storage.DATABASE_SMOKE_TEST or storage.DATABASE_READ_ONLY:
+            print("Skip actual storing...")
+            return None
+        print("Storing...")
+        start_time = time.time()
+        columns = self.columns(properties)
+        rows = []
+        for key_name, record in records:
+            row = [str(key_name)] + [self.encode(name, record.get(name)) for name in properties]
+            if 'date' in properties:
+                row.append(publication_year(record.get('date')))
+            rows.append(row)
+        statement = "INSERT OR REPLACE INTO " + table_name(kind) + " (key, " + ", ".join(columns) + ") VALUES (" + ", ".join(["?"] * (len(columns) + 1)) + ")"
+        try:
+            with closing(self.open_connection()) as connection:
+                with connection: # Commits all the rows in one transaction
+                    self.ensure_table(connection, kind, properties)
+                    connection.executemany(statement, rows)
+        except sqlite3.Error as e:
+            print("ERROR: Storing " + str(len(rows)) + " " + kind + " records in SQLite failed: " + str(e))
+            return False
+        end_time = time.time()
+        print("Time to store to SQLite: " + str(end_time - start_time))
+        print("Stored " + str(len(rows)) + " " + kind + " records (%.1f records/sec)" % (len(rows) / max(end_time - start_time, 1e-6)))
+        invalidate_local_snapshots()
+        return True
+
+    def delete_entity(self, entity_type, key_to_del):
+        with closing(self.open_connection()) as connection:
+            with connection:
+                try:
+                    connection.execute("DELETE FROM " + table_name(entity_type) + " WHERE key = ?", (str(key_to_del),))
+                except sqlite3.OperationalError: # The table does not exist yet, so there is nothing to delete
+                    return
+        invalidate_local_snapshots()
+
+    def delete_records(self, kind, keys):
+        print("Deleting " + str(len(keys)) + " " + kind + " records...")
+        try:
+            with closing(self.open_connection()) as connection:
+                with connection: # Deletes all the rows in one transaction
+                    connection.executemany("DELETE FROM " + table_name(kind) + " WHERE key = ?", [(key,) for key in keys])
+        except sqlite3.OperationalError: # The table does not exist yet, so there is nothing to delete
+            return True
+        except sqlite3.Error as e:
+            print("ERROR: Deleting " + str(len(keys)) + " " + kind + " records from SQLite failed: " + str(e))
+            return False
+        invalidate_local_snapshots()
+        return True
+
+    def fetch_record_pages(self, kind, properties, where="", parameters=()):
+        if not os.path.isfile(self.sqlite_file):
+            return
+        with closing(self.open_connection()) as connection:
+            try:
+                cursor = connection.execute("SELECT key, " + ", ".join(properties) + " FROM " + table_name(kind) + where, parameters)
+            except sqlite3.OperationalError: # The table does not exist yet
+                return
+            while True:
+                rows = cursor.fetchmany(SQLITE_FETCH_PAGE_SIZE)
+                if not rows:
+                    break
+                yield [(row[0], dict((name, self.decode(name, value)) for name, value in zip(properties, row[1:]))) for row in rows]
+
+    def fetch_article_pages(self, page_queue, start_year_filter=None, end_year_filter=None):
+        where = ""
+        parameters = []
+        if start_year_filter is not None and end_year_filter is not None:
+            start_date = str(start_year_filter)
+            end_date = str(end_year_filter)
+            # The same string comparison as the year filter, narrowed down first with the indexed year column
+            where = " WHERE date >= ? AND date <= ?"
+            parameters = [start_date, end_date]
+            if start_date[:4].isdigit() and end_date[:4].isdigit():
+                where += " AND year >= ? AND year <= ?"
+                parameters += [int(start_date[:4]), int(end_date[:4])]
+            print("Now fetching articles with dates from " + start_date + " to " + end_date + "...")
+        else:
+            print("Now fetching articles...")
+        n_fetched_articles = 0
+        try:
+            queries = [(where, parameters)]
+            if start_year_filter is not None and end_year_filter is not None:
+                # The articles without a full (parsable) date are outside the date range, but the year filter keeps them (with their authors)
+                queries.append((" WHERE (year IS NULL OR length(date) <= 4) AND (date IS NULL OR date < ? OR date > ?)", [start_date, end_date]))
+            for query_where, query_parameters in queries:
+                for page in self.fetch_record_pages(storage.ARTICLE_KIND, ARTICLE_PROPERTIES, query_where, query_parameters):
+                    n_fetched_articles += len(page)
+                    if not page_queue.put([record for key, record in page]): # The load was stopped
+                        return
+        finally:
+            page_queue.put(None) # Always signal the end, otherwise the load would wait forever
+        print("Fetched " + str(n_fetched_articles) + " articles.")
+
+    def fetch_article_pages_by_key(self, keys):
+        for i in range(0, len(keys), SQLITE_MAX_VARIABLES):
+            chunk = [str(key) for key in keys[i:i+SQLITE_MAX_VARIABLES]]
+            for page in self.fetch_record_pages(storage.ARTICLE_KIND, ARTICLE_PROPERTIES, " WHERE key IN (" + ", ".join(["?"] * len(chunk)) + ")", chunk):
+                yield [record for key, record in page]
+
+    def count_articles(self):
+        if not os.path.isfile(self.sqlite_file):
+            return 0
+        with closing(self.open_connection()) as connection:
+            try:
+                return connection.execute("SELECT COUNT(*) FROM " + table_name(storage.ARTICLE_KIND)).fetchone()[0]
+            except sqlite3.OperationalError:
+                return 0
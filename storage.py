@@ -6,36 +6,105 @@ import time
 import unicodedata
 import uuid
 import jellyfish, mmh3
-from threading import Thread
-
-# Imports the Google Cloud client library
-from google.cloud import datastore
+import numpy as np
+from threading import Thread, Lock, Event, local
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+import multiprocessing
+from queue import Queue, Full, Empty
+
+# Imports the Google Cloud client library (only needed by the Datastore storage backend)
+try:
+    from google.cloud import datastore
+except ImportError:
+    datastore = None
+import atlas_config
+# Settings added to atlas_config.py later, with their defaults for older configuration files
+STORAGE_BACKEND = getattr(atlas_config, 'STORAGE_BACKEND', 'datastore')
+SQLITE_DATABASE_FILE = getattr(atlas_config, 'SQLITE_DATABASE_FILE', 'atlas.sqlite')
+from citation_index import CitationIndex
 
 # Defines for storing in Datastore
 MAX_PUT_LIST_SIZE = 300 # 500 is the maximum supported by the Google Datastore API but 300 proved to be the fastest choice
+MAX_GET_LIST_SIZE = 1000 # The maximum number of keys in a single Datastore lookup
+MAX_DELETE_LIST_SIZE = 500 # The maximum number of keys in a single Datastore delete_multi
+ARTICLE_LOAD_SHARDS = 6 # Number of key ranges (and threads) the article download is split into
+ARTICLE_SHARD_SAMPLES_PER_SHARD = 32 # Keys sampled per shard to place the shard boundaries
+ARTICLE_PAGE_QUEUE_SIZE = 32 # Raw article pages held while they wait to be converted, the fetch waits beyond that
+ARTICLE_PAGE_QUEUE_TIMEOUT = 1 # Seconds a fetch thread waits on a full queue before it checks whether the load was stopped
 JARO_DISTANCE_GENERAL_THRESHOLD = 0.95 # To be used as it is
 JARO_DISTANCE_COMBINED_THRESHOLD = 0.90 # To be used with check on publication year
 JARO_DISTANCE_NAME_THRESHOLD = 0.80 # To be only used with max threshold on title and publication year
 JARO_DISTANCE_TITLE_THRESHOLD = 0.75 # To be only used with max threshold on surname and publication year
 JARO_DISTANCE_MAX = 1.00
+MATCH_INDEX_BUCKETS = 48 # Character buckets of the article match index: a-z, 0-9, space and 11 buckets for everything else
+MATCH_INDEX_TOLERANCE = 1e-9 # Keeps the Jaro upper bound on the safe side of floating point rounding
+MATCH_INDEX_SURNAME_PREFIX = 3 # Characters of the first author surname that block the articles of a year in the article match index
+MATCH_INDEX_TITLE_PREFIX = 12 # Characters of the title that block the articles of all years in the article match index
+DUPLICATE_DETECTION_WORKERS = None # Processes comparing the duplicate candidates (None means one per CPU)
+DUPLICATE_TASK_COMPARISONS = 2000000 # Title comparisons per task sent to a worker
 ARTICLE_KIND = 'Article'
 AUTHOR_KIND = 'Author'
 KEYWORD_KIND = 'Keyword'
 AFFILIATION_KIND = 'Affiliation'
+# The properties stored for every kind, in the order used by the storage backends
+ARTICLE_PROPERTIES = ('title', 'eid', 'date', 'source', 'first_author_surname', 'authors_array', 'keywords_array', 'references_array', 'references_are_updated', 'not_in_scopus', 'out_of_scope', 'fully_scraped')
+AUTHOR_PROPERTIES = ('auid', 'surname', 'given_name', 'affiliation')
+KEYWORD_PROPERTIES = ('name', 'count')
+AFFILIATION_PROPERTIES = ('name', 'country')
+# Defines for the local columnar snapshot of the cloud database
+SNAPSHOT_DIR = 'snapshots'
+SNAPSHOT_MANIFEST_FILE = 'manifest.json'
+STORE_WORKERS = 8 # Number of concurrent put_multi requests, tune against the Datastore write quota
+STORE_MAX_RETRIES = 5 # Attempts per batch before the store is reported as failed
+STORE_RETRY_BACKOFF = 2 # Seconds to wait before the first retry, doubled for every further attempt
+STORE_MANIFEST_FILE = 'store_manifest.log' # Entities (kind, key and content digest) committed by an unfinished store, so that it can be resumed
 # Below flags are for debugging
 DATABASE_SMOKE_TEST = False
 DATABASE_READ_ONLY = False
 
+# Surnames, given names, dates and countries repeat a lot, so the loaded objects share one copy of each string
+def intern_string(value):
+    if isinstance(value, str):
+        return sys.intern(value)
+    return value
+
+def id_attribute(slot):
+    # An article attribute that the article id is computed from, backed by a slot. Setting it drops the cached id (see Article.__hash__),
+    # while reading it costs no more than reading the slot.
+    def set_value(article, value):
+        setattr(article, slot, value)
+        article._id = None
+    return property(operator.attrgetter(slot), set_value)
+
+class LazyContainer(object):
+    # An attribute backed by a slot that only allocates its (empty) container on first access.
+    # Most articles are reference stubs that never get authors, keywords, references or citations of their own.
+    def __init__(self, slot, factory):
+        self.slot = slot
+        self.factory = factory
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        value = getattr(obj, self.slot)
+        if value is None:
+            value = self.factory()
+            setattr(obj, self.slot, value)
+        return value
+
+    def __set__(self, obj, value):
+        setattr(obj, self.slot, value)
+
 class Author(object):
+    __slots__ = ('auid', 'surname', 'given_name', 'affiliation', '_articles', 'citation_cnt')
+    articles = LazyContainer('_articles', set)
+
     def __init__(self, auid, surname=None, given_name=None, affiliation=None, articles=None):
         self.auid = auid
-        self.surname = surname
-        self.given_name = given_name
+        self.surname = intern_string(surname)
+        self.given_name = intern_string(given_name)
         self.affiliation = affiliation
-        if articles is None:
-            self.articles = set([])
-        else:
-            self.articles = articles
+        self._articles = articles
         self.citation_cnt = 0
 
     def __eq__(self, other):
@@ -140,42 +209,38 @@ class Author(object):
             return self.affiliation.id
 
 class Article(object):
- 
+    __slots__ = ('_title', '_eid', 'date', 'source', '_first_author_surname', '_authors', '_keywords', '_references', '_references_array', '_citations', '_citations_array',
+                 'references_are_updated', 'not_in_scopus', 'out_of_scope', '_fully_scraped', '_id')
+    title = id_attribute('_title')
+    eid = id_attribute('_eid')
+    first_author_surname = id_attribute('_first_author_surname')
+    fully_scraped = id_attribute('_fully_scraped')
+    authors = LazyContainer('_authors', list)
+    keywords = LazyContainer('_keywords', set)
+    references = LazyContainer('_references', set)
+    references_array = LazyContainer('_references_array', list) # Only used while loading, released when the references are resolved
+    citations = LazyContainer('_citations', set)
+    citations_array = LazyContainer('_citations_array', list)
+
     def __init__(self, eid, title='No title', date=None, source=None, fsurname='Anonymous', authors=None, keywords=None, references=None, citations=None, refs_updated=False, not_in_scopus=False, out_of_scope=False, fully_scraped=False, references_array=None, citations_array=None):
         self.title = title
         self.eid = eid
-        self.date = date
+        self.date = intern_string(date)
         self.source = source
-        self.first_author_surname = fsurname
-        if authors is None:
-            self.authors = []
-        else:
-            self.authors = authors
-        if keywords is None:
-            self.keywords = set([])
-        else:
-            self.keywords = keywords
-        if references is None:
-            self.references = set([])
-        else:
-            self.references = references
-        if references_array is None:
-            self.references_array = []
-        else:
-            self.references_array = references_array
-        if citations is None:
-            self.citations = set([])
-        else:
-            self.citations = citations
-        if citations_array is None:
-            self.citations_array = []
-        else:
-            self.citations_array = citations_array
+        self.first_author_surname = intern_string(fsurname)
+        # The containers are allocated when first used (see LazyContainer)
+        self._authors = authors
+        self._keywords = keywords
+        self._references = references
+        self._references_array = references_array
+        self._citations = citations
+        self._citations_array = citations_array
         self.references_are_updated = refs_updated
         self.not_in_scopus = not_in_scopus
         self.out_of_scope = out_of_scope
         self.fully_scraped = fully_scraped
-        
+        self._id = None
+
     def __eq__(self, other):
         # First check if they have the same hashes
         if self.__hash__() == other.__hash__():
@@ -190,19 +255,25 @@ class Article(object):
             #print("EIDs were the same")
             return True
         else:
-            # Using Jaro-Winkler distance measurement for equality!
-            jaro_distance = jellyfish.jaro_distance(str(self), str(other))
-            if jaro_distance >= JARO_DISTANCE_GENERAL_THRESHOLD:
-                #print("Jaro told us they are the same!")
-                Database.merge_articles(self, other, verbose=True)
-                return True
-            else:
-                return False
+            # No fuzzy matching here, since this runs on every set and dict operation. Articles that are only lexicographically the same
+            # are found with Database.get_article_based_on_description() and merged with Database.merge_articles().
+            return False
 
     def __ne__(self, other):
         return not self.__eq__(other)
 
     def __hash__(self):
+        # The id is computed once and cached until one of the id attributes changes (see id_attribute()). When the first author surname
+        # comes from the authors list it is not cached, since changes to the list cannot be noticed.
+        article_id = self._id
+        if article_id is None:
+            article_id = self.compute_id()
+            if self.eid is not None and (self.fully_scraped or (self.title == "No title" and self.first_author_surname == "Anonymous")) or \
+                    (self.first_author_surname and isinstance(self.first_author_surname, str) and self.first_author_surname != 'Anonymous'):
+                self._id = article_id
+        return article_id
+
+    def compute_id(self):
         # Using MurmurHash3 because Python's hash() is not unique among runs and because MurmurHash is really fast!
         if hasattr(self, 'eid') and self.eid is not None and (self.fully_scraped or (self.title == "No title" and self.first_author_surname == "Anonymous")):
             return mmh3.hash(self.eid, signed=False)
@@ -262,9 +333,9 @@ class Article(object):
                     self.title is None or
                     self.date is None or
                     self.source is None or
-                    not self.authors or
-                    not self.keywords or
-                    not self.references)
+                    not self._authors or
+                    not self._keywords or
+                    not self._references)
 
     def safe_unicode(self, obj, *args):
         """ return the unicode representation of obj """
@@ -403,7 +474,7 @@ class Article(object):
 
     def get_references(self):
         references_array = []
-        for ref in self.references:
+        for ref in self._references or ():
             references_array.append(str(hash(ref)))
         if not references_array:
             return None
@@ -412,7 +483,7 @@ class Article(object):
 
     def get_citations(self):
         citations_array = []
-        for cit in self.citations:
+        for cit in self._citations or ():
             citations_array.append(str(hash(cit)))
         if not citations_array:
             return None
@@ -441,6 +512,8 @@ class Article(object):
 
 
 class Source(object):
+    __slots__ = ('name',)
+
     def __init__(self, name):
         self.name = name
 
@@ -457,10 +530,12 @@ class Source(object):
 
 
 class Affiliation(object):
+    __slots__ = ('id', 'name', 'country')
+
     def __init__(self, id, name=None, country=None):
         self.id = id
         self.name = name
-        self.country = country
+        self.country = intern_string(country)
 
     def __eq__(self, other):
         return self.id == other.id
@@ -473,6 +548,8 @@ class Affiliation(object):
 
 
 class Keyword(object):
+    __slots__ = ('name', 'count')
+
     def __init__(self, name, count=1):
         self.name = name
         self.count = count
@@ -514,6 +591,178 @@ class Keyword(object):
     def namef(self):
         return self.safe_str(self.name)
 
+# The fork start method shares the parent's memory with the workers, otherwise the platform default is used
+def process_pool_context():
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return None
+
+# Packs the surname groups into tasks of about DUPLICATE_TASK_COMPARISONS title comparisons each, splitting the large groups by rows
+def duplicate_detection_tasks(groups):
+    tasks = []
+    task = []
+    task_comparisons = 0
+    for group in sorted(groups, key=len):
+        row_start = 0
+        while row_start < len(group):
+            row_end = row_start
+            comparisons = 0
+            while row_end < len(group) and (comparisons == 0 or task_comparisons + comparisons < DUPLICATE_TASK_COMPARISONS):
+                comparisons += len(group) - row_end - 1
+                row_end += 1
+            task.append((group, row_start, row_end))
+            task_comparisons += comparisons
+            row_start = row_end
+            if task_comparisons >= DUPLICATE_TASK_COMPARISONS:
+                tasks.append(task)
+                task = []
+                task_comparisons = 0
+    if task:
+        tasks.append(task)
+    return tasks
+
+# Worker of identify_description_duplicates(): the same checks as same_author_and_title() on (position, lowercase title, eid, hash) tuples
+# of articles that share the first author surname. Two different records (different hash and eid) are duplicates if one title contains the other.
+def find_duplicate_pairs(task):
+    pairs = []
+    for group, row_start, row_end in task:
+        for i in range(row_start, row_end):
+            position_a, title_a, eid_a, hash_a = group[i]
+            for j in range(i + 1, len(group)):
+                position_b, title_b, eid_b, hash_b = group[j]
+                if (title_a in title_b or title_b in title_a) and (hash_a is None or hash_b is None or hash_a != hash_b) and not (eid_a is not None and eid_a == eid_b):
+                    pairs.append((position_a, position_b))
+    return pairs
+
+class ArticleMatchIndex(object):
+    # Narrows Database.get_article_based_on_description() down to the few articles with EID that can pass articles_lexicographically_same().
+    # The articles are first blocked on the year and the first letters of the first author surname, and on the first letters of the title
+    # (whatever the year), so that only the articles of the blocks of an article are compared with it. The Jaro similarity of two strings
+    # is at most (c/|a| + c/|b| + 1)/3, where c is the number of characters they have in common. Counting common characters per bucket can
+    # only overestimate c, so a vectorized count over the blocks rules out every article whose description cannot reach the Jaro thresholds.
+    # The remaining checks require the same year and an identical (lowercase) title or first author surname, which are looked up in
+    # dictionaries. The candidates are returned in articles_with_eid order and Jaro decides.
+    def __init__(self, database):
+        self.database = database
+        self.clear()
+
+    def clear(self):
+        self.rows = [] # The articles in the order they first appear in articles_with_eid
+        self.row_of = dict() # id(article) -> row
+        self.row_blocks = [] # The block keys of every row, so that the row can be removed from its blocks when it is refreshed
+        self.indexed_length = 0
+        self.indexed_version = None # Database.articles_with_eid_version when the index was last synchronized
+        self.indexed_generation = self.database.articles_with_eid_generation
+        self.char_counts = np.zeros((1024, MATCH_INDEX_BUCKETS), dtype=np.uint16)
+        self.lengths = np.ones(1024, dtype=np.int32)
+        self.years = np.full(1024, -1, dtype=np.int32)
+        self.year_codes = dict()
+        self.blocks = dict() # Block key -> rows
+
+    @staticmethod
+    def bucket_counts(text):
+        counts = np.zeros(MATCH_INDEX_BUCKETS, dtype=np.uint16)
+        for ch in text:
+            o = ord(ch)
+            if 97 <= o <= 122:
+                counts[o - 97] += 1
+            elif 48 <= o <= 57:
+                counts[o - 22] += 1
+            elif o == 32:
+                counts[36] += 1
+            else:
+                counts[37 + o % 11] += 1
+        return counts
+
+    @staticmethod
+    def block_keys(article):
+        # The 'surname' and 'title' blocks hold the articles of the same year with an identical first author surname or title, which are
+        # always candidates. The 'surname_prefix' and 'title_prefix' blocks hold the articles that are compared with the Jaro upper bound.
+        keys = []
+        title = article.title.lower() if isinstance(article.title, str) else None
+        if title is not None:
+            keys.append(('title_prefix', title[:MATCH_INDEX_TITLE_PREFIX]))
+        if article.date is None:
+            return keys
+        year = article.date[:4]
+        keys.append(('surname_prefix', year, article.get_first_author_surname().lower()[:MATCH_INDEX_SURNAME_PREFIX]))
+        if isinstance(article.first_author_surname, str):
+            keys.append(('surname', year, article.first_author_surname.lower()))
+        if title is not None:
+            keys.append(('title', year, title))
+        return keys
+
+    def year_code(self, year):
+        if year not in self.year_codes:
+            self.year_codes[year] = len(self.year_codes)
+        return self.year_codes[year]
+
+    def set_row(self, row, article):
+        for block_key in self.row_blocks[row]:
+            self.blocks[block_key].discard(row)
+        description = article.description().lower()
+        self.char_counts[row] = self.bucket_counts(description)
+        self.lengths[row] = max(len(description), 1)
+        self.years[row] = -1 if article.date is None else self.year_code(article.date[:4])
+        self.row_blocks[row] = self.block_keys(article)
+        for block_key in self.row_blocks[row]:
+            self.blocks.setdefault(block_key, set([])).add(row)
+
+    def add_row(self, article):
+        row = len(self.rows)
+        if row == len(self.lengths): # Grow the arrays
+            self.char_counts = np.concatenate((self.char_counts, np.zeros_like(self.char_counts)))
+            self.lengths = np.concatenate((self.lengths, np.ones_like(self.lengths)))
+            self.years = np.concatenate((self.years, np.full_like(self.years, -1)))
+        self.rows.append(article)
+        self.row_of[id(article)] = row
+        self.row_blocks.append([])
+        self.set_row(row, article)
+
+    def refresh(self, article):
+        # Must be called when the title, first author or date of an article in articles_with_eid changes
+        row = self.row_of.get(id(article))
+        if row is not None:
+            self.set_row(row, article)
+
+    def sync(self):
+        # Database.articles_with_eid_version changes with every change of articles_with_eid, and its generation when articles are removed
+        database = self.database
+        if database.articles_with_eid_version == self.indexed_version:
+            return
+        if database.articles_with_eid_generation != self.indexed_generation: # Not only appended to, so start over
+            self.clear()
+        articles_with_eid = database.articles_with_eid
+        for article in articles_with_eid[self.indexed_length:]:
+            if id(article) in self.row_of:
+                self.refresh(article) # Appended again (e.g. after being completed), so its details may have changed
+            else:
+                self.add_row(article)
+        self.indexed_length = len(articles_with_eid)
+        self.indexed_version = database.articles_with_eid_version
+
+    def candidates(self, article):
+        self.sync()
+        if not self.rows:
+            return []
+        candidate_rows = set([])
+        block_rows = set([])
+        for block_key in self.block_keys(article):
+            if block_key[0] in ('surname', 'title'):
+                candidate_rows.update(self.blocks.get(block_key, ()))
+            else:
+                block_rows.update(self.blocks.get(block_key, ()))
+        if block_rows:
+            rows = np.array(sorted(block_rows), dtype=np.int64)
+            description = article.description().lower()
+            common = np.minimum(self.char_counts[rows], self.bucket_counts(description)).sum(axis=1)
+            jaro_bound = (common / max(len(description), 1) + common / self.lengths[rows] + 1) / 3 + MATCH_INDEX_TOLERANCE
+            mask = jaro_bound >= JARO_DISTANCE_GENERAL_THRESHOLD
+            if article.date is not None and article.date[:4] in self.year_codes:
+                mask |= (self.years[rows] == self.year_codes[article.date[:4]]) & (jaro_bound >= JARO_DISTANCE_COMBINED_THRESHOLD)
+            candidate_rows.update(rows[mask].tolist())
+        return [self.rows[row] for row in sorted(candidate_rows)]
+
 class Database(object):
     def __init__(self):
         self.authors = dict() # Authors are saved in the dictionary with the author.auid as the key
@@ -521,8 +770,59 @@ class Database(object):
         # If an article has eid != None then it is fully scraped but if fully_scraped is False when eid != None then it was scraped afterwards!
         self.keywords = dict() # Keywords are saved in the dictionary with their hash as the key (same as above)
         self.affiliations = dict() # Affiliations are saved in the dictionary with the affiliation.id as the key
+        self.sources = dict() # The shared Source of every journal name, see shared_source()
         self.delimiting_keywords = set([])
         self.articles_with_eid = []
+        self.articles_with_eid_version = 0 # Increased with every change of articles_with_eid, see add_article_with_eid()
+        self.articles_with_eid_generation = 0 # Increased when articles are removed from articles_with_eid instead of appended
+        # Objects created or changed since the last successful store. Articles are keyed by id() because their hash may change while being completed
+        self.dirty_articles = dict()
+        self.dirty_authors = dict()
+        self.dirty_keywords = dict()
+        self.article_match_index = ArticleMatchIndex(self) # Blocking index over articles_with_eid for get_article_based_on_description()
+        self.citation_index = None # Integer-indexed citation graph, see build_citation_index()
+
+    def shared_source(self, name):
+        # Thousands of articles are published in the same journal, so they all get the same Source object of this database
+        source = self.sources.get(name)
+        if source is None:
+            source = self.sources.setdefault(name, Source(intern_string(name)))
+        return source
+
+    def refresh_article_index(self, article):
+        self.article_match_index.refresh(article)
+
+    def add_article_with_eid(self, article):
+        self.articles_with_eid.append(article)
+        self.articles_with_eid_version += 1
+
+    def build_citation_index(self):
+        # Builds the CSR citation index from the current articles, references and authors. Build it again after changing them.
+        self.citation_index = CitationIndex(self)
+        return self.citation_index
+
+    def mark_article_dirty(self, article):
+        if article is not None:
+            self.dirty_articles[id(article)] = article
+
+    def mark_author_dirty(self, author):
+        if author is not None:
+            self.dirty_authors[id(author)] = author
+
+    def mark_keyword_dirty(self, keyword):
+        if keyword is not None:
+            self.dirty_keywords[id(keyword)] = keyword
+
+    def mark_all_dirty(self):
+        for key, article in self.articles.items():
+            self.mark_article_dirty(article)
+        for key, author in self.authors.items():
+            self.mark_author_dirty(author)
+        for key, keyword in self.keywords.items():
+            self.mark_keyword_dirty(keyword)
+
+    def has_unsaved_changes(self):
+        return bool(self.dirty_articles or self.dirty_authors or self.dirty_keywords)
 
     def read_keywords_from_file(self, filename):
         print("Reading delimiting keywords from file...")
@@ -556,12 +856,13 @@ class Database(object):
             if article is not None:
             #  print("Checking if article with EID already exists in database.")
                 if article.description().lower() != "anonymous, no title":
-                    existing_records = [a for a in self.articles_with_eid if Database.articles_lexicographically_same(article, a)]
-                    if existing_records:
-                        if isinstance(existing_records[0], Article):
-                            if existing_records[0] is not None:
+                    # Only the candidates of the blocking index can match, and they come in articles_with_eid order (so the first match is the same)
+                    for existing_record in self.article_match_index.candidates(article):
+                        if Database.articles_lexicographically_same(article, existing_record):
+                            if isinstance(existing_record, Article):
             #                  print "Article with EID exists, matching the description: " + article.description().lower().encode('utf-8')
-                                return existing_records[0]
+                                return existing_record
+                            break
             #  print("Article matching the description didn't already exist.")
             return None
     
@@ -592,8 +893,9 @@ class Database(object):
             stored_article = self.get_article(article)
             if stored_article is None:
                 self.articles[hash(article)] = article
+                self.mark_article_dirty(article)
                 if article.eid is not None:
-                    self.articles_with_eid.append(article)
+                    self.add_article_with_eid(article)
             else:
                 article = stored_article
             return article
@@ -601,23 +903,32 @@ class Database(object):
     def add_author(self, new_author):
         if new_author.auid in self.authors:
             old_author = self.authors[new_author.auid]
-            if old_author.surname is None:
+            if old_author.surname is None and new_author.surname is not None:
                 old_author.surname = new_author.surname
-            if old_author.given_name is None:
+                self.mark_author_dirty(old_author)
+            if old_author.given_name is None and new_author.given_name is not None:
                 old_author.given_name = new_author.given_name
-            if old_author.affiliation is None:
+                self.mark_author_dirty(old_author)
+            if old_author.affiliation is None and new_author.affiliation is not None:
                 old_author.affiliation = new_author.affiliation
+                self.mark_author_dirty(old_author)
             if not old_author.articles:
                 old_author.articles = new_author.articles
         else:
             self.authors[new_author.auid] = new_author
+            self.mark_author_dirty(new_author)
 
     def add_keywords(self, keyword):
+        # Returns the keyword object of the database, so that the articles share one object per keyword
         if keyword in self.keywords: # (solved) PROBLEM with __eq__ getting an int happened here. Solved I think, see line 419. 
             old_keyword = self.keywords[hash(keyword)]
             old_keyword.count += 1
+            self.mark_keyword_dirty(old_keyword)
+            return old_keyword
         else:
             self.keywords[hash(keyword)] = keyword
+            self.mark_keyword_dirty(keyword)
+            return keyword
 
     def get_authors_articles(self, author_surname):
         articles = set([])
@@ -652,6 +963,7 @@ class Database(object):
             if new_art_authors and len(article.authors) != len(new_art_authors) :
                 print(("a(" + str(len(article.authors)) + ">" + str(len(new_art_authors)) + ")" ), end=' ')
                 article.authors = new_art_authors
+                self.mark_article_dirty(article)
         print("Finished!")
 
     def ensure_references_are_in_database(self):
@@ -667,6 +979,8 @@ class Database(object):
                     new_references.add(stored_article)
                     if stored_article != reference:
                         print("Replacing " + reference.full_descriptive_string() + " with " + stored_article.full_descriptive_string())
+            if set(map(hash, new_references)) != set(map(hash, article.references)): # Only a change of the stored references array needs a store
+                self.mark_article_dirty(article)
             article.references = new_references
         print("Finished!")
 
@@ -700,7 +1014,7 @@ class Database(object):
                 Database.check_for_circular_references(reference, new_visited)
 
     @staticmethod
-    def merge_articles(article_a, article_b, verbose=True):
+    def merge_articles(article_a, article_b, verbose=True, merge_links=True):
         if not verbose:
             sys.stdout = open(os.devnull, 'w') # Supress output if verbose is set to False
         print("Merging articles:", end=' ')
@@ -735,22 +1049,23 @@ class Database(object):
             if keyword not in article_a.keywords:
                 article_a.keywords.add(keyword)
                 print("Article A inherits Article B's keyword " + keyword.namef())
-        print("Merging references:")
-        for reference in article_b.references:
-            if reference not in article_a.references and reference != article_a:
-                article_a.references.add(reference)
-                Database.check_for_circular_references(article_a, set())
-                if article_b in reference.citations:
-                    reference.citations.remove(article_b)
-                reference.citations.add(article_a)
-                print("Article A inherits Article B's references " + reference.descriptionf())
-        for citation in article_b.citations:
-            if citation not in article_a.citations and citation != article_a:
-                article_a.citations.add(citation)
-                if article_b in citation.references:
-                    citation.references.remove(article_b)
-                citation.references.add(article_a)
-                print("Article A inherits Article B's citations " + citation.descriptionf())
+        if merge_links: # Otherwise the caller rewires the references and citations (see apply_merge_plan)
+            print("Merging references:")
+            for reference in article_b.references:
+                if reference not in article_a.references and reference != article_a:
+                    article_a.references.add(reference)
+                    Database.check_for_circular_references(article_a, set())
+                    if article_b in reference.citations:
+                        reference.citations.remove(article_b)
+                    reference.citations.add(article_a)
+                    print("Article A inherits Article B's references " + reference.descriptionf())
+            for citation in article_b.citations:
+                if citation not in article_a.citations and citation != article_a:
+                    article_a.citations.add(citation)
+                    if article_b in citation.references:
+                        citation.references.remove(article_b)
+                    citation.references.add(article_a)
+                    print("Article A inherits Article B's citations " + citation.descriptionf())
         if article_b.references_are_updated:
             article_a.references_are_updated = True
         if not article_b.not_in_scopus:
@@ -771,34 +1086,108 @@ class Database(object):
         return simhashes
 
     # This is a well designed method I believe
-    def identify_description_duplicates(self):
+    def identify_description_duplicates(self, storage=None, dry_run=False):
+        # Finds the articles that same_author_and_title() considers duplicates. Only articles with the same (lowercase) first author
+        # surname can be duplicates, so the articles are grouped by surname and the titles are only compared within the groups, on a process pool.
         print("Checking for duplicate entries in the database.")
-        to_be_deleted = []
         orig_n_articles = len(self.articles)
-        i_article = 0
         start_time = time.time()
-        for key_a, article_a in self.articles.items():
-            i_article += 1
-            avg_time = (time.time() - start_time)/i_article
-            remaining_time = avg_time * (orig_n_articles - i_article)/3600
-            print("Article " + str(i_article) + " of " + str(orig_n_articles) + ". Remaining time estimated to %.2f hours" % remaining_time)
-            for key_b, article_b in self.articles.items():
-                if self.same_author_and_title(article_a, article_b):
-                    self.merge_articles(article_a, article_b)
-                    to_be_deleted.append(key_b)
-        for key in to_be_deleted:
-            if key in self.articles:
-                print("Deleting article " + self.articles[key].descriptionf() + " because it was a duplicate.")
-                if key not in self.articles:
-                    print("MEGA ERROR: Key to delete not found!!!")
-                del self.articles[key]
-                # Delete it from Datastore also (not tested code)
-                cloud_strg = CloudStorage(database=self, auxiliary_use=True)
-                cloud_strg.delete_entity(ARTICLE_KIND, str(key))
+        keys = list(self.articles.keys())
+        groups = dict()
+        for position, key in enumerate(keys):
+            article = self.articles[key]
+            surname = article.get_first_author_surname()
+            if surname != "Anonymous" and isinstance(article.title, str) and article.title != "":
+                # Article.__eq__ does not trust the hash of an article without eid, title and first author surname
+                article_hash = None if (article.title == 'No title' and article.first_author_surname == 'Anonymous' and article.eid is None) else hash(article)
+                groups.setdefault(surname.lower(), []).append((position, article.title.lower(), article.eid, article_hash))
+        groups = [group for group in groups.values() if len(group) > 1]
+        tasks = duplicate_detection_tasks(groups)
+        print("Comparing the titles of " + str(sum(len(group) for group in groups)) + " articles in " + str(len(groups)) + " surname groups (" + str(len(tasks)) + " tasks)...")
+        pairs = []
+        if tasks:
+            with ProcessPoolExecutor(max_workers=DUPLICATE_DETECTION_WORKERS, mp_context=process_pool_context()) as executor:
+                for i_task, task_pairs in enumerate(executor.map(find_duplicate_pairs, tasks)):
+                    pairs.extend(task_pairs)
+                    if (i_task + 1) % 100 == 0:
+                        print("Compared " + str(i_task + 1) + " of " + str(len(tasks)) + " tasks...")
+        print("Found " + str(len(pairs)) + " duplicate pairs in " + str(time.time() - start_time) + " seconds.")
+        # Duplicates of duplicates belong together, and the article that comes first in the database survives
+        parent = dict()
+        def find(position):
+            while parent.get(position, position) != position:
+                parent[position] = parent.get(parent[position], parent[position])
+                position = parent[position]
+            return position
+        for position_a, position_b in pairs:
+            root_a = find(position_a)
+            root_b = find(position_b)
+            if root_a != root_b:
+                parent[max(root_a, root_b)] = min(root_a, root_b)
+        merge_groups = dict()
+        for position in sorted(parent.keys()):
+            root = find(position)
+            if position != root:
+                merge_groups.setdefault(root, []).append(position)
+        merge_plan = [(keys[root], [keys[position] for position in duplicates]) for root, duplicates in sorted(merge_groups.items())]
+        if storage is None:
+            storage = create_storage(database=self, auxiliary_use=True)
+        if dry_run: # Only report the plan, neither the database nor the storage are changed
+            for survivor_key, duplicate_keys in merge_plan:
+                print("Would merge into " + self.articles[survivor_key].descriptionf() + ":")
+                for duplicate_key in duplicate_keys:
+                    print("    " + self.articles[duplicate_key].descriptionf())
+            storage.delete_entities(ARTICLE_KIND, [key for survivor_key, duplicate_keys in merge_plan for key in duplicate_keys], dry_run=True)
+            print("Finished the dry run in " + str(time.time() - start_time) + " seconds!")
+            return
+        deleted_keys = self.apply_merge_plan(merge_plan)
+        # Delete them from the storage also
+        storage.delete_entities(ARTICLE_KIND, deleted_keys)
         updated_n_articles = len(self.articles)
         print("The database originally contained " + str(orig_n_articles) + " articles.")
         print("The updated database contains " + str(updated_n_articles) + " articles.")
-        print("Finished!")
+        print("Finished in " + str(time.time() - start_time) + " seconds!")
+
+    def apply_merge_plan(self, merge_plan):
+        # merge_plan is a list of (key of the surviving article, [keys of its duplicates]). Every duplicate is merged into its survivor,
+        # then the references and citations of all articles are rewired in one pass and the duplicates are deleted. Returns the deleted keys.
+        survivor_of = dict()
+        deleted_keys = []
+        for survivor_key, duplicate_keys in merge_plan:
+            survivor = self.articles[survivor_key]
+            for duplicate_key in duplicate_keys:
+                duplicate = self.articles[duplicate_key]
+                print("Found duplicate: " + duplicate.descriptionf())
+                self.merge_articles(survivor, duplicate, merge_links=False)
+                survivor.references.update(duplicate.references)
+                survivor.citations.update(duplicate.citations)
+                survivor_of[id(duplicate)] = survivor
+                deleted_keys.append(duplicate_key)
+            self.mark_article_dirty(survivor)
+        if not survivor_of:
+            return deleted_keys
+        print("Rewiring references and citations of merged articles...")
+        survivor_ids = set(id(survivor) for survivor in survivor_of.values())
+        for key, article in self.articles.items():
+            if id(article) in survivor_of:
+                continue
+            # Identity checks only, since comparing articles with == may merge them as a side effect
+            if id(article) in survivor_ids or any(id(reference) in survivor_of for reference in article.references):
+                article.references = set([reference for reference in [survivor_of.get(id(reference), reference) for reference in article.references] if reference is not article])
+                self.mark_article_dirty(article)
+            if id(article) in survivor_ids or any(id(citation) in survivor_of for citation in article.citations):
+                article.citations = set([citation for citation in [survivor_of.get(id(citation), citation) for citation in article.citations] if citation is not article])
+        for author in self.authors.values():
+            if any(id(article) in survivor_of for article in author.articles):
+                author.articles = set([survivor_of.get(id(article), article) for article in author.articles])
+        for key in deleted_keys:
+            print("Deleting article " + self.articles[key].descriptionf() + " because it was a duplicate.")
+            self.dirty_articles.pop(id(self.articles[key]), None) # Do not put back a deleted duplicate on the next store
+            del self.articles[key]
+        self.articles_with_eid[:] = [article for article in self.articles_with_eid if id(article) not in survivor_of]
+        self.articles_with_eid_version += 1
+        self.articles_with_eid_generation += 1
+        return deleted_keys
 
     # This is the updated version of the is_in_scope method that checks if at least one of the in scope keywords exists in the article
     def is_in_scope(self, article):
@@ -818,32 +1207,108 @@ class Database(object):
         for (key, keyword) in sorted_truncated_keywords:
             print(keyword.name + ": " + str(keyword.count))
 
-class CloudStorage(object):
+def select_datastore_kinds(datastore_default_kind=True, datastore_kind_suffix=None):
+    global ARTICLE_KIND
+    global AUTHOR_KIND
+    global KEYWORD_KIND
+    if not datastore_default_kind and datastore_kind_suffix is None: # Assume KTH analysis
+        ARTICLE_KIND = 'Article-kth'
+        AUTHOR_KIND = 'Author-kth'
+        KEYWORD_KIND = 'Keyword-kth'
+    elif not datastore_default_kind and isinstance(datastore_kind_suffix, str):
+        ARTICLE_KIND = 'Article-' + datastore_kind_suffix
+        AUTHOR_KIND = 'Author-' + datastore_kind_suffix
+        KEYWORD_KIND = 'Keyword-' + datastore_kind_suffix
+
+# Local snapshots are kept in one directory per article kind (and year filter) so that different datasets do not overwrite each other
+def snapshot_path(start_year_filter=None, end_year_filter=None):
+    name = ARTICLE_KIND
+    if start_year_filter is not None and end_year_filter is not None:
+        name += '_' + str(start_year_filter) + '_' + str(end_year_filter)
+    return os.path.join(SNAPSHOT_DIR, name)
+
+# Removing the manifest is enough to mark every local snapshot of the current kinds as stale
+def invalidate_local_snapshots():
+    if not os.path.isdir(SNAPSHOT_DIR):
+        return
+    for name in os.listdir(SNAPSHOT_DIR):
+        if name == ARTICLE_KIND or name.startswith(ARTICLE_KIND + '_'):
+            manifest_file = os.path.join(SNAPSHOT_DIR, name, SNAPSHOT_MANIFEST_FILE)
+            if os.path.isfile(manifest_file):
+                print("Invalidating local snapshot in '" + os.path.join(SNAPSHOT_DIR, name) + "' because the cloud database changed.")
+                os.remove(manifest_file)
+
+store_manifest_lock = Lock()
+
+def entity_digest(entity):
+    # Identifies the content of an entity, so that an entity changed since it was committed is never skipped on resume
+    return str(mmh3.hash128(json.dumps(sorted(entity.items()), default=str), signed=False))
+
+def read_store_manifest():
+    # (kind, key) -> content digest of every entity committed by an unfinished store
+    committed = dict()
+    if os.path.isfile(STORE_MANIFEST_FILE):
+        with open(STORE_MANIFEST_FILE, 'r') as f:
+            for line in f:
+                fields = line.rstrip('\n').split('\t')
+                if len(fields) == 3:
+                    committed[(fields[0], fields[1])] = fields[2]
+    return committed
+
+def append_store_manifest(kind, batch, digests):
+    with store_manifest_lock:
+        with open(STORE_MANIFEST_FILE, 'a') as f:
+            f.write(''.join(kind + '\t' + str(entity.key.id_or_name) + '\t' + digest + '\n' for entity, digest in zip(batch, digests)))
+            f.flush()
+
+def clear_store_manifest():
+    if os.path.isfile(STORE_MANIFEST_FILE):
+        os.remove(STORE_MANIFEST_FILE)
+
+class ArticlePageQueue(Queue):
+    # The bounded queue of raw article pages between the fetch threads and the load. If the load stops (e.g. on an error while converting
+    # the articles), nothing takes pages anymore, so put() gives up and returns False and the fetch threads stop instead of waiting forever.
+
+    def __init__(self, maxsize=ARTICLE_PAGE_QUEUE_SIZE):
+        Queue.__init__(self, maxsize)
+        self.stopped = Event()
+
+    def put(self, page):
+        while not self.stopped.is_set():
+            try:
+                Queue.put(self, page, timeout=ARTICLE_PAGE_QUEUE_TIMEOUT)
+                return True
+            except Full:
+                pass
+        return False
+
+    def stop(self):
+        # Releases the waiting fetch threads and the pages already queued
+        self.stopped.set()
+        while True:
+            try:
+                self.get_nowait()
+            except Empty:
+                break
+
+class Storage(object):
+    # The backend independent part of the storage: converting between the Database objects and plain records.
+    # A backend implements connect(), put_records(), delete_entity(), fetch_record_pages() and fetch_article_pages().
+    location = 'database'
+
     def __init__(self, database=None, automated=True, auxiliary_use=False, datastore_default_kind=True, datastore_kind_suffix=None, start_year_filter=None, end_year_filter=None):
-        global ARTICLE_KIND
-        global AUTHOR_KIND
-        global KEYWORD_KIND
-        global AFFILIATION_KIND
         if DATABASE_READ_ONLY:
             print("WARNING: DATABASE_READ_ONLY is enabled!")
         if DATABASE_SMOKE_TEST:
             print("WARNING: DATABASE_SMOKE_TEST is enabled!")
-        if not datastore_default_kind and datastore_kind_suffix is None: # Assume KTH analysis
-            ARTICLE_KIND = 'Article-kth'
-            AUTHOR_KIND = 'Author-kth'
-            KEYWORD_KIND = 'Keyword-kth'
-        elif not datastore_default_kind and isinstance(datastore_kind_suffix, str):
-            ARTICLE_KIND = 'Article-' + datastore_kind_suffix
-            AUTHOR_KIND = 'Author-' + datastore_kind_suffix
-            KEYWORD_KIND = 'Keyword-' + datastore_kind_suffix
+        select_datastore_kinds(datastore_default_kind, datastore_kind_suffix)
         self.articles_to_rescrape = set([])
         #self.filename = filename
         #self.changes_made = False
         self.auxiliary_use = auxiliary_use
-        # Instantiates a client
-        self.datastore_client = datastore.Client(project='security-atlas')
+        self.connect()
         if database is None:
-            print("Downloading from cloud database...")
+            print("Downloading from " + self.location + "...")
             self.database = Database()
             self.keystroke_list = []
             if not DATABASE_SMOKE_TEST:
@@ -853,17 +1318,81 @@ class CloudStorage(object):
             self.database = database
             self.keystroke_list = []
 
-    def store(self, new_put_limit=MAX_PUT_LIST_SIZE, article_kind=None, author_kind=None, keyword_kind=None): 
-        list_of_entities = []
-        # First save the article entities
-        print("Trying to save " + str(len(self.database.articles)) + " articles on cloud database...")
-        for key, article in self.database.articles.items():
-            if article_kind is not None: # Bypass the default entity kinds if needed
-                key = self.datastore_client.key(article_kind, str(hash(article)))
-            else:
-                key = self.datastore_client.key(ARTICLE_KIND, str(hash(article)))
-            article_entity = datastore.Entity(key, exclude_from_indexes=[])
-            article_entity.update({
+    def connect(self):
+        raise NotImplementedError
+
+    def put_records(self, kind, properties, records, new_put_limit=MAX_PUT_LIST_SIZE):
+        # Stores (key, properties dict) records. Returns True if stored, False on failure and None if storing is skipped
+        raise NotImplementedError
+
+    def delete_entity(self, entity_type, key_to_del):
+        raise NotImplementedError
+
+    def delete_entities(self, kind, keys, dry_run=False):
+        # Deletes many entities of a kind at once. With dry_run the keys are only reported. Returns False if some could not be deleted.
+        keys = [str(key) for key in keys]
+        if not keys:
+            print("Nothing to delete.")
+            return True
+        if dry_run:
+            print("Dry run: would delete " + str(len(keys)) + " " + kind + " entities from the " + self.location + ":")
+            for key in keys:
+                print(key)
+            return True
+        if DATABASE_SMOKE_TEST or DATABASE_READ_ONLY:
+            print("Skip actual deleting...")
+            return None
+        start_time = time.time()
+        deleted = self.delete_records(kind, keys)
+        end_time = time.time()
+        print("Time to delete from the " + self.location + ": " + str(end_time - start_time))
+        return deleted
+
+    def delete_records(self, kind, keys):
+        # Backends that can delete in bulk override this
+        for key in keys:
+            self.delete_entity(kind, key)
+        return True
+
+    def fetch_record_pages(self, kind, properties):
+        # Yields the records of a kind page by page, as lists of (key, properties dict) tuples
+        raise NotImplementedError
+
+    def fetch_article_pages(self, page_queue, start_year_filter=None, end_year_filter=None):
+        # Puts the article records on page_queue (an ArticlePageQueue) page by page (as lists of properties dicts), followed by None when all
+        # are fetched. Stops fetching when a put() returns False, i.e. when the load was stopped.
+        # With a year window only the articles with start_year_filter <= date <= end_year_filter are fetched.
+        raise NotImplementedError
+
+    def fetch_article_pages_by_key(self, keys):
+        # Yields the article records with the given keys page by page (keys that do not exist are left out)
+        raise NotImplementedError
+
+    def count_articles(self):
+        # Returns the total number of stored articles, or None if it cannot be counted cheaply
+        return None
+
+    def store(self, new_put_limit=MAX_PUT_LIST_SIZE, article_kind=None, author_kind=None, keyword_kind=None, full_store=False): 
+        # Only the articles, authors and keywords that were created or changed since the last successful store are written,
+        # unless a full store is requested or the default entity kinds are bypassed (then everything must be copied)
+        copy_to_other_kinds = article_kind is not None or author_kind is not None or keyword_kind is not None
+        if full_store and not copy_to_other_kinds:
+            # Everything is marked as changed, so that the next store writes whatever a failed full store did not
+            self.database.mark_all_dirty()
+        full_store = full_store or copy_to_other_kinds
+        if copy_to_other_kinds:
+            articles_to_store = list(self.database.articles.values())
+            authors_to_store = list(self.database.authors.values())
+            keywords_to_store = list(self.database.keywords.values())
+        else:
+            articles_to_store = list(self.database.dirty_articles.values())
+            authors_to_store = list(self.database.dirty_authors.values())
+            keywords_to_store = list(self.database.dirty_keywords.values())
+        list_of_records = []
+        # First save the article records
+        print("Trying to save " + str(len(articles_to_store)) + " of " + str(len(self.database.articles)) + " articles on " + self.location + "...")
+        for article in articles_to_store:
+            list_of_records.append((str(hash(article)), {
                 'title': article.title,
                 'eid': article.eid,
                 'date': article.date,
@@ -877,208 +1406,172 @@ class CloudStorage(object):
                 'not_in_scopus': article.not_in_scopus,
                 'out_of_scope': article.out_of_scope,
                 'fully_scraped': article.fully_scraped
-            })
-            list_of_entities.append(article_entity)
-        self.store_list_entities(list_of_entities, new_put_limit)
-        del list_of_entities[:]
+            }))
+        # Bypass the default entity kinds if needed
+        articles_stored = self.put_records(article_kind if article_kind is not None else ARTICLE_KIND, ARTICLE_PROPERTIES, list_of_records, new_put_limit)
+        del list_of_records[:]
         
-        # Then save the author entities
-        print("Trying to save " + str(len(self.database.authors)) + " authors on cloud database...")
-        for key, author in self.database.authors.items():
-            if (author.auid is not None):
-                if author_kind is not None:
-                    datastore_key = self.datastore_client.key(author_kind, str(author.auid))
-                else:
-                    datastore_key = self.datastore_client.key(AUTHOR_KIND, str(author.auid))
-            else:
+        # Then save the author records
+        print("Trying to save " + str(len(authors_to_store)) + " of " + str(len(self.database.authors)) + " authors on " + self.location + "...")
+        for author in authors_to_store:
+            if (author.auid is None):
                 print("FATAL ERROR: Author has not auid!!!")
                 sys.exit(1)
-            author_entity = datastore.Entity(datastore_key, exclude_from_indexes=[])
-            author_entity.update({
+            list_of_records.append((str(author.auid), {
                 'auid': author.auid,
                 'surname': author.surname,
                 'given_name': author.given_name,
                 'affiliation': author.get_affiliation_id()
-            })
-            list_of_entities.append(author_entity)
-        self.store_list_entities(list_of_entities)
-        del list_of_entities[:]
-
-        # Next save the keyword entities
-        print("Trying to save " + str(len(self.database.keywords)) + " keywords on cloud database...")
-        for key, value in self.database.keywords.items():
-            if keyword_kind is not None:
-                datastore_key = self.datastore_client.key(keyword_kind, str(key))
-            else:
-                datastore_key = self.datastore_client.key(KEYWORD_KIND, str(key))
-            keyword_entity = datastore.Entity(datastore_key, exclude_from_indexes=[])
-            keyword_entity.update({
-                'name': value.name,
-                'count': value.count
-            })
-            list_of_entities.append(keyword_entity)
-        
-        self.store_list_entities(list_of_entities)
-        del list_of_entities[:]
-
-        print("Saved on cloud database (" + str(len(self.database.articles)) + " articles).")
-        print("Saved on cloud database (" + str(len(self.database.authors)) + " authors).")
-        print("Saved on cloud database (" + str(len(self.database.keywords)) + " keywords).")
-        print("Number of completely captured articles is " + str(len([a for a in self.database.articles.values() if a.is_complete()])))
+            }))
+        authors_stored = self.put_records(author_kind if author_kind is not None else AUTHOR_KIND, AUTHOR_PROPERTIES, list_of_records)
+        del list_of_records[:]
+
+        # Next save the keyword records
+        print("Trying to save " + str(len(keywords_to_store)) + " of " + str(len(self.database.keywords)) + " keywords on " + self.location + "...")
+        for keyword in keywords_to_store:
+            list_of_records.append((str(hash(keyword)), {
+                'name': keyword.name,
+                'count': keyword.count
+            }))
+        keywords_stored = self.put_records(keyword_kind if keyword_kind is not None else KEYWORD_KIND, KEYWORD_PROPERTIES, list_of_records)
+        del list_of_records[:]
+
+        # Only forget what has been written to the default kinds (a copy to other kinds says nothing about them)
+        if article_kind is None and articles_stored:
+            for article in articles_to_store:
+                self.database.dirty_articles.pop(id(article), None)
+        if author_kind is None and authors_stored:
+            for author in authors_to_store:
+                self.database.dirty_authors.pop(id(author), None)
+        if keyword_kind is None and keywords_stored:
+            for keyword in keywords_to_store:
+                self.database.dirty_keywords.pop(id(keyword), None)
+
+        if articles_stored == False or authors_stored == False or keywords_stored == False:
+            print("ERROR: The store was not completed. Run the store again to write the remaining records.")
+            return False
+        self.store_completed()
+        print("Saved on " + self.location + " (" + str(len(articles_to_store)) + " articles).")
+        print("Saved on " + self.location + " (" + str(len(authors_to_store)) + " authors).")
+        print("Saved on " + self.location + " (" + str(len(keywords_to_store)) + " keywords).")
+        if full_store: # Counting complete articles means scanning the whole database, so only do it when everything was written anyway
+            print("Number of completely captured articles is " + str(len([a for a in self.database.articles.values() if a.is_complete()])))
         print("Number of fully scraped articles (with eid) is " + str(len(self.database.articles_with_eid)))
+        return True
+
+    def store_completed(self):
+        # Called after every successful store, so that a backend can drop its bookkeeping for resuming
+        pass
 
     def affiliation_store(self, affiliation_dict):
-        list_of_entities = []
+        list_of_records = []
         for key, value in affiliation_dict.items():
             if key is not None:
-                datastore_key = self.datastore_client.key(AFFILIATION_KIND, key)
-                affiliation_entity = datastore.Entity(datastore_key, exclude_from_indexes=[])
                 if value is not None:
-                    affiliation_entity.update({
+                    list_of_records.append((key, {
                         'name': value.name,
                         'country': value.country
-                    })
-                list_of_entities.append(affiliation_entity)
+                    }))
+                else:
+                    list_of_records.append((key, {}))
         
-        # Now put all the entities to the datastore
-        self.store_list_entities(list_of_entities)
-        print("Saved on cloud database (" + str(len(list_of_entities)) + " affiliations).")
-        del list_of_entities[:]
-
-    def store_list_entities(self, list_to_store, new_put_limit=MAX_PUT_LIST_SIZE):
-        if new_put_limit != MAX_PUT_LIST_SIZE:
-            print("Setting new put limit: " + str(new_put_limit))
-            ACTIVE_PUT_LIMIT = new_put_limit
-        else:
-            ACTIVE_PUT_LIMIT = MAX_PUT_LIST_SIZE
-        if not DATABASE_SMOKE_TEST and not DATABASE_READ_ONLY:
-            print("Storing...")
-            start_time = time.time()
-            # Put all the entities to the datastore
-            list_length = len(list_to_store)
-            put_cnt = 0
-            if (list_length > ACTIVE_PUT_LIMIT):
-                print("Entities to put more than the limit per query, splitting...")
-                while (put_cnt < list_length):
-                    put_until = put_cnt+ACTIVE_PUT_LIMIT
-                    if (put_until > list_length):
-                        put_until = list_length
-                    self.datastore_client.put_multi(list_to_store[put_cnt:put_until])
-                    put_cnt = put_until
-            else:
-                self.datastore_client.put_multi(list_to_store)
-            end_time = time.time()
-            print("Time to store to Datastore: " + str(end_time - start_time))
-            return True
-        else:
-            print("Skip actual storing...")
+        # Now put all the records to the storage
+        if self.put_records(AFFILIATION_KIND, AFFILIATION_PROPERTIES, list_of_records) == False:
+            print("ERROR: Not all affiliations were stored. Run the store again to resume.")
+            return False
+        self.store_completed()
+        print("Saved on " + self.location + " (" + str(len(list_of_records)) + " affiliations).")
+        del list_of_records[:]
+        return True
 
-    def delete_entity(self, entity_type, key_to_del):
-        key = self.datastore_client.key(entity_type, key_to_del)
-        self.datastore_client.delete(key)
-            
     def load(self, start_year_filter=None, end_year_filter=None):  
         start_time = time.time()
-        # Loading all affiliations from cloud datastore
-        self.fetch_affiliations()
-        # Load authors keywords and articles in parallel!
-        thread_list = []
-        # Loading all the authors from cloud datastore
-        t = Thread(target=self.fetch_authors)
-        thread_list.append(t)
-        t.start()
-        # Loading all the keywords from cloud datastore
-        t = Thread(target=self.fetch_keywords)
-        thread_list.append(t)
-        t.start()
-        
-        result_list = []
-        # queries = [('min', 'B') ,('B', 'G'), ('G', 'L'), ('L', 'P'), ('P', 'T'), ('T', 'max')] # This achieved aprox. 200 secs locally with 178074 entries
-        queries = [('min', 'C') ,('C', 'H'), ('H', 'L'), ('L', 'P'), ('P', 'U'), ('U', 'max')] # This achieved aprox. 133 (90) secs locally with 178074 entries (and 86 (63) on GCP)
-        # queries = [('min', 'B'), ('B', 'C'), ('C', 'F'), ('F', 'H'), ('H', 'L'), ('L', 'N'), ('N', 'Q'), ('Q', 'U'), ('U', 'max')] # This achieved aprox. 152 (99) secs locally with 178074 entries
-        # queries = [('min', 'Ao'), ('Ao', 'C'), ('C', 'F'), ('F', 'H'), ('H', 'L'), ('L', 'N'), ('N', 'R'), ('R', 'U'), ('U', 'max')] # This achieved aprox. 170 (98) secs locally with 178074 entries (and 89 on GCP)
-        for query in queries:
-            t = Thread(target=self.partially_fetch_articles, args=(query[0], query[1], result_list))
+        # The load is a pipeline: the article pages are fetched from the start and queued, while the affiliations, authors and keywords
+        # are fetched and converted page by page. The articles are converted as soon as the authors and keywords they refer to are loaded.
+        # The queue is bounded, so that the raw article pages are not all held in memory while the authors and keywords load.
+        article_pages = ArticlePageQueue()
+        # With a year window, the window is applied to the article query itself and the cited articles outside it are fetched afterwards
+        year_window = start_year_filter is not None and end_year_filter is not None
+        if year_window:
+            article_thread = Thread(target=self.fetch_article_pages, args=(article_pages, start_year_filter, end_year_filter), daemon=True)
+        else:
+            article_thread = Thread(target=self.fetch_article_pages, args=(article_pages,), daemon=True)
+        article_thread.start()
+        try:
+            thread_list = []
+            # Loading the affiliations first and then the authors, since the authors refer to them
+            t = Thread(target=self.fetch_affiliations_and_authors)
+            thread_list.append(t)
+            t.start()
+            # Loading all the keywords
+            t = Thread(target=self.fetch_keywords)
             thread_list.append(t)
             t.start()
-        # Wait for all threads to finish in order to continue
-        for t in thread_list:
-            t.join()
+            for t in thread_list:
+                t.join()
+            print("Time to fetch affiliations, authors and keywords from " + self.location + ": " + str(time.time() - start_time))
+
+            # Now put the articles in the local database, page by page
+            total_fetched_articles = 0
+
+            if start_year_filter is not None and end_year_filter is not None:
+                print("INFO: Filtering out all fully scraped articles with dates outside range: " + str(start_year_filter) + " - " + str(end_year_filter))
+
+            while True:
+                fetched_articles = article_pages.get()
+                if fetched_articles is None: # All the article pages have been fetched
+                    break
+                total_fetched_articles += len(fetched_articles)
+                for article in fetched_articles:
+                    self.add_article_record(article, start_year_filter, end_year_filter)
+                del fetched_articles # Release the raw page right away
+        finally:
+            # After an error the fetch threads would otherwise wait on the full queue forever
+            article_pages.stop()
+            article_thread.join()
+        if year_window:
+            n_window_articles = total_fetched_articles
+            cited_keys = set([])
+            for key, article in self.database.articles.items():
+                if article.references_array:
+                    for reference in article.references_array:
+                        if int(reference) not in self.database.articles:
+                            cited_keys.add(reference)
+            print("Fetching " + str(len(cited_keys)) + " articles outside the year window that are cited by articles inside it...")
+            for fetched_articles in self.fetch_article_pages_by_key(sorted(cited_keys)):
+                total_fetched_articles += len(fetched_articles)
+                for article in fetched_articles:
+                    self.add_article_record(article, start_year_filter, end_year_filter)
+                del fetched_articles
+            total_articles = self.count_articles()
+            print("Year window " + str(start_year_filter) + " - " + str(end_year_filter) + ": fetched " + str(n_window_articles) + " articles inside the window and " +
+                  str(total_fetched_articles - n_window_articles) + " cited articles outside it.", end=' ')
+            if total_articles is not None:
+                print("Skipped " + str(max(total_articles - total_fetched_articles, 0)) + " of " + str(total_articles) + " articles.")
+            else:
+                print("The number of skipped articles is unknown.")
         fetch_end_time = time.time()
-        print("Time to fetch affiliations, authors, keywords and articles from Datastore: " + str(fetch_end_time - start_time))
-        # print("DONE! Return list size is=" + str(len(result_list)))
-
-        # Now put the articles in the local database
-        total_fetched_articles = 0
-
-        if start_year_filter is not None and end_year_filter is not None:
-            print("INFO: Filtering out all fully scraped articles with dates outside range: " + str(start_year_filter) + " - " + str(end_year_filter))
-
-        for fetched_articles in result_list:
-            total_fetched_articles += len(fetched_articles)
-            print("Loading " + str(len(fetched_articles)) + " fetched articles...")
-            for article in fetched_articles:
-                f_title = article['title']
-                f_eid = article['eid']
-                f_date = article['date']
-                if article['source'] == None:
-                    f_source = article['source']
-                else:
-                    f_source = Source(article['source'])
-                f_first_author_surname = article['first_author_surname']
-                authors_array = article['authors_array']
-                f_authors = []
-                if authors_array is not None:
-                    for author in authors_array:
-                        # If the below is true, then skip adding authors for this article on the database so that it will not be included in the analysis results!
-                        if start_year_filter is not None and end_year_filter is not None:
-                            if f_date is not None and len(f_date) > 4 and (f_date < str(start_year_filter) or f_date > str(end_year_filter)):
-                                break
-                        auth = self.database.authors.get(author)
-                        if isinstance(auth, int): # Debug check that can be removed in final version
-                            print("MEGA-ERROR: author is integer!!!")
-                        elif auth is None:
-                            print("Author '" + author + "' was not found for article '" + f_eid + "' and returned None.")
-                            self.articles_to_rescrape.add(Article(f_eid))
-                        else:
-                            f_authors.append(auth)
-                keywords_array = article['keywords_array']
-                f_keywords = set([])
-                if keywords_array is not None:
-                    for keyword in keywords_array:
-                        kwrd_to_search = Keyword(keyword)
-                        kwrd = self.database.keywords.get(hash(kwrd_to_search))
-                        if kwrd is not None:
-                            f_keywords.add(kwrd)
-                        else:
-                            print("Keyword '" + keyword + "' was not found for article '" + f_eid + "' and returned None.")
-                            self.articles_to_rescrape.add(Article(f_eid))
-                references_array = article['references_array']
-                # citations_array = article['citations_array']
-                f_references_are_updated = article['references_are_updated']
-                f_not_in_scopus = article['not_in_scopus']
-                f_out_of_scope = article['out_of_scope']
-                f_fully_scraped = article['fully_scraped']
-                # new_article = Article(eid=f_eid, title=f_title, date=f_date, source=f_source, fsurname=f_first_author_surname, authors=f_authors, keywords=f_keywords, references_array=references_array, citations_array=citations_array, refs_updated=f_references_are_updated, not_in_scopus=f_not_in_scopus, out_of_scope=f_out_of_scope, fully_scraped=f_fully_scraped)
-                new_article = Article(eid=f_eid, title=f_title, date=f_date, source=f_source, fsurname=f_first_author_surname, authors=f_authors, keywords=f_keywords, references_array=references_array, refs_updated=f_references_are_updated, not_in_scopus=f_not_in_scopus, out_of_scope=f_out_of_scope, fully_scraped=f_fully_scraped)
-                self.database.articles[hash(new_article)] = new_article
+        print("Time to fetch and convert affiliations, authors, keywords and articles from " + self.location + ": " + str(fetch_end_time - start_time))
         print("Done adding on DB " + str(total_fetched_articles) + " articles!")
         if self.auxiliary_use:
-            if len(result_list) == 0:
+            if total_fetched_articles == 0:
                 print("Warning: Database has no article entries!")
-        del result_list[:] # Clears the list used for parallel fetching
 
         # Now complete the articles with refereces and citations and get the articles_with_eid
+        n_references_outside_window = 0
         for key, article in self.database.articles.items():
-            if article.references_array is not None:
+            if article.references_array:
                 f_references = set([])
                 for reference in article.references_array:
                     ref = self.database.articles.get(int(reference))
                     if ref is not None:
                         f_references.add(ref) # (solved) PROBLEM: reference from array not found. This is because of duplicate article removal! If load and save is run again, it dissapears!
+                    elif year_window: # Expected for the references of the cited articles outside the window, which are not fetched
+                        n_references_outside_window += 1
                     else:
                         print("Reference '" + reference + "' was not found for article '" + str(hash(article)) + "' and returned None.")
                 article.references = f_references
+            article.references_array = None # Resolved, so the keys are not needed anymore
             # if article.citations_array is not None:
             #     f_citations = set([])
             #     for citation in article.citations_array:
@@ -1089,87 +1582,375 @@ class CloudStorage(object):
             #             print("Citation '" + citation + "' was not found for article '" + str(hash(article)) + "' and returned None.")
             #     article.citations = f_citations
             if (article.eid is not None):
-                self.database.articles_with_eid.append(article)
+                self.database.add_article_with_eid(article)
+        if n_references_outside_window:
+            print(str(n_references_outside_window) + " references point to articles that were not fetched because of the year window.")
         print("Number of completely captured articles is " + str(len([a for a in self.database.articles.values() if a.is_complete()])))
         print("Number of fully scraped articles (with eid) is " + str(len(self.database.articles_with_eid)))
 
         end_time = time.time()
-        print("Time to completely load articles, authors, keywords and affiliations from Datastore: " + str(end_time - start_time))
+        print("Time to completely load articles, authors, keywords and affiliations from " + self.location + ": " + str(end_time - start_time))
+
+    def fetch_affiliations_and_authors(self):
+        self.fetch_affiliations()
+        self.fetch_authors()
 
     def fetch_affiliations(self):
         print("Now fetching affiliations...")
-        affiliations_query = self.datastore_client.query(kind=AFFILIATION_KIND)
-        fetched_affiliations = list(affiliations_query.fetch())
-        for aff in fetched_affiliations:
-            f_id = aff.key.name
-            f_name = aff['name']
-            try:
-                f_country = aff['country']
-            except KeyError: # This is also a workaround for the intermiadate state
-                f_country = None
-            aff_obj = Affiliation(f_id, f_name, f_country)
-            self.database.affiliations[f_id] = aff_obj
+        n_affiliations = 0
+        for fetched_affiliations in self.fetch_record_pages(AFFILIATION_KIND, AFFILIATION_PROPERTIES):
+            n_affiliations += len(fetched_affiliations)
+            for f_id, aff in fetched_affiliations:
+                f_name = aff['name']
+                try:
+                    f_country = aff['country']
+                except KeyError: # This is also a workaround for the intermiadate state
+                    f_country = None
+                aff_obj = Affiliation(f_id, f_name, f_country)
+                self.database.affiliations[f_id] = aff_obj
         if self.auxiliary_use:
-            if len(fetched_affiliations) == 0:
+            if n_affiliations == 0:
                 print("Warning: Database has no affiliation entries!")
-        del fetched_affiliations[:]
 
     def fetch_authors(self):
         print("Now fetching authors...")
-        auhtors_query = self.datastore_client.query(kind=AUTHOR_KIND)
-        fetched_authors = list(auhtors_query.fetch())
-        for author in fetched_authors:
-            f_surname = author['surname']
-            f_auid = author['auid']
-            f_given_name = author['given_name']
-            try: # This is to retain the functionality of Scraper.list_affiliation_ids(), now moved under load_affiliation_dict()
-                if author['affiliation'] is not None:
-                    affiliation_obj = self.database.affiliations[author['affiliation']]
-                else: # If author has no affiliation, it should be none.
-                    affiliation_obj = Affiliation(None)
-            except KeyError:
-                print("Affiliation '" + str(author['affiliation']) + "' not yet in database. Have you scraped for affiliations?")
-                affiliation_obj = Affiliation(author['affiliation'])
-            new_author = Author(auid=f_auid, surname=f_surname, given_name=f_given_name, affiliation=affiliation_obj)
-            self.database.authors[f_auid] = new_author
+        n_authors = 0
+        for fetched_authors in self.fetch_record_pages(AUTHOR_KIND, AUTHOR_PROPERTIES):
+            n_authors += len(fetched_authors)
+            for key, author in fetched_authors:
+                f_surname = author['surname']
+                f_auid = author['auid']
+                f_given_name = author['given_name']
+                try: # This is to retain the functionality of Scraper.list_affiliation_ids(), now moved under load_affiliation_dict()
+                    if author['affiliation'] is not None:
+                        affiliation_obj = self.database.affiliations[author['affiliation']]
+                    else: # If author has no affiliation, it should be none.
+                        affiliation_obj = Affiliation(None)
+                except KeyError:
+                    print("Affiliation '" + str(author['affiliation']) + "' not yet in database. Have you scraped for affiliations?")
+                    affiliation_obj = Affiliation(author['affiliation'])
+                new_author = Author(auid=f_auid, surname=f_surname, given_name=f_given_name, affiliation=affiliation_obj)
+                self.database.authors[f_auid] = new_author
         if self.auxiliary_use:
-            if len(fetched_authors) == 0:
+            if n_authors == 0:
                 print("Warning: Database has no author entries!")
-        del fetched_authors[:]
     
     def fetch_keywords(self):
         print("Now fetching keywords...")
-        keywords_query = self.datastore_client.query(kind=KEYWORD_KIND)
-        fetched_keywords = list(keywords_query.fetch())
-        for keyword in fetched_keywords:
-            try:
-                f_name = str(keyword['name'], 'utf-8')
-            except TypeError:
-                f_name = keyword['name']
-            f_count = keyword['count']
-            keyword_obj = Keyword(name=f_name, count=f_count)
-            self.database.keywords[hash(keyword_obj)] = keyword_obj
+        n_keywords = 0
+        for fetched_keywords in self.fetch_record_pages(KEYWORD_KIND, KEYWORD_PROPERTIES):
+            n_keywords += len(fetched_keywords)
+            for key, keyword in fetched_keywords:
+                try:
+                    f_name = str(keyword['name'], 'utf-8')
+                except TypeError:
+                    f_name = keyword['name']
+                f_count = keyword['count']
+                keyword_obj = Keyword(name=f_name, count=f_count)
+                self.database.keywords[hash(keyword_obj)] = keyword_obj
         if self.auxiliary_use:
-            if len(fetched_keywords) == 0:
+            if n_keywords == 0:
                 print("Warning: Database has no keyword entries!")
-        del fetched_keywords[:]
 
-    def partially_fetch_articles(self, start_filter, end_filter, output):
-        print("Now fetching articles with author surname from " + start_filter  + " to " + end_filter + "...")
-        client = datastore.Client()
-        articles_query = client.query(kind=ARTICLE_KIND)
-        if start_filter != 'min':
-            articles_query.add_filter('first_author_surname', '>', start_filter)
-        else:
-            start_filter = '(start)'
-        if end_filter != 'max':
-            articles_query.add_filter('first_author_surname', '<=', end_filter)
+    def add_article_record(self, article, start_year_filter=None, end_year_filter=None):
+        f_title = article['title']
+        f_eid = article['eid']
+        f_date = article['date']
+        if article['source'] == None:
+            f_source = article['source']
         else:
-            end_filter = '(end)'
-        fetched_articles = list(articles_query.fetch())
-        print("In range " + start_filter  + " to " + end_filter + " fetched " + str(len(fetched_articles)) + " articles.")
-        output.append(fetched_articles)
+            f_source = self.database.shared_source(article['source'])
+        f_first_author_surname = article['first_author_surname']
+        authors_array = article['authors_array']
+        f_authors = []
+        if authors_array is not None:
+            for author in authors_array:
+                # If the below is true, then skip adding authors for this article on the database so that it will not be included in the analysis results!
+                if start_year_filter is not None and end_year_filter is not None:
+                    if f_date is not None and len(f_date) > 4 and (f_date < str(start_year_filter) or f_date > str(end_year_filter)):
+                        break
+                auth = self.database.authors.get(author)
+                if isinstance(auth, int): # Debug check that can be removed in final version
+                    print("MEGA-ERROR: author is integer!!!")
+                elif auth is None:
+                    print("Author '" + author + "' was not found for article '" + f_eid + "' and returned None.")
+                    self.articles_to_rescrape.add(Article(f_eid))
+                else:
+                    f_authors.append(auth)
+        keywords_array = article['keywords_array']
+        f_keywords = set([])
+        if keywords_array is not None:
+            for keyword in keywords_array:
+                kwrd_to_search = Keyword(keyword)
+                kwrd = self.database.keywords.get(hash(kwrd_to_search))
+                if kwrd is not None:
+                    f_keywords.add(kwrd)
+                else:
+                    print("Keyword '" + keyword + "' was not found for article '" + f_eid + "' and returned None.")
+                    self.articles_to_rescrape.add(Article(f_eid))
+        references_array = article['references_array']
+        # citations_array = article['citations_array']
+        f_references_are_updated = article['references_are_updated']
+        f_not_in_scopus = article['not_in_scopus']
+        f_out_of_scope = article['out_of_scope']
+        f_fully_scraped = article['fully_scraped']
+        # new_article = Article(eid=f_eid, title=f_title, date=f_date, source=f_source, fsurname=f_first_author_surname, authors=f_authors, keywords=f_keywords, references_array=references_array, citations_array=citations_array, refs_updated=f_references_are_updated, not_in_scopus=f_not_in_scopus, out_of_scope=f_out_of_scope, fully_scraped=f_fully_scraped)
+        new_article = Article(eid=f_eid, title=f_title, date=f_date, source=f_source, fsurname=f_first_author_surname, authors=f_authors or None, keywords=f_keywords or None, references_array=references_array, refs_updated=f_references_are_updated, not_in_scopus=f_not_in_scopus, out_of_scope=f_out_of_scope, fully_scraped=f_fully_scraped)
+        self.database.articles[hash(new_article)] = new_article
 
     def get_articles_to_rescrape(self):
         return self.articles_to_rescrape
-        
\ No newline at end of file
+
+class CloudStorage(Storage):
+    # Storage backend on Google Cloud Datastore
+    location = 'cloud database'
+
+    def connect(self):
+        if datastore is None:
+            print("FATAL ERROR: The google-cloud-datastore package is not installed. Install it or use the sqlite storage backend.")
+            sys.exit(1)
+        # Instantiates a client
+        self.datastore_client = datastore.Client(project='security-atlas')
+        self.thread_clients = local()
+        self.store_executor = None # See store_workers()
+
+    def store_workers(self):
+        # One pool of STORE_WORKERS threads per storage, kept between the stores and deletes, so that the client of every worker thread
+        # (see commit_batch()) is created once and then reused
+        if self.store_executor is None:
+            self.store_executor = ThreadPoolExecutor(max_workers=STORE_WORKERS)
+        return self.store_executor
+
+    def put_records(self, kind, properties, records, new_put_limit=MAX_PUT_LIST_SIZE):
+        list_of_entities = []
+        for key_name, record in records:
+            entity = datastore.Entity(self.datastore_client.key(kind, key_name), exclude_from_indexes=[])
+            entity.update(record)
+            list_of_entities.append(entity)
+        return self.store_list_entities(list_of_entities, new_put_limit)
+
+    def store_completed(self):
+        clear_store_manifest()
+
+    def store_list_entities(self, list_to_store, new_put_limit=MAX_PUT_LIST_SIZE):
+        if new_put_limit != MAX_PUT_LIST_SIZE:
+            print("Setting new put limit: " + str(new_put_limit))
+            ACTIVE_PUT_LIMIT = new_put_limit
+        else:
+            ACTIVE_PUT_LIMIT = MAX_PUT_LIST_SIZE
+        if not list_to_store:
+            print("Nothing new to store.")
+            return True
+        if not DATABASE_SMOKE_TEST and not DATABASE_READ_ONLY:
+            print("Storing...")
+            start_time = time.time()
+            kind = list_to_store[0].key.kind
+            # The entities committed (with the same content) by an interrupted store are skipped, whatever batch they were in
+            committed = read_store_manifest()
+            pending = []
+            for entity in list_to_store:
+                digest = entity_digest(entity)
+                if committed.get((kind, str(entity.key.id_or_name))) != digest:
+                    pending.append((entity, digest))
+            if len(pending) < len(list_to_store):
+                print("Resuming: " + str(len(list_to_store) - len(pending)) + " " + kind + " entities were already committed by an interrupted store.")
+            batches = [pending[i:i+ACTIVE_PUT_LIMIT] for i in range(0, len(pending), ACTIVE_PUT_LIMIT)]
+            if len(batches) > 1:
+                print("Entities to put more than the limit per query, splitting into " + str(len(batches)) + " batches over " + str(min(STORE_WORKERS, len(batches))) + " workers...")
+            failed_batches = 0
+            stored_entities = 0
+            if batches:
+                executor = self.store_workers()
+                futures = {executor.submit(self.put_batch, [entity for entity, digest in batch]): batch for batch in batches}
+                for future in as_completed(futures):
+                    batch = futures[future]
+                    if future.result():
+                        append_store_manifest(kind, [entity for entity, digest in batch], [digest for entity, digest in batch])
+                        stored_entities += len(batch)
+                    else:
+                        failed_batches += 1
+            end_time = time.time()
+            print("Time to store to Datastore: " + str(end_time - start_time))
+            print("Stored " + str(stored_entities) + " " + kind + " entities (%.1f entities/sec)" % (stored_entities / max(end_time - start_time, 1e-6)))
+            if stored_entities:
+                invalidate_local_snapshots()
+            if failed_batches:
+                print("ERROR: " + str(failed_batches) + " batches of " + kind + " entities could not be stored! Run the store again to resume.")
+                return False
+            return True
+        else:
+            print("Skip actual storing...")
+
+    def put_batch(self, batch):
+        return self.commit_batch('put_multi', batch)
+
+    def commit_batch(self, method_name, batch):
+        # Runs put_multi or delete_multi on a batch with retries. Every worker thread of store_workers() gets its own client, created on its first
+        # batch, since the client is not guaranteed to be thread safe
+        if not hasattr(self.thread_clients, 'client'):
+            self.thread_clients.client = datastore.Client(project=self.datastore_client.project)
+        for attempt in range(STORE_MAX_RETRIES):
+            try:
+                getattr(self.thread_clients.client, method_name)(batch)
+                return True
+            except Exception as e:
+                wait_time = STORE_RETRY_BACKOFF * 2**attempt
+                print("WARNING: " + method_name + " of " + str(len(batch)) + " entities failed (attempt " + str(attempt + 1) + " of " + str(STORE_MAX_RETRIES) + "): " + str(e))
+                if attempt + 1 < STORE_MAX_RETRIES:
+                    print("Retrying in " + str(wait_time) + " seconds...")
+                    time.sleep(wait_time)
+        return False
+
+    def delete_entity(self, entity_type, key_to_del):
+        key = self.datastore_client.key(entity_type, key_to_del)
+        self.datastore_client.delete(key)
+        invalidate_local_snapshots()
+
+    def delete_records(self, kind, keys):
+        batches = [keys[i:i+MAX_DELETE_LIST_SIZE] for i in range(0, len(keys), MAX_DELETE_LIST_SIZE)]
+        print("Deleting " + str(len(keys)) + " " + kind + " entities in " + str(len(batches)) + " batches over " + str(min(STORE_WORKERS, len(batches))) + " workers...")
+        deleted_entities = 0
+        failed_batches = 0
+        executor = self.store_workers()
+        futures = {executor.submit(self.commit_batch, 'delete_multi', [self.datastore_client.key(kind, key) for key in batch]): batch for batch in batches}
+        for future in as_completed(futures):
+            if future.result():
+                deleted_entities += len(futures[future])
+                print("Deleted " + str(deleted_entities) + " of " + str(len(keys)) + " " + kind + " entities...")
+            else:
+                failed_batches += 1
+        if deleted_entities:
+            invalidate_local_snapshots()
+        if failed_batches:
+            print("ERROR: " + str(failed_batches) + " batches of " + kind + " entities could not be deleted!")
+            return False
+        return True
+            
+    def fetch_record_pages(self, kind, properties):
+        query = self.datastore_client.query(kind=kind)
+        for page in query.fetch().pages:
+            yield [(entity.key.id_or_name, entity) for entity in page]
+
+    def fetch_article_pages(self, page_queue, start_year_filter=None, end_year_filter=None):
+        try:
+            if start_year_filter is not None and end_year_filter is not None:
+                # Datastore allows inequality filters on a single property only, so with a year window the shards are date ranges
+                shards = self.compute_date_shards(str(start_year_filter), str(end_year_filter), ARTICLE_LOAD_SHARDS)
+                # The date ranges leave out the articles without a date, which the year filter keeps (with their authors). The filter also keeps
+                # the articles with a short (year only) or non-ISO date outside the range, but Datastore cannot select them without fetching
+                # everything, so they are not loaded with a year window (the SQLite backend loads them).
+                shards.append(([('date', '=', None)], "no date"))
+                shards.append(([('date', '=', '')], "an empty date"))
+            else:
+                shards = []
+                for start_key, end_key in self.compute_article_shards(ARTICLE_LOAD_SHARDS):
+                    filters = []
+                    if start_key is not None:
+                        filters.append(('__key__', '>=', self.datastore_client.key(ARTICLE_KIND, start_key)))
+                    if end_key is not None:
+                        filters.append(('__key__', '<', self.datastore_client.key(ARTICLE_KIND, end_key)))
+                    shards.append((filters, "keys from " + ('(start)' if start_key is None else start_key) + " to " + ('(end)' if end_key is None else end_key)))
+            thread_list = []
+            shard_stats = [None] * len(shards)
+            for i, (filters, range_description) in enumerate(shards):
+                t = Thread(target=self.partially_fetch_articles, args=(filters, range_description, page_queue, i, shard_stats), daemon=True)
+                thread_list.append(t)
+                t.start()
+            for t in thread_list:
+                t.join()
+            # Report the shard balance, so that skewed shards are visible
+            counts = [stats[0] for stats in shard_stats if stats is not None]
+            times = [stats[1] for stats in shard_stats if stats is not None]
+            if counts and sum(counts) > 0:
+                print("Article shards: " + str(len(shards)) + ", largest/mean size %.2f, slowest/mean time %.2f" % (max(counts) / (sum(counts) / len(counts)), max(times) / max(sum(times) / len(times), 1e-6)))
+        finally:
+            page_queue.put(None) # Always signal the end, otherwise the load would wait forever
+
+    @staticmethod
+    def compute_date_shards(start_date, end_date, n_shards):
+        # Splits start_date <= date <= end_date in at most n_shards ranges of whole years (the same string comparison as the year filter)
+        boundaries = []
+        if start_date[:4].isdigit() and end_date[:4].isdigit():
+            years = [str(year) for year in range(int(start_date[:4]) + 1, int(end_date[:4]) + 1) if start_date < str(year) <= end_date]
+            n_shards = min(n_shards, len(years) + 1)
+            for i in range(1, n_shards):
+                boundaries.append(years[i * len(years) // n_shards])
+        lower_bounds = [('>=', start_date)] + [('>=', boundary) for boundary in boundaries]
+        upper_bounds = [('<', boundary) for boundary in boundaries] + [('<=', end_date)]
+        return [([('date', lower[0], lower[1]), ('date', upper[0], upper[1])], "dates from " + lower[1] + " to " + upper[1]) for lower, upper in zip(lower_bounds, upper_bounds)]
+
+    def compute_article_shards(self, n_shards):
+        # Splits the article keys in n_shards ranges of about the same size. The boundaries come from a sample of keys returned in
+        # __scatter__ order (a random sample kept by Datastore), or from a keys-only scan if the sample cannot be taken.
+        if n_shards <= 1:
+            return [(None, None)]
+        start_time = time.time()
+        sample_query = self.datastore_client.query(kind=ARTICLE_KIND)
+        sample_query.keys_only()
+        sample_query.order = ['__scatter__']
+        try:
+            sampled_keys = [entity.key.id_or_name for entity in sample_query.fetch(limit=n_shards * ARTICLE_SHARD_SAMPLES_PER_SHARD)]
+        except Exception as e:
+            print("WARNING: Could not sample article keys in __scatter__ order (" + str(e) + "), scanning all keys instead.")
+            keys_query = self.datastore_client.query(kind=ARTICLE_KIND)
+            keys_query.keys_only()
+            sampled_keys = [entity.key.id_or_name for entity in keys_query.fetch()]
+        sampled_keys = sorted(set([str(key) for key in sampled_keys]))
+        if len(sampled_keys) < n_shards:
+            print("Too few article keys to split the load, fetching in a single shard.")
+            return [(None, None)]
+        boundaries = []
+        for i in range(1, n_shards):
+            boundary = sampled_keys[i * len(sampled_keys) // n_shards]
+            if not boundaries or boundary != boundaries[-1]:
+                boundaries.append(boundary)
+        shards = list(zip([None] + boundaries, boundaries + [None]))
+        print("Computed " + str(len(shards)) + " article shards from " + str(len(sampled_keys)) + " sampled keys in " + str(time.time() - start_time) + " seconds.")
+        return shards
+
+    def partially_fetch_articles(self, filters, range_description, page_queue, shard_index=0, shard_stats=None):
+        print("Now fetching articles with " + range_description + "...")
+        start_time = time.time()
+        client = datastore.Client(project=self.datastore_client.project)
+        articles_query = client.query(kind=ARTICLE_KIND)
+        for property_name, operator_string, value in filters:
+            articles_query.add_filter(property_name, operator_string, value)
+        n_fetched_articles = 0
+        for page in articles_query.fetch().pages:
+            fetched_articles = list(page)
+            n_fetched_articles += len(fetched_articles)
+            if not page_queue.put(fetched_articles): # The load was stopped
+                return
+        fetch_time = time.time() - start_time
+        print("Shard " + str(shard_index) + " (" + range_description + ") fetched " + str(n_fetched_articles) + " articles in " + str(fetch_time) + " seconds.")
+        if shard_stats is not None:
+            shard_stats[shard_index] = (n_fetched_articles, fetch_time)
+
+    def fetch_article_pages_by_key(self, keys):
+        for i in range(0, len(keys), MAX_GET_LIST_SIZE):
+            datastore_keys = [self.datastore_client.key(ARTICLE_KIND, key) for key in keys[i:i+MAX_GET_LIST_SIZE]]
+            yield self.datastore_client.get_multi(datastore_keys)
+
+    def count_articles(self):
+        try:
+            count_query = self.datastore_client.aggregation_query(self.datastore_client.query(kind=ARTICLE_KIND)).count(alias='total')
+            for aggregation_results in count_query.fetch():
+                for aggregation in aggregation_results:
+                    return aggregation.value
+        except Exception as e: # Count aggregations need a recent google-cloud-datastore
+            print("WARNING: Could not count the articles: " + str(e))
+        return None
+
+# Returns the storage of the configured backend ('datastore' or 'sqlite', see STORAGE_BACKEND in atlas_config.py)
+def create_storage(database=None, automated=True, auxiliary_use=False, datastore_default_kind=True, datastore_kind_suffix=None, start_year_filter=None, end_year_filter=None, backend=None):
+    if backend is None:
+        backend = STORAGE_BACKEND
+    if backend == 'datastore':
+        storage_class = CloudStorage
+    elif backend == 'sqlite':
+        from sqlite_storage import SQLiteStorage # Imported here since sqlite_storage itself depends on this module
+        storage_class = SQLiteStorage
+    else:
+        print("FATAL ERROR: Unknown storage backend '" + str(backend) + "'! Use 'datastore' or 'sqlite'.")
+        sys.exit(1)
+    return storage_class(database=database, automated=automated, auxiliary_use=auxiliary_use, datastore_default_kind=datastore_default_kind, datastore_kind_suffix=datastore_kind_suffix, start_year_filter=start_year_filter, end_year_filter=end_year_filter)
@@ -0,0 +1,50 @@
+import sys, os, io, time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from storage import process_pool_context
+
+# Sub-community (and sub^2-community) analysis: the sub-graph of every large community is built, partitioned and its sub-communities
+# named independently of the other communities, so every community is a task of a pool of processes. A task returns the sub-graph
+# edge list and the partition as arrays, the names of the sub-communities and its printed output. The Analyzer turns them back into
+# the graph, partition and Community objects in the order of the communities, so the results and the output are the same as when the
+# communities are partitioned one after the other (with the same seed).
+SUB_COMMUNITY_WORKERS = None # Number of processes partitioning sub-graphs in parallel (None for one per CPU)
+
+analyzer = None # The Analyzer (and so the database and the citation matrices) is inherited by the forked workers
+
+def sub_partition_run(task):
+    auids, super_partition_name, message = task
+    stdout = sys.stdout
+    sys.stdout = io.StringIO() # Printed by the main process in the order of the communities
+    try:
+        edge_list = analyzer.sub_graph_edge_list(auids)
+        sub_graph, partition, communities = analyzer.partition_sub_graph(edge_list, super_partition_name, message)
+        output = sys.stdout.getvalue()
+    finally:
+        sys.stdout = stdout
+    return (edge_list, np.array(list(partition.keys()), dtype=np.int64), np.array(list(partition.values()), dtype=np.int64),
+            [community.name for community in communities], output)
+
+def run_sub_partitions(shared_analyzer, tasks, workers=SUB_COMMUNITY_WORKERS):
+    # tasks is a list of (auids, super-community name, progress message), one per community. Returns the (sub-graph, partition,
+    # communities) of every task, in the order of the tasks.
+    global analyzer
+    analyzer = shared_analyzer
+    context = process_pool_context()
+    if context is None or (workers or os.cpu_count() or 1) == 1 or len(tasks) < 2:
+        return [analyzer.partition_sub_graph(analyzer.sub_graph_edge_list(auids), super_partition_name, message) for auids, super_partition_name, message in tasks]
+    start_time = time.time()
+    analyzer.citation_matrices() # Built once, before the workers are forked
+    print("Partitioning " + str(len(tasks)) + " sub-graphs in parallel processes...")
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        # The largest communities first, so that the pool is not left waiting for one of them at the end
+        futures = [None] * len(tasks)
+        for i_task in sorted(range(len(tasks)), key=lambda i: -len(tasks[i][0])):
+            futures[i_task] = executor.submit(sub_partition_run, tasks[i_task])
+        for future in futures:
+            edge_list, nodes, community_ids, names, output = future.result()
+            sys.stdout.write(output)
+            results.append(analyzer.restore_sub_partition(edge_list, nodes, community_ids, names))
+    print("Partitioned " + str(len(tasks)) + " sub-graphs in " + str(time.time() - start_time) + " seconds.")
+    return results
@@ -0,0 +1,64 @@
+import os, sys, shutil, tempfile, unittest
+from unittest import mock
+import storage
+import sqlite_storage
+from storage import Database, Article, Author, Keyword, Affiliation
+
+FIRST_AUID = 57000000001
+
+def auid(i):
+    return str(FIRST_AUID + i)
+
+def small_database():
+    # Five articles with EID and a referenced article that is not in the database (only known from a reference):
+    # 1 (2001) -> 2, 3    2 (2002) -> 4    3 (2005) -> 4, stub    4 (1999)    5 (2010) -> 1, 3
+    database = Database()
+    affiliation = Affiliation('60000001', name='KTH Royal Institute of Technology', country='Sweden')
+    database.affiliations[affiliation.id] = affiliation
+    for i in range(6):
+        database.add_author(Author(auid(i), surname='Surname' + str(i), given_name='G.', affiliation=affiliation))
+    keyword = database.add_keywords(Keyword('power grid'))
+    source = database.shared_source('Journal of Security')
+    authors = database.authors
+    articles = []
+    for i, (title, date, article_authors) in enumerate([('Attack graphs for power grids', '2001-05-01', [0, 1]), ('Intrusion detection in SCADA networks', '2002-01-01', [2]),
+                                                        ('Threat modeling of substations', '2005-03-01', [1, 3]), ('Cyber security of smart meters', '1999-07-01', [4]),
+                                                        ('Probabilistic risk assessment', '2010-11-01', [0])]):
+        article = Article('2-s2.0-' + str(1000 + i), title=title, date=date, source=source, fsurname='Surname' + str(article_authors[0]),
+                          authors=[authors[auid(a)] for a in article_authors], refs_updated=True, fully_scraped=True)
+        articles.append(database.add_article(article))
+    stub = Article(None, title='Referenced article', date='1990-01-01', fsurname='Surname5', authors=[authors[auid(5)]])
+    articles[0].keywords.add(keyword)
+    articles[0].references = set([articles[1], articles[2]])
+    articles[1].references = set([articles[3]])
+    articles[2].references = set([articles[3], stub])
+    articles[4].references = set([articles[0], articles[2]])
+    database.update_author_article_records()
+    database.update_article_citation_records()
+    return database
+
+class StorageTestCase(unittest.TestCase):
+    # Runs every test in its own directory with the SQLite backend, so that the SQLite file and the snapshots are written there
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        cwd = os.getcwd()
+        os.chdir(directory)
+        self.addCleanup(os.chdir, cwd)
+        for patch in (mock.patch.object(storage, 'STORAGE_BACKEND', 'sqlite'), mock.patch.object(storage, 'SQLITE_DATABASE_FILE', 'atlas.sqlite'),
+                      mock.patch.object(sqlite_storage, 'SQLITE_DATABASE_FILE', 'atlas.sqlite'), mock.patch.object(sys, 'stdout', open(os.devnull, 'w'))):
+            patch.start()
+            self.addCleanup(patch.stop)
+        storage.select_datastore_kinds(True, None)
+
+    def sqlite_storage(self, database=None):
+        return sqlite_storage.SQLiteStorage(database=database)
+
+    def stored_database(self):
+        # The small database, stored in the SQLite file of the test
+        database = small_database()
+        backend = self.sqlite_storage(database)
+        backend.affiliation_store(database.affiliations)
+        self.assertTrue(backend.store())
+        return database
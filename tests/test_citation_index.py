@@ -0,0 +1,94 @@
+import unittest
+from datetime import datetime
+from types import SimpleNamespace
+import numpy as np
+import graph_analyzer
+from tests.fixtures import small_database
+
+def graph_analyzer_of(database):
+    # Only what the author graph builders of the Analyzer need
+    analyzer = graph_analyzer.Analyzer.__new__(graph_analyzer.Analyzer)
+    analyzer.storage = SimpleNamespace(database=database)
+    analyzer.export_graph_data = False
+    analyzer.author_citation_matrices = None
+    analyzer.cited_author_matrix = None
+    analyzer.author_graph_edge_list = None
+    return analyzer
+
+def edges(graph):
+    return set(map(frozenset, graph.edges()))
+
+class CitationIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.database = small_database()
+        self.index = self.database.build_citation_index()
+
+    def test_articles_and_authors(self):
+        self.assertEqual(self.index.n_articles(), 6) # The referenced article that is not in the database is indexed after the others
+        self.assertEqual(self.index.n_authors(), 6)
+        self.assertEqual(self.index.in_database.tolist(), [True] * 5 + [False])
+        for article_id, article in enumerate(self.index.articles):
+            self.assertEqual([self.index.authors[i] for i in self.index.authors_of(article_id)], sorted(article.authors, key=lambda author: self.index.author_ids[author.auid]))
+
+    def test_references_and_citations_match_the_object_graph(self):
+        for article_id, article in enumerate(self.index.articles[:self.index.n_database_articles]):
+            self.assertEqual(set(id(self.index.articles[i]) for i in self.index.references_of(article_id)), set(id(reference) for reference in article.references))
+            self.assertEqual(set(id(self.index.articles[i]) for i in self.index.citations_of(article_id)), set(id(citation) for citation in article.citations))
+        self.assertEqual(self.index.citation_counts()[:self.index.n_database_articles].tolist(), [len(article.citations) for article in self.index.articles[:self.index.n_database_articles]])
+
+    def test_cited_authors_match_get_cited_authors(self):
+        for author in self.database.authors.values():
+            self.assertEqual(set(a.auid for a in self.index.cited_authors(author)), set(a.auid for a in author.get_cited_authors()))
+        citing, cited = self.index.cited_author_pairs()
+        for author_id in range(self.index.n_authors()):
+            self.assertEqual(cited[citing == author_id].tolist(), self.index.cited_author_ids(author_id).tolist())
+
+    def test_fingerprint_changes_with_the_citation_graph(self):
+        fingerprint = self.index.fingerprint()
+        self.assertEqual(self.database.build_citation_index().fingerprint(), fingerprint)
+        articles = self.database.articles_with_eid
+        articles[3].references.add(articles[4])
+        self.assertNotEqual(self.database.build_citation_index().fingerprint(), fingerprint)
+
+class AuthorGraphTest(unittest.TestCase):
+    # The author graph built from the citation index has the same nodes and edges as the loop over get_cited_authors()
+
+    def setUp(self):
+        self.database = small_database()
+        self.database.build_citation_index()
+        self.analyzer = graph_analyzer_of(self.database)
+        self.addCleanup(setattr, graph_analyzer, 'VECTORIZED_AUTHOR_GRAPH', graph_analyzer.VECTORIZED_AUTHOR_GRAPH)
+
+    def both_graphs(self, start_year, end_year, keyword=""):
+        graphs = []
+        for vectorized in (False, True):
+            graph_analyzer.VECTORIZED_AUTHOR_GRAPH = vectorized
+            graphs.append(self.analyzer.initialize_author_graph(start_year, end_year, keyword, use_author_graph_cache=False))
+        return graphs
+
+    def assertSameGraph(self, graph, other_graph):
+        self.assertEqual(set(graph.nodes()), set(other_graph.nodes()))
+        self.assertEqual(edges(graph), edges(other_graph))
+
+    def test_full_period(self):
+        loop_graph, index_graph = self.both_graphs(1945, datetime.now().year)
+        self.assertSameGraph(loop_graph, index_graph)
+        self.assertGreater(index_graph.number_of_edges(), 0)
+
+    def test_time_period_and_keyword(self):
+        for start_year, end_year, keyword in ((2000, 2006, ""), (1999, 2002, ""), (1945, datetime.now().year, "power grid")):
+            loop_graph, index_graph = self.both_graphs(start_year, end_year, keyword)
+            self.assertSameGraph(loop_graph, index_graph)
+
+    def test_precomputed_cited_authors(self):
+        loop_graph = self.both_graphs(2000, 2006)[0]
+        graph_analyzer.VECTORIZED_AUTHOR_GRAPH = True
+        self.analyzer.precompute_cited_authors()
+        self.assertSameGraph(loop_graph, self.analyzer.initialize_author_graph(2000, 2006, "", use_author_graph_cache=False))
+        nodes, citing_authors, cited_authors = self.analyzer.author_graph_edge_list
+        self.assertEqual(len(citing_authors), len(cited_authors))
+        self.assertTrue(np.all(np.isin(cited_authors, nodes)))
+
+if __name__ == '__main__':
+    unittest.main()
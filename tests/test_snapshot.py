@@ -0,0 +1,61 @@
+import unittest
+from unittest import mock
+import storage
+import sqlite_storage
+import snapshot
+from storage import ARTICLE_PROPERTIES
+from tests.fixtures import StorageTestCase
+
+def database_contents(database):
+    # Everything a snapshot must preserve, in a comparable form
+    articles = dict()
+    for key, article in database.articles.items():
+        articles[key] = (article.title, article.eid, article.date, article.get_source(), article.first_author_surname,
+                         [author.auid for author in article.authors], sorted(keyword.name for keyword in article.keywords),
+                         sorted(hash(reference) for reference in article.references), article.references_are_updated,
+                         article.not_in_scopus, article.out_of_scope, article.fully_scraped)
+    authors = dict((key, (author.auid, author.surname, author.given_name, author.get_affiliation_id(), sorted(hash(article) for article in author.articles)))
+                   for key, author in database.authors.items())
+    keywords = dict((key, (keyword.name, keyword.count)) for key, keyword in database.keywords.items())
+    affiliations = dict((key, (affiliation.name, affiliation.country)) for key, affiliation in database.affiliations.items())
+    return articles, authors, keywords, affiliations, sorted(hash(article) for article in database.articles_with_eid)
+
+class LocalSnapshotTest(StorageTestCase):
+
+    def test_read_gives_the_loaded_database(self):
+        self.stored_database()
+        loaded = snapshot.load_storage() # Loaded from SQLite and written to the snapshot
+        read = snapshot.load_storage()
+        self.assertTrue(snapshot.LocalSnapshot(storage.snapshot_path()).is_valid(snapshot.LocalSnapshot.expected_manifest(), loaded.count_articles()))
+        self.assertEqual(database_contents(read.database), database_contents(loaded.database))
+        self.assertEqual(len(read.database.articles), 5)
+        sources = set(id(article.source) for article in read.database.articles.values())
+        self.assertEqual(len(sources), 1) # One shared Source per journal
+
+    def test_year_window_snapshot_is_separate(self):
+        self.stored_database()
+        loaded = snapshot.load_storage(start_year_filter=2000, end_year_filter=2005)
+        read = snapshot.load_storage(start_year_filter=2000, end_year_filter=2005)
+        self.assertEqual(database_contents(read.database), database_contents(loaded.database))
+        self.assertNotEqual(storage.snapshot_path(2000, 2005), storage.snapshot_path())
+
+    def test_snapshot_is_stale_when_the_backend_changes(self):
+        self.stored_database()
+        snapshot.load_storage()
+        local_snapshot = snapshot.LocalSnapshot(storage.snapshot_path())
+        expected_manifest = snapshot.LocalSnapshot.expected_manifest()
+        # An article stored from another machine, which cannot invalidate this snapshot
+        with mock.patch.object(sqlite_storage, 'invalidate_local_snapshots', lambda: None):
+            self.sqlite_storage().put_records(storage.ARTICLE_KIND, ARTICLE_PROPERTIES, [('1', {'title': 'New article', 'eid': '2-s2.0-2000', 'date': '2020-01-01'})])
+        self.assertFalse(local_snapshot.is_valid(expected_manifest, 6))
+        self.assertEqual(len(snapshot.load_storage().database.articles), 6)
+        self.assertTrue(local_snapshot.is_valid(expected_manifest, 6))
+
+    def test_store_invalidates_the_snapshot(self):
+        self.stored_database()
+        snapshot.load_storage()
+        self.sqlite_storage().put_records(storage.ARTICLE_KIND, ARTICLE_PROPERTIES, [('1', {'title': 'New article', 'eid': '2-s2.0-2000', 'date': '2020-01-01'})])
+        self.assertFalse(snapshot.LocalSnapshot(storage.snapshot_path()).is_valid(snapshot.LocalSnapshot.expected_manifest(), 6))
+
+if __name__ == '__main__':
+    unittest.main()
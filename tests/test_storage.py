@@ -0,0 +1,160 @@
+import unittest
+import storage
+import sqlite_storage
+from storage import Article, AUTHOR_KIND
+from tests.fixtures import StorageTestCase, small_database
+
+class FailingAuthorStorage(sqlite_storage.SQLiteStorage):
+    # Stores everything but the authors, like a store interrupted after the articles
+    def put_records(self, kind, properties, records, new_put_limit=storage.MAX_PUT_LIST_SIZE):
+        if kind == AUTHOR_KIND and records:
+            return False
+        return sqlite_storage.SQLiteStorage.put_records(self, kind, properties, records, new_put_limit)
+
+class DirtyTrackingTest(StorageTestCase):
+
+    def test_new_objects_are_dirty_until_stored(self):
+        database = small_database()
+        self.assertEqual(len(database.dirty_articles), 5)
+        self.assertEqual(len(database.dirty_authors), 6)
+        self.assertEqual(len(database.dirty_keywords), 1)
+        self.assertTrue(self.sqlite_storage(database).store())
+        self.assertFalse(database.has_unsaved_changes())
+
+    def test_partial_store_keeps_what_was_not_written(self):
+        database = small_database()
+        self.assertFalse(FailingAuthorStorage(database=database).store())
+        self.assertEqual(len(database.dirty_articles), 0)
+        self.assertEqual(len(database.dirty_keywords), 0)
+        self.assertEqual(len(database.dirty_authors), 6)
+        self.assertTrue(self.sqlite_storage(database).store())
+        self.assertFalse(database.has_unsaved_changes())
+        loaded = self.sqlite_storage()
+        self.assertEqual(sorted(loaded.database.authors.keys()), sorted(database.authors.keys()))
+        self.assertEqual(sorted(loaded.database.articles.keys()), sorted(database.articles.keys()))
+
+    def test_failed_full_store_is_completed_by_the_next_store(self):
+        database = small_database()
+        self.assertTrue(self.sqlite_storage(database).store())
+        self.assertFalse(FailingAuthorStorage(database=database).store(full_store=True))
+        self.assertEqual(len(database.dirty_authors), 6) # Everything was marked, and the authors were not written
+        self.assertEqual(len(database.dirty_articles), 0)
+
+    def test_changed_references_mark_the_article(self):
+        database = small_database()
+        self.sqlite_storage(database).store()
+        database.ensure_references_are_in_database() # Drops the reference to the article that is not in the database
+        self.assertEqual([article.eid for article in database.dirty_articles.values()], ['2-s2.0-1002'])
+        self.sqlite_storage(database).store()
+        database.ensure_references_are_in_database()
+        self.assertFalse(database.has_unsaved_changes())
+
+    def test_only_the_dirty_articles_are_stored(self):
+        database = small_database()
+        self.sqlite_storage(database).store()
+        article = database.articles_with_eid[3]
+        article.out_of_scope = True
+        database.mark_article_dirty(article)
+        stored = []
+        class RecordingStorage(sqlite_storage.SQLiteStorage):
+            def put_records(self, kind, properties, records, new_put_limit=storage.MAX_PUT_LIST_SIZE):
+                stored.extend((kind, key) for key, record in records)
+                return sqlite_storage.SQLiteStorage.put_records(self, kind, properties, records, new_put_limit)
+        self.assertTrue(RecordingStorage(database=database).store())
+        self.assertEqual(stored, [(storage.ARTICLE_KIND, str(hash(article)))])
+        self.assertTrue(self.sqlite_storage().database.articles[hash(article)].out_of_scope)
+
+class ArticleIdTest(unittest.TestCase):
+
+    def test_id_follows_the_id_attributes(self):
+        article = Article(None, title='Attack graphs', fsurname='Smith')
+        old_hash = hash(article)
+        article.title = 'Attack trees'
+        self.assertNotEqual(hash(article), old_hash)
+        article.eid = '2-s2.0-1'
+        article.fully_scraped = True
+        self.assertEqual(hash(article), storage.mmh3.hash('2-s2.0-1', signed=False))
+        article.date = '2001-01-01' # Not an id attribute
+        self.assertEqual(hash(article), storage.mmh3.hash('2-s2.0-1', signed=False))
+
+class MergeTest(StorageTestCase):
+
+    def duplicate(self, database, original, eid=None, title_suffix=''):
+        duplicate = Article(eid, title=original.title + title_suffix, date=original.date, fsurname=original.first_author_surname, authors=list(original.authors))
+        database.articles[hash(duplicate)] = duplicate
+        database.mark_article_dirty(duplicate)
+        if eid is not None:
+            database.add_article_with_eid(duplicate)
+        return duplicate
+
+    def test_apply_merge_plan_rewires_references_and_authors(self):
+        database = small_database()
+        first, second, third, fourth, fifth = database.articles_with_eid
+        duplicate = self.duplicate(database, second, eid='2-s2.0-9001')
+        duplicate.references.add(fifth)
+        third.references.add(duplicate)
+        database.update_author_article_records()
+        database.dirty_articles.clear()
+        deleted_keys = database.apply_merge_plan([(hash(second), [hash(duplicate)])])
+        self.assertEqual(deleted_keys, [hash(duplicate)])
+        self.assertNotIn(hash(duplicate), database.articles)
+        self.assertNotIn(duplicate, database.articles_with_eid)
+        self.assertIn(fifth, second.references)
+        self.assertTrue(any(reference is second for reference in third.references))
+        self.assertFalse(any(reference is duplicate for reference in third.references))
+        for author in second.authors:
+            self.assertFalse(any(article is duplicate for article in author.articles))
+        self.assertIn(id(second), database.dirty_articles)
+        self.assertIn(id(third), database.dirty_articles)
+        self.assertNotIn(id(duplicate), database.dirty_articles)
+        # The article match index starts over after the removal
+        self.assertEqual(database.get_article_based_on_description(Article(None, title=second.title, date=second.date, fsurname=second.first_author_surname)), second)
+
+    def test_duplicates_of_duplicates_are_merged_into_the_first_article(self):
+        database = small_database()
+        first = database.articles_with_eid[0]
+        longer = self.duplicate(database, first, title_suffix=' and substations')
+        longest = self.duplicate(database, first, title_suffix=' and substations revisited')
+        backend = self.sqlite_storage(database)
+        backend.store()
+        self.assertEqual(len(self.sqlite_storage().database.articles), 7)
+        database.identify_description_duplicates(storage=backend)
+        self.assertIn(hash(first), database.articles)
+        self.assertNotIn(hash(longer), database.articles)
+        self.assertNotIn(hash(longest), database.articles)
+        self.assertEqual(len(database.articles), 5)
+        self.assertEqual(sorted(self.sqlite_storage().database.articles.keys()), sorted(database.articles.keys()))
+
+    def test_dry_run_changes_nothing(self):
+        database = small_database()
+        self.duplicate(database, database.articles_with_eid[0], title_suffix=' and substations')
+        backend = self.sqlite_storage(database)
+        backend.store()
+        database.identify_description_duplicates(storage=backend, dry_run=True)
+        self.assertEqual(len(database.articles), 6)
+        self.assertEqual(len(self.sqlite_storage().database.articles), 6)
+
+class ArticleMatchIndexTest(unittest.TestCase):
+
+    def test_candidates_find_the_same_article(self):
+        database = small_database()
+        for article in database.articles_with_eid:
+            lookup = Article(None, title=article.title.upper(), date=article.date, fsurname=article.first_author_surname)
+            self.assertIs(database.get_article_based_on_description(lookup), article)
+        self.assertIsNone(database.get_article_based_on_description(Article(None, title='Something else entirely', date='2001-01-01', fsurname='Nobody')))
+
+    def test_refresh_and_append_are_seen(self):
+        database = small_database()
+        article = database.articles_with_eid[0]
+        database.get_article_based_on_description(article) # Builds the index
+        article.title = 'Renamed article about substations'
+        database.refresh_article_index(article)
+        lookup = Article(None, title='Renamed article about substations', date=article.date, fsurname=article.first_author_surname)
+        self.assertIs(database.get_article_based_on_description(lookup), article)
+        new_article = Article('2-s2.0-9002', title='A completely new article', date='2012-01-01', fsurname='Surname1', fully_scraped=True)
+        database.add_article(new_article)
+        lookup = Article(None, title='A completely new article', date='2012-01-01', fsurname='Surname1')
+        self.assertIs(database.get_article_based_on_description(lookup), new_article)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import sys, os, time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from storage import process_pool_context
+
+# Time window analysis: how the communities evolve is studied by partitioning the author graphs of many time windows. The database is
+# loaded (and its records and citation index updated) once by one Analyzer, and the cited authors of every author are computed once
+# (see Analyzer.precompute_cited_authors()), so that the author graph of a window is only a selection of rows. The windows are partitioned
+# in a pool of processes, and every window writes 'output_window_<start>_<end>.json' (the same format as Analyzer.print_community_json())
+# and 'output_window_<start>_<end>.txt'.
+WINDOW_WORKERS = None # Number of processes partitioning windows in parallel (None to use as many as the CPUs and the available memory allow)
+WINDOW_OUTPUT_PREFIX = 'output_window'
+WINDOW_BYTES_PER_EDGE = 1000 # Approximate memory of a worker per author graph edge (about 250 bytes for the networkx graph, the rest for Louvain), used to choose the number of workers
+WINDOW_MEMORY_FRACTION = 0.7 # Share of the available memory that the workers may use
+
+analyzer = None # The Analyzer (and so the database and the precomputed cited authors) is inherited by the forked workers
+
+def sliding_windows(first_year, last_year, width, step=1):
+    # [first_year, first_year+width-1], [first_year+step, first_year+step+width-1], ... up to last_year
+    return [(start_year, start_year + width - 1) for start_year in range(first_year, last_year - width + 2, step)]
+
+def expanding_windows(first_year, last_year, step=1, first_width=1):
+    # [first_year, first_year+first_width-1], [first_year, first_year+first_width-1+step], ... up to last_year
+    return [(first_year, end_year) for end_year in range(first_year + first_width - 1, last_year + 1, step)]
+
+def window_sizes(windows):
+    # (authors, edges) of the author graph of every window, at most, from the precomputed cited authors (before the edges
+    # to authors outside of a window are discarded)
+    author_articles = analyzer.citation_matrices()[0]
+    cited = analyzer.precompute_cited_authors()
+    cited_counts = np.diff(cited.indptr)
+    sizes = []
+    for start_year, end_year in windows:
+        nodes = np.flatnonzero(author_articles.dot(analyzer.selected_articles(start_year, end_year).astype(np.int32)) > 0)
+        sizes.append((len(nodes), int(cited_counts[nodes].sum())))
+    return sizes
+
+def available_memory():
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (ValueError, OSError, AttributeError): # Not available on this platform
+        return None
+
+def window_workers(sizes, workers=WINDOW_WORKERS):
+    if workers is not None:
+        return workers
+    max_workers = os.cpu_count() or 1
+    memory = available_memory()
+    if memory is None or not sizes:
+        return max_workers
+    largest_window = max(n_edges for n_authors, n_edges in sizes) * WINDOW_BYTES_PER_EDGE
+    return max(1, min(max_workers, len(sizes), int(memory * WINDOW_MEMORY_FRACTION / max(largest_window, 1))))
+
+def window_run(task):
+    start_year, end_year, randomize, modularity_threshold, prefix = task
+    output = prefix + '_' + str(start_year) + '_' + str(end_year)
+    stdout = sys.stdout
+    sys.stdout = open(output + '.txt', 'w')
+    try:
+        print("INFO: Window " + str(start_year) + "-" + str(end_year) + ": Start of output")
+        analyzer.partition_indexes.clear() # The communities of the earlier windows of this worker are not needed anymore
+        analyzer.start_year, analyzer.end_year = start_year, end_year
+        analyzer.partition, analyzer.communities = None, None
+        analyzer.author_graph = analyzer.initialize_author_graph(start_year=start_year, end_year=end_year, keyword="", use_author_graph_cache=False)
+        n_authors, n_edges = analyzer.author_graph.number_of_nodes(), analyzer.author_graph.number_of_edges()
+        if n_edges == 0:
+            print("WARNING: The author graph of this window has no edges, so it cannot be partitioned.")
+        else:
+            analyzer.partition, analyzer.communities = analyzer.create_partition(analyzer.author_graph, analyzer.storage.database, analyzer.excluded_keywords, randomize, modularity_threshold, use_partition_cache=False)
+        if analyzer.partition is None:
+            print("Aborting this window...")
+        else:
+            analyzer.print_community_info(analyzer.community_size_threshold)
+            analyzer.print_community_json(analyzer.community_size_threshold, output + '.json')
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+    modularity = analyzer.modularity if analyzer.partition is not None else None
+    analyzer.author_graph = None
+    return start_year, end_year, n_authors, n_edges, modularity
+
+def print_window_result(result, prefix):
+    start_year, end_year, n_authors, n_edges, modularity = result
+    print("Window " + str(start_year) + "-" + str(end_year) + ": " + str(n_authors) + " authors, " + str(n_edges) + " edges, modularity " + str(modularity) +
+          ("" if modularity is None else ", communities in '" + prefix + "_" + str(start_year) + "_" + str(end_year) + ".json'") + ".")
+
+def run_window_analysis(shared_analyzer, windows, randomize=False, modularity_threshold=None, workers=WINDOW_WORKERS, prefix=WINDOW_OUTPUT_PREFIX):
+    # windows is a list of (start_year, end_year), e.g. from sliding_windows() or expanding_windows(). The Analyzer should be created
+    # with build_graph=False. The community size threshold of the Analyzer applies to all the windows.
+    global analyzer
+    start_time = time.time()
+    analyzer = shared_analyzer
+    analyzer.author_graph = None
+    sizes = window_sizes(windows) # Also precomputes the cited authors before the workers are forked
+    workers = window_workers(sizes, workers)
+    # The largest windows first, so that the pool is not left waiting for one of them at the end
+    tasks = [(start_year, end_year, randomize, modularity_threshold, prefix) for (start_year, end_year), size in sorted(zip(windows, sizes), key=lambda window: -window[1][1])]
+    results = []
+    context = process_pool_context()
+    if context is None or workers == 1 or len(tasks) == 1:
+        if context is None:
+            print("WARNING: Processes cannot be forked on this platform, so the " + str(len(tasks)) + " windows are analyzed one after the other.")
+        for task in tasks:
+            results.append(window_run(task))
+            print_window_result(results[-1], prefix)
+    else:
+        print("Analyzing " + str(len(tasks)) + " windows in " + str(workers) + " processes (the largest one has up to " + str(max(size[1] for size in sizes)) + " edges)...")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            futures = [executor.submit(window_run, task) for task in tasks]
+            for future in as_completed(futures):
+                results.append(future.result())
+                print_window_result(results[-1], prefix)
+                print(str(len(results)) + "/" + str(len(tasks)) + " windows in " + str(time.time() - start_time) + " seconds.")
+    print("Time window analysis of " + str(len(tasks)) + " windows completed in " + str(time.time() - start_time) + " seconds.")
+    return sorted(results)